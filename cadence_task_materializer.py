@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+📅 MATERIALIZAÇÃO EM LOTE: cadence_task_instances
+=================================================
+
+Gera as atividades de cadência de muitos leads de uma vez, com as mesmas
+regras de CadenceService.generateCumulativeTaskInstances
+(backend/src/services/cadenceService.ts):
+
+- sistema acumulativo: o lead recebe as atividades de TODAS as etapas até
+  a etapa atual (pipeline_stages.order_index);
+- só tasks ativas das cadence_configs ativas da etapa (por stage_name);
+- etapa com atividades auto-geradas >= esperadas é pulada; nas demais,
+  só são criadas as tasks cujo (day_offset, task_order) ainda não existe
+  na etapa (tasks com o mesmo título continuam distintas);
+- scheduled_at = data de entrada + day_offset dias.
+
+Em vez de uma consulta + um INSERT por task, as configurações e as
+instâncias existentes são carregadas uma vez em índices em memória e as
+novas instâncias são inseridas em lote.
+
+Entradas:
+- movimentações: CSV ou JSON lines com lead_id, stage_id e,
+  opcionalmente, moved_at (data de entrada na etapa; padrão = agora);
+- backfill: todos os leads do tenant (ou de um pipeline/etapa), usando
+  created_at do lead como data de entrada, como a migração
+  20250726030000-convert-cadence-configs-to-task-instances.
+
+Uso:
+    python cadence_task_materializer.py --tenant <uuid> --moves moves.csv
+    python cadence_task_materializer.py --tenant <uuid> --backfill [--pipeline <uuid>] [--stage <uuid>]
+"""
+
+import argparse
+import csv
+import json
+import sys
+from datetime import datetime, timedelta, timezone
+
+from supabase_rest import Throughput, add_backend_argument, chunked, connect, in_filter, parse_timestamp
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_INSERT_BATCH = 500
+INSTANCE_COLUMNS = 'id,lead_id,stage_id,day_offset,task_order'
+
+
+class CadencePlan:
+    """Etapas ordenadas por pipeline e tasks ativas por etapa"""
+
+    def __init__(self, stages, configs):
+        self.stage_pipeline = {}
+        self.stage_name = {}
+        self.pipeline_stages = {}
+        for stage in sorted(stages, key=lambda s: (s['order_index'] if s.get('order_index') is not None else 0)):
+            self.stage_pipeline[stage['id']] = stage['pipeline_id']
+            self.stage_name[stage['id']] = stage['name']
+            self.pipeline_stages.setdefault(stage['pipeline_id'], []).append(stage['id'])
+
+        # (pipeline_id, stage_name) -> tasks ativas de todas as configs da etapa
+        self.tasks = {}
+        for config in configs:
+            tasks = config.get('tasks') if isinstance(config.get('tasks'), list) else []
+            active = [task for task in tasks if task.get('is_active')]
+            self.tasks.setdefault((config['pipeline_id'], config['stage_name']), []).extend(active)
+
+    def stages_up_to(self, stage_id):
+        """Etapas da pipeline até a etapa atual (inclusive)"""
+
+        pipeline_id = self.stage_pipeline.get(stage_id)
+        if pipeline_id is None:
+            return []
+        stages = self.pipeline_stages[pipeline_id]
+        return stages[:stages.index(stage_id) + 1]
+
+    def tasks_for_stage(self, stage_id):
+        return self.tasks.get((self.stage_pipeline[stage_id], self.stage_name[stage_id]), [])
+
+
+def task_identity(task):
+    """Identidade da task na etapa: (day_offset, task_order), com os padrões 0 e 1 da migração"""
+
+    day_offset = task.get('day_offset')
+    task_order = task.get('task_order')
+    return (int(day_offset) if day_offset is not None else 0,
+            int(task_order) if task_order is not None else 1)
+
+
+class ExistingInstanceIndex:
+    """Atividades auto-geradas já existentes por (lead_id, stage_id)"""
+
+    def __init__(self):
+        self.counts = {}
+        self.identities = {}
+
+    def add(self, lead_id, stage_id, identity):
+        key = (lead_id, stage_id)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.identities.setdefault(key, set()).add(identity)
+
+    def count(self, lead_id, stage_id):
+        return self.counts.get((lead_id, stage_id), 0)
+
+    def has_task(self, lead_id, stage_id, identity):
+        return identity in self.identities.get((lead_id, stage_id), ())
+
+
+def build_instance(tenant_id, lead_id, pipeline_id, stage_id, task, entry_date):
+    scheduled_at = entry_date + timedelta(days=task.get('day_offset') or 0)
+    return {
+        'tenant_id': tenant_id,
+        'lead_id': lead_id,
+        'pipeline_id': pipeline_id,
+        'stage_id': stage_id,
+        'activity_type': task.get('channel'),
+        'title': task.get('task_title'),
+        'description': task.get('task_description'),
+        'channel': task.get('channel'),
+        'template_content': task.get('template_content'),
+        'day_offset': task.get('day_offset'),
+        'task_order': task.get('task_order'),
+        'status': 'pending',
+        'scheduled_at': scheduled_at.isoformat(),
+        'is_manual_activity': False,
+        'auto_generated': True
+    }
+
+
+def plan_instances(tenant_id, leads, plan, existing):
+    """Calcular todas as instâncias faltantes para (lead_id, stage_id, entry_date)
+
+    O índice `existing` é atualizado com o que for gerado, então leads
+    repetidos na mesma execução não duplicam atividades.
+    """
+
+    instances = []
+    skipped_complete = 0
+
+    for lead_id, current_stage_id, entry_date in leads:
+        for stage_id in plan.stages_up_to(current_stage_id):
+            tasks = plan.tasks_for_stage(stage_id)
+            if not tasks:
+                continue
+            if existing.count(lead_id, stage_id) >= len(tasks):
+                skipped_complete += 1
+                continue
+
+            pipeline_id = plan.stage_pipeline[stage_id]
+            for task in tasks:
+                identity = task_identity(task)
+                if existing.has_task(lead_id, stage_id, identity):
+                    continue
+                instances.append(build_instance(tenant_id, lead_id, pipeline_id, stage_id, task, entry_date))
+                existing.add(lead_id, stage_id, identity)
+
+    return instances, skipped_complete
+
+
+def load_plan(client, tenant_id, pipeline_id=None):
+    filters = {'tenant_id': f'eq.{tenant_id}'}
+    if pipeline_id:
+        filters['id'] = f'eq.{pipeline_id}'
+    pipeline_ids = [row['id'] for rows in client.fetch_keyset('pipelines', 'id', filters=filters) for row in rows]
+
+    stages = []
+    configs = []
+    for batch in chunked(pipeline_ids, 200):
+        stages.extend(client.select('pipeline_stages', {
+            'select': 'id,pipeline_id,name,order_index',
+            'pipeline_id': in_filter(batch)
+        }) or [])
+        configs.extend(client.select('cadence_configs', {
+            'select': 'pipeline_id,stage_name,tasks',
+            'pipeline_id': in_filter(batch),
+            'tenant_id': f'eq.{tenant_id}',
+            'is_active': 'is.true'
+        }) or [])
+
+    return CadencePlan(stages, configs)
+
+
+def load_existing(client, tenant_id, lead_ids=None):
+    """Índice das instâncias auto-geradas (do tenant inteiro ou dos leads informados)"""
+
+    existing = ExistingInstanceIndex()
+    base_filters = {'tenant_id': f'eq.{tenant_id}', 'auto_generated': 'is.true'}
+
+    if lead_ids is None:
+        pages = client.fetch_keyset('cadence_task_instances', INSTANCE_COLUMNS, filters=base_filters)
+    else:
+        pages = (
+            rows
+            for batch in chunked(sorted(set(lead_ids)), 200)
+            for rows in client.fetch_keyset('cadence_task_instances', INSTANCE_COLUMNS,
+                                            filters=dict(base_filters, lead_id=in_filter(batch)))
+        )
+
+    for rows in pages:
+        for row in rows:
+            existing.add(row['lead_id'], row['stage_id'], task_identity(row))
+    return existing
+
+
+def read_moves(path, default_entry):
+    """Ler movimentações (lead_id, stage_id[, moved_at]) de CSV ou JSON lines"""
+
+    def convert(row):
+        moved_at = row.get('moved_at')
+        entry = parse_timestamp(moved_at) if moved_at else default_entry
+        return row['lead_id'], row['stage_id'], entry
+
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.jsonl') or path.endswith('.ndjson'):
+            return [convert(json.loads(line)) for line in f if line.strip()]
+        return [convert(row) for row in csv.DictReader(f)]
+
+
+def iter_backfill_leads(client, tenant_id, pipeline_id=None, stage_id=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    filters = {'tenant_id': f'eq.{tenant_id}'}
+    if pipeline_id:
+        filters['pipeline_id'] = f'eq.{pipeline_id}'
+    if stage_id:
+        filters['stage_id'] = f'eq.{stage_id}'
+
+    for rows in client.fetch_keyset('pipeline_leads', 'id,stage_id,created_at', filters=filters,
+                                    page_size=chunk_size):
+        yield [(row['id'], row['stage_id'], parse_timestamp(row['created_at'])) for row in rows]
+
+
+def materialize(client, tenant_id, lead_chunks, plan, existing, insert_batch, dry_run):
+    totals = {'leads': 0, 'created': 0, 'skipped_complete': 0}
+    meter = Throughput()
+
+    for leads in lead_chunks:
+        instances, skipped = plan_instances(tenant_id, leads, plan, existing)
+        totals['leads'] += len(leads)
+        totals['skipped_complete'] += skipped
+        meter.add(len(leads))
+
+        if not dry_run:
+            for batch in chunked(instances, insert_batch):
+                client.insert('cadence_task_instances', batch)
+        totals['created'] += len(instances)
+
+    totals['elapsed'] = meter.elapsed
+    totals['rows_per_second'] = meter.rate
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Materialização em lote de atividades de cadência')
+    parser.add_argument('--tenant', required=True, help='tenant_id')
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--moves', help='CSV ou JSON lines com lead_id, stage_id[, moved_at]')
+    mode.add_argument('--backfill', action='store_true', help='todos os leads na etapa atual')
+    parser.add_argument('--pipeline', help='restringir a um pipeline')
+    parser.add_argument('--stage', help='backfill: restringir aos leads nesta etapa')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='leads por bloco')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_INSERT_BATCH, help='instâncias por INSERT')
+    parser.add_argument('--dry-run', action='store_true', help='apenas calcular')
+    add_backend_argument(parser)
+    args = parser.parse_args(argv)
+
+    print("📅 MATERIALIZAÇÃO DE ATIVIDADES DE CADÊNCIA")
+    print("=" * 45)
+
+    client = connect(args.backend)
+    plan = load_plan(client, args.tenant, args.pipeline)
+    print(f"   etapas: {len(plan.stage_pipeline)} | etapas com cadência: {len(plan.tasks)}")
+
+    if args.moves:
+        moves = read_moves(args.moves, datetime.now(timezone.utc))
+        existing = load_existing(client, args.tenant, [lead_id for lead_id, _, _ in moves])
+        lead_chunks = chunked(moves, args.chunk_size)
+    else:
+        existing = load_existing(client, args.tenant)
+        lead_chunks = iter_backfill_leads(client, args.tenant, args.pipeline, args.stage, args.chunk_size)
+
+    print(f"   instâncias existentes indexadas: {sum(existing.counts.values())}")
+
+    totals = materialize(client, args.tenant, lead_chunks, plan, existing, args.batch_size, args.dry_run)
+
+    print(f"\n📊 RESULTADO:")
+    print(f"   leads processados:     {totals['leads']} ({totals['rows_per_second']:,.0f} leads/s)")
+    print(f"   etapas já completas:   {totals['skipped_complete']}")
+    label = 'a criar (dry-run)' if args.dry_run else 'criadas'
+    print(f"   atividades {label}: {totals['created']}")
+    print(f"   round trips:           {client.round_trips}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+🔁 BACKFILL EM LOTES: Reescrita de dados retomável e com throttling
+===================================================================
+
+Framework para migrações de formato de dados (ex.: won/lost → ganho/perda,
+perda → perdido) sem o UPDATE gigante que trava e incha as tabelas:
+
+- linhas são reescritas em lotes por keyset (id > último id processado);
+- cada lote é um PATCH `id=in.(...)` curto, com o filtro original como
+  guarda (linha alterada por outro processo no meio do caminho não é tocada);
+- o tamanho do lote se adapta ao tempo por lote (orçamento de lock);
+- entre lotes, o throttle consulta lag de replicação e esperas por lock
+  (via RPC exec_sql_select, ou direto na conexão com --backend postgres)
+  e pausa enquanto o banco estiver sob pressão;
+- um checkpoint em JSON guarda o último id de cada etapa, então o job pode
+  ser interrompido e retomado;
+- cada etapa reporta linhas/segundo.
+
+Jobs prontos ficam em JOBS; migrações novas só precisam declarar etapas
+(BackfillStep ou value_rename_step).
+
+Uso:
+    python data_backfill.py --list
+    python data_backfill.py --job perda-to-perdido [--dry-run]
+    python data_backfill.py --table lead_outcome_history --column outcome_type --map perda=perdido
+    python data_backfill.py --job perda-to-perdido --reset    # descartar checkpoint
+    python data_backfill.py --job perda-to-perdido --backend postgres    # SUPABASE_DB_URL
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from supabase_rest import SupabaseRest, SupabaseRestError, Throughput, add_backend_argument, connect, in_filter
+
+CHECKPOINT_DIR = '.backfill_checkpoints'
+
+DEFAULT_BATCH_SIZE = 500
+MIN_BATCH_SIZE = 50
+# ids por PATCH (limitado pelo tamanho da URL)
+MAX_BATCH_SIZE = 1000
+# Orçamento por lote: acima disso o lote encolhe, bem abaixo ele cresce
+DEFAULT_TARGET_BATCH_SECONDS = 0.5
+
+DEFAULT_MAX_LAG_SECONDS = 5.0
+DEFAULT_MAX_LOCK_WAITS = 5
+DEFAULT_PROBE_INTERVAL = 5.0
+
+HEALTH_QUERY = """
+SELECT
+    (SELECT COALESCE(MAX(EXTRACT(EPOCH FROM replay_lag)), 0) FROM pg_stat_replication) AS lag_seconds,
+    (SELECT COUNT(*) FROM pg_stat_activity WHERE wait_event_type = 'Lock') AS lock_waits
+"""
+
+
+class BackfillStep:
+    """Uma tabela a reescrever
+
+    `filters` seleciona as linhas que ainda precisam de reescrita (filtros
+    PostgREST); `transform(row)` devolve os novos valores ou None para
+    pular a linha. Os mesmos filtros são reaplicados no PATCH como guarda.
+    """
+
+    def __init__(self, name, table, columns, filters, transform, key='id'):
+        self.name = name
+        self.table = table
+        self.columns = columns
+        self.filters = filters
+        self.transform = transform
+        self.key = key
+
+
+def value_rename_step(table, column, mapping, name=None):
+    """Etapa padrão de renomeação de valores (UPDATE ... SET c = map(c) WHERE c IN (...))"""
+
+    def transform(row):
+        new_value = mapping.get(row[column])
+        if new_value is None or new_value == row[column]:
+            return None
+        return {column: new_value}
+
+    return BackfillStep(
+        name=name or f'{table}.{column}',
+        table=table,
+        columns=f'id,{column}',
+        filters={column: in_filter(f'"{value}"' for value in mapping)},
+        transform=transform
+    )
+
+
+# map_outcome_type_to_portuguese (20250129120000-refactor-won-lost-to-ganho-perda.sql)
+WON_LOST_TO_GANHO_PERDA = {'won': 'ganho', 'win': 'ganho', 'lost': 'perda', 'loss': 'perda'}
+# 20250812235900-migrate-perda-to-perdido.sql
+PERDA_TO_PERDIDO = {'perda': 'perdido'}
+
+JOBS = {
+    'won-lost-to-ganho-perda': lambda: [
+        value_rename_step('pipeline_outcome_reasons', 'reason_type', WON_LOST_TO_GANHO_PERDA),
+        value_rename_step('lead_outcome_history', 'outcome_type', WON_LOST_TO_GANHO_PERDA),
+    ],
+    'perda-to-perdido': lambda: [
+        value_rename_step('pipeline_outcome_reasons', 'reason_type', PERDA_TO_PERDIDO),
+        value_rename_step('lead_outcome_history', 'outcome_type', PERDA_TO_PERDIDO),
+        value_rename_step('pipeline_win_loss_reasons', 'reason_type', PERDA_TO_PERDIDO),
+    ],
+}
+
+
+class Checkpoint:
+    """Progresso por etapa persistido em JSON (escrita atômica)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.state = {'steps': {}}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.state = json.load(f)
+
+    def step(self, name):
+        return self.state['steps'].setdefault(name, {'last_key': None, 'rows': 0, 'done': False})
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def reset(self):
+        self.state = {'steps': {}}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class RestHealthProbe:
+    """Lag de replicação e esperas por lock via RPC exec_sql_select"""
+
+    def __init__(self, client, function_name='exec_sql_select'):
+        self.client = client
+        self.function_name = function_name
+        self.available = True
+
+    def _fetch(self):
+        return self.client.rpc(self.function_name, {'query': HEALTH_QUERY})
+
+    def __call__(self):
+        if not self.available:
+            return None
+        try:
+            rows = self._fetch()
+        except SupabaseRestError as e:
+            print(f"   ⚠️  Sonda de saúde indisponível ({e.status_code}); seguindo só com o orçamento por lote")
+            self.available = False
+            return None
+        if not isinstance(rows, list) or not rows:
+            self.available = False
+            return None
+        return {
+            'lag_seconds': float(rows[0].get('lag_seconds') or 0),
+            'lock_waits': int(rows[0].get('lock_waits') or 0)
+        }
+
+
+class DatabaseHealthProbe(RestHealthProbe):
+    """Mesma sonda, consultando direto na conexão (backend postgres)"""
+
+    def __init__(self, client):
+        super().__init__(client, function_name=None)
+
+    def _fetch(self):
+        return self.client.query(HEALTH_QUERY)
+
+
+def health_probe(client):
+    if isinstance(client, SupabaseRest):
+        return RestHealthProbe(client)
+    return DatabaseHealthProbe(client)
+
+
+class Throttle:
+    """Pausa entre lotes enquanto o banco estiver sob pressão"""
+
+    def __init__(self, probe=None, max_lag_seconds=DEFAULT_MAX_LAG_SECONDS,
+                 max_lock_waits=DEFAULT_MAX_LOCK_WAITS, probe_interval=DEFAULT_PROBE_INTERVAL,
+                 pause=0.0, max_backoff=60.0, sleep=time.sleep):
+        self.probe = probe
+        self.max_lag_seconds = max_lag_seconds
+        self.max_lock_waits = max_lock_waits
+        self.probe_interval = probe_interval
+        self.pause = pause
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        self.last_probe_at = 0.0
+        self.throttled_seconds = 0.0
+
+    def wait(self):
+        if self.pause:
+            self.sleep(self.pause)
+        if self.probe is None or time.monotonic() - self.last_probe_at < self.probe_interval:
+            return
+
+        backoff = 1.0
+        while True:
+            self.last_probe_at = time.monotonic()
+            health = self.probe()
+            if health is None:
+                return
+            if health['lag_seconds'] <= self.max_lag_seconds and health['lock_waits'] <= self.max_lock_waits:
+                return
+            print(f"   ⏸️  Throttle: lag {health['lag_seconds']:.1f}s, "
+                  f"{health['lock_waits']} esperas por lock; aguardando {backoff:.0f}s")
+            self.sleep(backoff)
+            self.throttled_seconds += backoff
+            backoff = min(backoff * 2, self.max_backoff)
+
+
+class AdaptiveBatch:
+    """Ajusta o tamanho do lote para caber no orçamento de tempo por lote"""
+
+    def __init__(self, size=DEFAULT_BATCH_SIZE, target_seconds=DEFAULT_TARGET_BATCH_SECONDS,
+                 minimum=MIN_BATCH_SIZE, maximum=MAX_BATCH_SIZE):
+        self.size = size
+        self.target_seconds = target_seconds
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def observe(self, seconds):
+        if seconds > self.target_seconds:
+            self.size = max(self.minimum, self.size // 2)
+        elif seconds < self.target_seconds / 4:
+            self.size = min(self.maximum, self.size * 2)
+
+
+def apply_batch(client, step, rows):
+    """Gravar um lote: um PATCH por conjunto distinto de novos valores"""
+
+    groups = {}
+    for row in rows:
+        values = step.transform(row)
+        if values is None:
+            continue
+        groups.setdefault(json.dumps(values, sort_keys=True), []).append(row[step.key])
+
+    written = 0
+    for values_json, keys in groups.items():
+        filters = dict(step.filters)
+        filters[step.key] = in_filter(keys)
+        client.update(step.table, filters, json.loads(values_json))
+        written += len(keys)
+    return written
+
+
+def run_step(client, step, checkpoint, throttle, batch, dry_run=False):
+    """Executar uma etapa a partir do checkpoint; retorna estatísticas"""
+
+    progress = checkpoint.step(step.name)
+    if progress['done']:
+        print(f"\n⏭️  {step.name}: já concluída ({progress['rows']} linhas)")
+        return {'name': step.name, 'rows': 0, 'skipped': True}
+
+    print(f"\n🔁 {step.name}: retomando após {progress['last_key']}" if progress['last_key']
+          else f"\n🔁 {step.name}: iniciando")
+
+    meter = Throughput()
+    while True:
+        params = dict(step.filters)
+        params['select'] = step.columns
+        params['order'] = f'{step.key}.asc'
+        params['limit'] = str(batch.size)
+        if progress['last_key'] is not None:
+            params[step.key] = f"gt.{progress['last_key']}"
+
+        started = time.perf_counter()
+        rows = client.select(step.table, params) or []
+        if not rows:
+            break
+
+        written = len(rows) if dry_run else apply_batch(client, step, rows)
+        batch.observe(time.perf_counter() - started)
+
+        meter.add(written)
+        progress['rows'] += written
+        progress['last_key'] = rows[-1][step.key]
+        if not dry_run:
+            checkpoint.save()
+        print(f"   … {progress['rows']} linhas ({meter.rate:,.0f} linhas/s, lote {batch.size})")
+
+        if len(rows) < int(params['limit']):
+            break
+        throttle.wait()
+
+    progress['done'] = True
+    if not dry_run:
+        checkpoint.save()
+    print(f"   ✅ {step.name}: {meter}")
+    return {'name': step.name, 'rows': meter.rows, 'elapsed': meter.elapsed, 'rows_per_second': meter.rate}
+
+
+def run_job(name, steps, client=None, checkpoint_path=None, throttle=None, batch_size=DEFAULT_BATCH_SIZE,
+            target_batch_seconds=DEFAULT_TARGET_BATCH_SECONDS, dry_run=False, reset=False):
+    client = client or SupabaseRest()
+    checkpoint = Checkpoint(checkpoint_path or os.path.join(CHECKPOINT_DIR, f'{name}.json'))
+    if reset:
+        checkpoint.reset()
+    throttle = throttle or Throttle(health_probe(client))
+
+    results = []
+    for step in steps:
+        batch = AdaptiveBatch(batch_size, target_batch_seconds)
+        results.append(run_step(client, step, checkpoint, throttle, batch, dry_run))
+    return results
+
+
+def parse_mapping(pairs):
+    mapping = {}
+    for pair in pairs:
+        old, sep, new = pair.partition('=')
+        if not sep or not old:
+            raise ValueError(f'mapeamento inválido: {pair!r} (use antigo=novo)')
+        mapping[old] = new
+    return mapping
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Backfill em lotes, retomável e com throttling')
+    parser.add_argument('--list', action='store_true', help='listar jobs disponíveis')
+    parser.add_argument('--job', choices=sorted(JOBS), help='job pronto')
+    parser.add_argument('--table', help='job ad hoc: tabela')
+    parser.add_argument('--column', help='job ad hoc: coluna')
+    parser.add_argument('--map', nargs='+', default=[], metavar='ANTIGO=NOVO', help='job ad hoc: valores')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='tamanho inicial do lote')
+    parser.add_argument('--target-batch-seconds', type=float, default=DEFAULT_TARGET_BATCH_SECONDS,
+                        help='orçamento de tempo por lote')
+    parser.add_argument('--max-lag', type=float, default=DEFAULT_MAX_LAG_SECONDS, help='lag máximo (s)')
+    parser.add_argument('--max-lock-waits', type=int, default=DEFAULT_MAX_LOCK_WAITS,
+                        help='sessões esperando lock toleradas')
+    parser.add_argument('--pause', type=float, default=0.0, help='pausa fixa entre lotes (s)')
+    parser.add_argument('--checkpoint', help='arquivo de checkpoint')
+    parser.add_argument('--reset', action='store_true', help='ignorar checkpoint existente')
+    parser.add_argument('--dry-run', action='store_true', help='apenas ler e contar')
+    add_backend_argument(parser)
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, build in sorted(JOBS.items()):
+            print(f"{name}: " + ', '.join(step.name for step in build()))
+        return 0
+
+    if args.job:
+        name, steps = args.job, JOBS[args.job]()
+    elif args.table and args.column and args.map:
+        try:
+            mapping = parse_mapping(args.map)
+        except ValueError as e:
+            parser.error(str(e))
+        name = f'{args.table}.{args.column}'
+        steps = [value_rename_step(args.table, args.column, mapping)]
+    else:
+        parser.error('informe --job ou --table/--column/--map')
+
+    print(f"🔁 BACKFILL: {name}")
+    print("=" * 40)
+
+    client = connect(args.backend)
+    throttle = Throttle(health_probe(client), args.max_lag, args.max_lock_waits, pause=args.pause)
+    results = run_job(name, steps, client, args.checkpoint, throttle, args.batch_size,
+                      args.target_batch_seconds, args.dry_run, args.reset)
+
+    total = sum(result['rows'] for result in results)
+    print(f"\n🏁 {total} linhas em {len(results)} etapa(s) | {client.round_trips} round trips"
+          f" | throttle: {throttle.throttled_seconds:.0f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
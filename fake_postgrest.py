@@ -0,0 +1,478 @@
+#!/usr/bin/env python3
+"""
+🧪 FAKE POSTGREST: Servidor local que imita as RPCs de migration do Supabase
+============================================================================
+
+Sobe um http.server em processo com os mesmos contratos usados pelos
+scripts de migration, para exercitá-los (e medir transporte/lotes) sem
+tocar no projeto real:
+
+- POST /rest/v1/rpc/execute_migration_sql  {sql_query} -> {success, message, executed_at}
+- POST /rest/v1/rpc/execute_sql            {sql_query} -> texto de confirmação
+- POST /rest/v1/rpc/exec_sql               {query}     -> {success, message} | linhas (SELECT)
+- POST /rest/v1/rpc/exec_sql_select        {query}     -> linhas
+- POST /rest/v1/rpc/check_rls_policies     {table_name} -> {table_name, policy_count, policies}
+- GET  /rest/v1/                           -> lista de RPCs (como o OpenAPI do PostgREST)
+
+Backends:
+- SQLite (padrão, stdlib): executa o SQL portátil e emula o que é só do
+  Postgres (CREATE/DROP POLICY com pg_policies em memória; funções,
+  GRANT/REVOKE, RLS, COMMENT etc. são aceitos sem efeito);
+- Postgres local (--dsn, requer psycopg): executa tudo de verdade.
+
+Cada chamada roda em uma transação, como o EXECUTE dentro da função
+plpgsql. Latência (--latency-ms/--jitter-ms) e falhas transitórias
+(--failure-rate/--fail-first, HTTP 503) são injetáveis.
+
+Uso:
+    python fake_postgrest.py [--port 54321] [--sqlite arquivo.db | --dsn postgresql://...]
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_SERVICE_ROLE_KEY=fake-service-role python ...
+"""
+
+import argparse
+import json
+import random
+import re
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from migration_runner import (
+    CREATE_POLICY_RE, DROP_POLICY_RE, split_sql_statements, strip_leading_comments, unquote_identifier
+)
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_SERVICE_ROLE_KEY = 'fake-service-role'
+
+RPC_FUNCTIONS = ('execute_migration_sql', 'execute_sql', 'exec_sql', 'exec_sql_select', 'check_rls_policies')
+
+# Statements sem equivalente no SQLite: aceitos sem efeito
+POSTGRES_ONLY_RE = re.compile(
+    r'^\s*(CREATE\s+(OR\s+REPLACE\s+)?(FUNCTION|TRIGGER|EXTENSION|TYPE|SCHEMA)|DROP\s+(FUNCTION|TRIGGER|TYPE)'
+    r'|ALTER\s+TABLE\s+\S+\s+(ENABLE|DISABLE|FORCE|NO\s+FORCE)\s+ROW\s+LEVEL\s+SECURITY'
+    r'|ALTER\s+(FUNCTION|POLICY|PUBLICATION)|GRANT|REVOKE|COMMENT\s+ON|DO\b|NOTIFY|SET\s|RESET\s|ANALYZE)',
+    re.IGNORECASE
+)
+
+
+class BackendError(Exception):
+    """Erro de execução SQL (sqlstate no estilo Postgres)"""
+
+    def __init__(self, message, sqlstate='XX000'):
+        super().__init__(message)
+        self.sqlstate = sqlstate
+
+
+class SqliteBackend:
+    """SQLite + emulação de pg_policies (uma conexão, serializada por lock)"""
+
+    name = 'sqlite'
+
+    def __init__(self, path=':memory:'):
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.lock = threading.Lock()
+        # table -> {policy_name: command}
+        self.policies = {}
+        self.emulated = 0
+
+    def _apply_policy(self, statement, policies):
+        match = CREATE_POLICY_RE.match(statement)
+        if match:
+            name, table = unquote_identifier(match.group(1)), match.group(2).lower()
+            if name in policies.setdefault(table, {}):
+                raise BackendError(f'policy "{name}" for table "{table}" already exists', '42710')
+            policies[table][name] = (match.group(3) or 'ALL').upper()
+            return True
+
+        match = DROP_POLICY_RE.match(statement)
+        if match:
+            name, table = unquote_identifier(match.group(2)), match.group(3).lower()
+            if name not in policies.get(table, {}):
+                if not match.group(1):
+                    raise BackendError(f'policy "{name}" for table "{table}" does not exist', '42704')
+                return True
+            del policies[table][name]
+            return True
+
+        return False
+
+    def execute(self, sql):
+        """Executar um script inteiro em uma transação"""
+
+        statements = split_sql_statements(sql)
+        if not statements:
+            raise BackendError('SQL query cannot be empty', 'P0001')
+
+        with self.lock:
+            policies = {table: dict(names) for table, names in self.policies.items()}
+            emulated = 0
+            cursor = self.connection.cursor()
+            cursor.execute('BEGIN')
+            try:
+                for statement in map(strip_leading_comments, statements):
+                    if self._apply_policy(statement, policies) or POSTGRES_ONLY_RE.match(statement):
+                        emulated += 1
+                        continue
+                    cursor.execute(statement)
+            except sqlite3.Error as e:
+                cursor.execute('ROLLBACK')
+                raise BackendError(str(e), '42601')
+            except BackendError:
+                cursor.execute('ROLLBACK')
+                raise
+            cursor.execute('COMMIT')
+            self.policies = policies
+            self.emulated += emulated
+        return len(statements)
+
+    def select(self, query):
+        with self.lock:
+            try:
+                cursor = self.connection.execute(query)
+            except sqlite3.Error as e:
+                raise BackendError(str(e), '42601')
+            columns = [d[0] for d in cursor.description or ()]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def list_policies(self, table_name):
+        with self.lock:
+            return [
+                {'policy_name': name, 'command': command, 'roles': ['public'], 'qual': None}
+                for name, command in sorted(self.policies.get(table_name, {}).items())
+            ]
+
+    def close(self):
+        self.connection.close()
+
+
+class PostgresBackend:
+    """Postgres local via psycopg (import tardio)"""
+
+    name = 'postgres'
+
+    def __init__(self, dsn):
+        import psycopg
+        from psycopg.rows import dict_row
+
+        self.psycopg = psycopg
+        self.connection = psycopg.connect(dsn, autocommit=True, row_factory=dict_row)
+        self.lock = threading.Lock()
+        self.emulated = 0
+
+    def execute(self, sql):
+        statements = split_sql_statements(sql)
+        if not statements:
+            raise BackendError('SQL query cannot be empty', 'P0001')
+        with self.lock:
+            try:
+                with self.connection.transaction():
+                    self.connection.execute(sql)
+            except self.psycopg.Error as e:
+                raise BackendError(str(e).strip(), getattr(e, 'sqlstate', None) or 'XX000')
+        return len(statements)
+
+    def select(self, query):
+        with self.lock:
+            try:
+                return self.connection.execute(query).fetchall()
+            except self.psycopg.Error as e:
+                raise BackendError(str(e).strip(), getattr(e, 'sqlstate', None) or 'XX000')
+
+    def list_policies(self, table_name):
+        return [
+            {'policy_name': row['policyname'], 'command': row['cmd'], 'roles': row['roles'], 'qual': row['qual']}
+            for row in self.connection.execute(
+                "SELECT policyname, cmd, roles::text[] AS roles, qual FROM pg_policies "
+                "WHERE schemaname = 'public' AND tablename = %s ORDER BY policyname",
+                (table_name,)
+            ).fetchall()
+        ]
+
+    def close(self):
+        self.connection.close()
+
+
+class FaultInjector:
+    """Latência e falhas 503 determinísticas (seed) por requisição"""
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, fail_first=0, seed=None, sleep=time.sleep):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.remaining_failures = fail_first
+        self.random = random.Random(seed)
+        self.sleep = sleep
+        self.lock = threading.Lock()
+
+    def before_request(self):
+        """Aplica latência; retorna True se a requisição deve falhar"""
+
+        with self.lock:
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+            if self.remaining_failures > 0:
+                self.remaining_failures -= 1
+                fail = True
+            else:
+                fail = self.failure_rate > 0 and self.random.random() < self.failure_rate
+        if delay > 0:
+            self.sleep(delay)
+        return fail
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class FakePostgrest:
+    """Servidor PostgREST falso em thread de fundo"""
+
+    def __init__(self, backend=None, service_role_key=DEFAULT_SERVICE_ROLE_KEY, faults=None,
+                 host=DEFAULT_HOST, port=0, log=False):
+        self.backend = backend or SqliteBackend()
+        self.service_role_key = service_role_key
+        self.faults = faults or FaultInjector()
+        self.log = log
+        self.stats_lock = threading.Lock()
+        self.reset_stats()
+
+        fake = self
+
+        class Handler(PostgrestHandler):
+            server_fake = fake
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.stats = {'requests': 0, 'rpc': {}, 'statements': 0, 'injected_failures': 0, 'errors': 0}
+
+    def count(self, field, amount=1, function_name=None):
+        with self.stats_lock:
+            self.stats[field] += amount
+            if function_name:
+                self.stats['rpc'][function_name] = self.stats['rpc'].get(function_name, 0) + 1
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='fake-postgrest', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread:
+            self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def call_rpc(self, function_name, params):
+        """Executar RPC; retorna (status, corpo)"""
+
+        backend = self.backend
+
+        if function_name == 'execute_migration_sql':
+            sql = params.get('sql_query')
+            if not sql or not sql.strip():
+                return 400, {'code': 'P0001', 'message': 'SQL query cannot be empty'}
+            try:
+                self.count('statements', backend.execute(sql))
+            except BackendError as e:
+                return 400, {'code': 'P0001', 'message': f'SQL failed: {e} (SQLSTATE: {e.sqlstate})'}
+            return 200, {'success': True, 'message': 'SQL executed successfully', 'executed_at': now_iso()}
+
+        if function_name == 'execute_sql':
+            sql = params.get('sql_query') or ''
+            try:
+                self.count('statements', backend.execute(sql))
+            except BackendError as e:
+                return 400, {'code': e.sqlstate, 'message': str(e)}
+            return 200, f'SQL executado com sucesso: {sql[:50]}...'
+
+        if function_name == 'exec_sql':
+            sql = params.get('query') or params.get('sql') or ''
+            try:
+                if sql.lstrip().upper().startswith('SELECT'):
+                    rows = backend.select(sql)
+                    self.count('statements')
+                    return 200, rows
+                self.count('statements', backend.execute(sql))
+            except BackendError as e:
+                return 200, {'success': False, 'error': str(e), 'error_code': e.sqlstate}
+            return 200, {'success': True, 'message': 'Query executada com sucesso'}
+
+        if function_name == 'exec_sql_select':
+            try:
+                rows = backend.select(params.get('query') or '')
+            except BackendError as e:
+                return 200, {'error': str(e), 'sqlstate': e.sqlstate}
+            self.count('statements')
+            return 200, rows
+
+        if function_name == 'check_rls_policies':
+            table_name = params.get('table_name')
+            policies = backend.list_policies(table_name)
+            return 200, {
+                'table_name': table_name,
+                'policy_count': len(policies),
+                'policies': policies,
+                'checked_at': now_iso()
+            }
+
+        return 404, {
+            'code': 'PGRST202',
+            'message': f'Could not find the function public.{function_name} in the schema cache'
+        }
+
+
+class PostgrestHandler(BaseHTTPRequestHandler):
+    server_fake = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server_fake.log:
+            super().log_message(format, *args)
+
+    def setup(self):
+        super().setup()
+        # header e corpo saem em writes separados: sem NODELAY, Nagle + ACK
+        # atrasado somam ~40ms por requisição e distorcem o benchmark
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _send(self, status, body):
+        payload = json.dumps(body, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _authorized(self):
+        key = self.server_fake.service_role_key
+        return self.headers.get('apikey') == key
+
+    def _prelude(self):
+        """Contagem, latência, falha injetada e autenticação; True = seguir"""
+
+        fake = self.server_fake
+        fake.count('requests')
+        if fake.faults.before_request():
+            fake.count('injected_failures')
+            self._send(503, {'message': 'upstream unavailable (falha injetada)'})
+            return False
+        if not self._authorized():
+            self._send(401, {'message': 'Invalid API key'})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._prelude():
+            return
+        if self.path.rstrip('/').split('?')[0] == '/rest/v1':
+            paths = {f'/rpc/{name}': {'post': {}} for name in RPC_FUNCTIONS}
+            self._send(200, {'swagger': '2.0', 'info': {'title': 'fake-postgrest'}, 'paths': paths})
+            return
+        self._send(404, {'message': 'not found'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if not self._prelude():
+            return
+
+        path = self.path.split('?')[0]
+        if not path.startswith('/rest/v1/rpc/'):
+            self._send(404, {'message': 'not found'})
+            return
+
+        try:
+            params = json.loads(raw or b'{}')
+        except ValueError:
+            self._send(400, {'code': 'PGRST102', 'message': 'Empty or invalid json'})
+            return
+
+        status, body = self.server_fake.call_rpc(path[len('/rest/v1/rpc/'):], params)
+        if status >= 400 or (isinstance(body, dict) and (body.get('success') is False or 'error' in body)):
+            self.server_fake.count('errors')
+        self._send(status, body)
+
+
+def build_backend(sqlite_path=None, dsn=None):
+    if dsn:
+        return PostgresBackend(dsn)
+    return SqliteBackend(sqlite_path or ':memory:')
+
+
+def add_fault_arguments(parser):
+    """Argumentos de latência/falha compartilhados com o benchmark"""
+
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='latência fixa por requisição')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='latência aleatória adicional (0..N)')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fração de requisições com 503')
+    parser.add_argument('--fail-first', type=int, default=0, help='as N primeiras requisições falham')
+    parser.add_argument('--seed', type=int, default=None, help='semente das falhas/latências')
+
+
+def faults_from_args(args):
+    return FaultInjector(
+        latency=args.latency_ms / 1000.0,
+        jitter=args.jitter_ms / 1000.0,
+        failure_rate=args.failure_rate,
+        fail_first=args.fail_first,
+        seed=args.seed
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Servidor PostgREST falso para migrations')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--key', default=DEFAULT_SERVICE_ROLE_KEY, help='service role key aceita')
+    backend = parser.add_mutually_exclusive_group()
+    backend.add_argument('--sqlite', help='arquivo SQLite (padrão: memória)')
+    backend.add_argument('--dsn', help='Postgres local (requer psycopg)')
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    server = FakePostgrest(
+        backend=build_backend(args.sqlite, args.dsn),
+        service_role_key=args.key,
+        faults=faults_from_args(args),
+        host=args.host,
+        port=args.port,
+        log=True
+    )
+
+    print("🧪 FAKE POSTGREST")
+    print("=" * 20)
+    print(f"   backend: {server.backend.name}")
+    print(f"   SUPABASE_URL={server.url}")
+    print(f"   SUPABASE_SERVICE_ROLE_KEY={args.key}")
+
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        server.backend.close()
+        print(f"\n📊 {server.stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
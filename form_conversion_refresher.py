@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+📈 CONVERSÃO DE FORMULÁRIOS: agregados diários form_conversion_daily
+===================================================================
+
+Mantém form_conversion_daily (migration
+20250825000002-create-form-conversion-daily.sql) com views e submissões por
+(formulário, dia UTC); conversion_rate é coluna gerada com a mesma regra de
+calculate_form_conversion_rate(). Os dashboards leem os buckets prontos.
+
+Formulários: custom_forms do tenant (form_submissions.form_id referencia
+custom_forms). Fontes:
+- views: linhas agregadas de form_analytics (views por form_id e date),
+  somadas por dia; são contadores atualizados no lugar, então cada dia
+  tocado é recalculado por inteiro (valor absoluto);
+- submissões: form_submissions (submitted_at), somadas como delta.
+
+Modos, por tenant e em paralelo entre tenants:
+
+- incremental (padrão): lê as submissões e os agregados alterados
+  (updated_at) depois do watermark do tenant (form_conversion_watermarks)
+  e até agora - --lag-seconds, recalcula as views dos dias tocados e aplica
+  tudo + novo watermark em uma única chamada RPC
+  (apply_form_conversion_deltas), que recusa janelas já aplicadas;
+- rebuild: recontagem completa, regrava todos os buckets do tenant, remove
+  os que não existem mais e reposiciona o watermark. Tenants sem watermark
+  passam por rebuild automaticamente. Pause o incremental enquanto roda.
+
+Submissões gravadas com atraso maior que --lag-seconds (timestamp anterior
+ao watermark) só entram no próximo rebuild. Views não têm esse problema:
+um agregado alterado depois de until é recalculado de novo na próxima janela.
+
+Uso:
+    python form_conversion_refresher.py --all-tenants --workers 4
+    python form_conversion_refresher.py --tenant <uuid> --rebuild [--dry-run]
+    python form_conversion_refresher.py --show <form_id> [--days 30]
+"""
+
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+from supabase_rest import (Throughput, add_backend_argument, chunked, connect, in_filter, list_tenant_ids,
+                           parse_timestamp)
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_LAG_SECONDS = 300
+DEFAULT_SHOW_DAYS = 30
+
+DAILY_TABLE = 'form_conversion_daily'
+WATERMARK_TABLE = 'form_conversion_watermarks'
+DELTAS_RPC = 'apply_form_conversion_deltas'
+
+
+def conversion_rate(views, submissions):
+    """Mesma fórmula de calculate_form_conversion_rate()"""
+    return round(submissions / views * 100, 2) if views > 0 else 0
+
+
+class ConversionBuckets:
+    """Views (total do dia; None = dia não recalculado) e submissões por (form_id, dia)"""
+
+    def __init__(self):
+        self.buckets = {}
+        self.views = 0
+        self.submissions = 0
+
+    def add(self, form_id, day, views=None, submissions=0):
+        slot = self.buckets.setdefault((form_id, day), [None, 0])
+        if views is not None:
+            slot[0] = (slot[0] or 0) + views
+            self.views += views
+        slot[1] += submissions
+        self.submissions += submissions
+
+    def rows(self):
+        return [
+            {'form_id': form_id, 'day': day, 'views': views, 'submissions': submissions}
+            for (form_id, day), (views, submissions) in self.buckets.items()
+        ]
+
+    def __len__(self):
+        return len(self.buckets)
+
+
+class EventWindow:
+    """Janela (since, until] de timestamps a agregar"""
+
+    def __init__(self, since, until):
+        self.since = since
+        self.until = until
+        self.outside = 0
+
+    def day_of(self, value):
+        """Dia UTC do evento, ou None se fora da janela"""
+
+        moment = parse_timestamp(value) if value else None
+        if moment is None or moment > self.until or (self.since is not None and moment <= self.since):
+            self.outside += 1
+            return None
+        return moment.astimezone(timezone.utc).date().isoformat()
+
+    def filter(self, column):
+        return {column: f'gt.{self.since.isoformat()}'} if self.since is not None else {}
+
+
+def load_form_ids(client, tenant_id):
+    return [row['id'] for rows in client.fetch_keyset('custom_forms', 'id', filters={'tenant_id': f'eq.{tenant_id}'})
+            for row in rows]
+
+
+def touched_days(client, form_ids, window, chunk_size):
+    """(form_id, date) com agregado alterado depois do watermark"""
+
+    touched = set()
+    filters = dict({'form_id': in_filter(form_ids)}, **window.filter('updated_at'))
+    for rows in client.fetch_keyset('form_analytics', 'id,form_id,date', filters=filters, page_size=chunk_size):
+        touched.update((row['form_id'], row['date']) for row in rows)
+    return touched
+
+
+def collect_views(client, form_ids, window, buckets, chunk_size):
+    """Somar form_analytics.views por dia: todos os dias no rebuild, só os tocados no incremental"""
+
+    scanned = 0
+    for batch in chunked(form_ids, 200):
+        touched = None
+        filters = {'form_id': in_filter(batch)}
+        if window.since is not None:
+            touched = touched_days(client, batch, window, chunk_size)
+            if not touched:
+                continue
+            filters = {
+                'form_id': in_filter(sorted({form_id for form_id, _ in touched})),
+                'date': in_filter(sorted({day for _, day in touched}))
+            }
+        for rows in client.fetch_keyset('form_analytics', 'id,form_id,date,views', filters=filters,
+                                        page_size=chunk_size):
+            scanned += len(rows)
+            for row in rows:
+                if touched is None or (row['form_id'], row['date']) in touched:
+                    buckets.add(row['form_id'], row['date'], views=row['views'] or 0)
+    return scanned
+
+
+def collect_submissions(client, form_ids, window, buckets, chunk_size):
+    for batch in chunked(form_ids, 200):
+        filters = dict({'form_id': in_filter(batch)}, **window.filter('submitted_at'))
+        for rows in client.fetch_keyset('form_submissions', 'id,form_id,submitted_at', filters=filters,
+                                        page_size=chunk_size):
+            for row in rows:
+                day = window.day_of(row['submitted_at'])
+                if day is not None:
+                    buckets.add(row['form_id'], day, submissions=1)
+
+
+def load_watermark(client, tenant_id):
+    rows = client.select(WATERMARK_TABLE, {'select': 'refreshed_until', 'tenant_id': f'eq.{tenant_id}'}) or []
+    return rows[0]['refreshed_until'] if rows else None
+
+
+def write_rebuild(client, tenant_id, buckets, until, batch_size):
+    """Regravar todos os buckets do tenant e reposicionar o watermark"""
+
+    started_at = datetime.now(timezone.utc).isoformat()
+    rows = [dict(row, views=row['views'] or 0, tenant_id=tenant_id, updated_at=started_at)
+            for row in buckets.rows()]
+    written = 0
+    for batch in chunked(rows, batch_size):
+        client.upsert(DAILY_TABLE, batch, on_conflict='form_id,day')
+        written += len(batch)
+    client.delete(DAILY_TABLE, {'tenant_id': f'eq.{tenant_id}', 'updated_at': f'lt.{started_at}'})
+    client.upsert(WATERMARK_TABLE, [{'tenant_id': tenant_id, 'refreshed_until': until.isoformat(),
+                                     'updated_at': started_at}], on_conflict='tenant_id')
+    return written
+
+
+def refresh_tenant(tenant_id, rebuild=False, lag_seconds=DEFAULT_LAG_SECONDS, chunk_size=DEFAULT_CHUNK_SIZE,
+                   batch_size=DEFAULT_BATCH_SIZE, dry_run=False, client=None, backend='rest'):
+    """Atualizar os agregados de um tenant; retorna dicionário de estatísticas"""
+
+    client = client or connect(backend)
+    meter = Throughput()
+    until = datetime.now(timezone.utc) - timedelta(seconds=lag_seconds)
+
+    watermark = load_watermark(client, tenant_id)
+    rebuild = rebuild or watermark is None
+    window = EventWindow(None if rebuild else parse_timestamp(watermark), until)
+
+    totals = {'tenant_id': tenant_id, 'mode': 'rebuild' if rebuild else 'incremental', 'forms': 0,
+              'views': 0, 'submissions': 0, 'buckets': 0, 'outside': 0, 'written': 0, 'rows': 0,
+              'up_to_date': False}
+
+    if window.since is not None and window.since >= until:
+        totals.update(up_to_date=True, elapsed=meter.elapsed, rows_per_second=0.0,
+                      round_trips=client.round_trips)
+        return totals
+
+    form_ids = load_form_ids(client, tenant_id)
+    buckets = ConversionBuckets()
+    scanned = collect_views(client, form_ids, window, buckets, chunk_size)
+    collect_submissions(client, form_ids, window, buckets, chunk_size)
+    meter.add(scanned + buckets.submissions + window.outside)
+
+    totals.update(forms=len(form_ids), views=buckets.views, submissions=buckets.submissions,
+                  buckets=len(buckets), outside=window.outside, rows=meter.rows)
+
+    if not dry_run:
+        if rebuild:
+            totals['written'] = write_rebuild(client, tenant_id, buckets, until, batch_size)
+        else:
+            # deltas e watermark na mesma transação: uma única chamada por janela
+            totals['written'] = client.rpc(DELTAS_RPC, {
+                'p_tenant_id': tenant_id,
+                'p_since': watermark,
+                'p_until': until.isoformat(),
+                'p_deltas': buckets.rows()
+            }) or 0
+
+    totals['elapsed'] = meter.elapsed
+    totals['rows_per_second'] = meter.rate
+    totals['round_trips'] = client.round_trips
+    return totals
+
+
+def conversion_series(client, form_id, days=DEFAULT_SHOW_DAYS):
+    """Buckets diários de um formulário nos últimos `days` dias"""
+
+    start = (datetime.now(timezone.utc) - timedelta(days=days)).date().isoformat()
+    return client.select(DAILY_TABLE, {
+        'select': 'day,views,submissions,conversion_rate::text',
+        'form_id': f'eq.{form_id}',
+        'day': f'gte.{start}',
+        'order': 'day.asc'
+    }) or []
+
+
+def print_report(totals):
+    print(f"\n📊 Tenant {totals['tenant_id']} ({totals['mode']})")
+    if totals['up_to_date']:
+        print("   nada a agregar (watermark dentro do lag)")
+        return
+    print(f"   formulários:   {totals['forms']}")
+    print(f"   views:         {totals['views']} (dias recalculados)")
+    print(f"   submissões:    {totals['submissions']}")
+    print(f"   buckets:       {totals['buckets']} (gravados: {totals['written']})")
+    print(f"   fora da janela: {totals['outside']}")
+    print(f"   {totals['rows_per_second']:,.0f} linhas/s, {totals['round_trips']} round trips")
+
+
+def run_refresh(args):
+    tenants = list(args.tenant)
+    if args.all_tenants:
+        tenants.extend(t for t in list_tenant_ids(connect(args.backend)) if t not in tenants)
+
+    print(f"   tenants: {len(tenants)} | workers: {args.workers} | rebuild: {args.rebuild} | "
+          f"lag: {args.lag_seconds}s | dry-run: {args.dry_run}")
+
+    meter = Throughput()
+    failures = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {
+            executor.submit(refresh_tenant, tenant_id, args.rebuild, args.lag_seconds, args.chunk_size,
+                            args.batch_size, args.dry_run, backend=args.backend): tenant_id
+            for tenant_id in tenants
+        }
+        for future in as_completed(futures):
+            tenant_id = futures[future]
+            try:
+                totals = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"\n❌ Tenant {tenant_id}: {e}")
+                continue
+            meter.add(totals['rows'])
+            print_report(totals)
+
+    print(f"\n🏁 TOTAL: {meter}")
+    if failures:
+        print(f"⚠️  {failures} tenant(s) falharam")
+        return 1
+    return 0
+
+
+def run_show(args):
+    rows = conversion_series(connect(args.backend), args.show, args.days)
+    print(f"\n{'dia':<12} {'views':>8} {'submissões':>11} {'conversão':>10}")
+    for row in rows:
+        print(f"{row['day']:<12} {row['views']:>8} {row['submissions']:>11} {row['conversion_rate']:>9}%")
+    views = sum(row['views'] for row in rows)
+    submissions = sum(row['submissions'] for row in rows)
+    print(f"{'TOTAL':<12} {views:>8} {submissions:>11} {conversion_rate(views, submissions):>9}%")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Agregados diários de conversão de formulários')
+    parser.add_argument('--tenant', action='append', default=[], help='tenant_id (pode repetir)')
+    parser.add_argument('--all-tenants', action='store_true', help='processar todas as empresas')
+    parser.add_argument('--rebuild', action='store_true', help='recontagem completa em vez de incremental')
+    parser.add_argument('--show', metavar='FORM_ID', help='mostrar os buckets de um formulário')
+    parser.add_argument('--days', type=int, default=DEFAULT_SHOW_DAYS, help='--show: dias exibidos')
+    parser.add_argument('--workers', type=int, default=4, help='tenants processados em paralelo')
+    parser.add_argument('--lag-seconds', type=int, default=DEFAULT_LAG_SECONDS,
+                        help='não agregar eventos mais novos que isso (transações em andamento)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='linhas por página de leitura')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='buckets por upsert (rebuild)')
+    parser.add_argument('--dry-run', action='store_true', help='apenas calcular')
+    add_backend_argument(parser)
+    args = parser.parse_args(argv)
+    if not args.show and not (args.tenant or args.all_tenants):
+        parser.error('informe --tenant, --all-tenants ou --show')
+
+    print("📈 CONVERSÃO DE FORMULÁRIOS: form_conversion_daily")
+    print("=" * 50)
+
+    if args.show:
+        return run_show(args)
+    return run_refresh(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
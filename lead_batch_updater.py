@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+✏️ ATUALIZAÇÃO EM LOTE: leads_master via safe_update_leads_batch
+================================================================
+
+Aplica muitas atualizações de leads com as mesmas regras de
+safe_update_lead(target_lead_id, lead_data) (migrations 20250128000002/4/5):
+só colunas editáveis de leads_master, valores nulos não apagam o atual,
+updated_at = now() e nome sincronizado em pipeline_leads.
+
+Em vez de uma chamada RPC por lead, as atualizações vão em blocos de
+--chunk-size para safe_update_leads_batch (migration
+20250825000004-create-safe-update-leads-batch.sql), que aplica o bloco em um
+único UPDATE e, se alguma linha falhar, isola o erro linha a linha. Cada
+linha rejeitada é reportada com a linha do arquivo, lead_id, error_code e
+error, como safe_update_lead devolveria.
+
+Entrada:
+- CSV com a coluna lead_id e uma coluna por campo (células vazias são
+  ignoradas);
+- JSON lines com {"lead_id": ..., "data": {...}} ou com os campos direto
+  no objeto.
+
+Uso:
+    python lead_batch_updater.py --input updates.csv [--chunk-size 200]
+    python lead_batch_updater.py --input updates.jsonl --errors rejeitados.jsonl
+"""
+
+import argparse
+import csv
+import json
+import sys
+
+from supabase_rest import SupabaseRestError, Throughput, add_backend_argument, chunked, connect
+
+DEFAULT_CHUNK_SIZE = 200
+MAX_CHUNK_SIZE = 1000  # limite de safe_update_leads_batch
+BATCH_RPC = 'safe_update_leads_batch'
+SHOW_ERRORS = 20
+
+
+def read_updates(path):
+    """Ler (linha do arquivo, {'lead_id', 'data'}) de CSV ou JSON lines"""
+
+    updates = []
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.jsonl') or path.endswith('.ndjson'):
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                data = row['data'] if 'data' in row else {k: v for k, v in row.items() if k != 'lead_id'}
+                updates.append((line_no, {'lead_id': row.get('lead_id'), 'data': data}))
+        else:
+            # linha 1 é o cabeçalho
+            for line_no, row in enumerate(csv.DictReader(f), 2):
+                data = {k: v for k, v in row.items() if k != 'lead_id' and v not in (None, '')}
+                updates.append((line_no, {'lead_id': row.get('lead_id'), 'data': data}))
+    return updates
+
+
+def apply_chunk(client, chunk):
+    """Enviar um bloco; retorna (resultado por linha, modo usado pela função)"""
+
+    try:
+        response = client.rpc(BATCH_RPC, {'p_updates': [update for _, update in chunk]})
+    except SupabaseRestError as e:
+        # falha da chamada inteira (rede, timeout, limite): todas as linhas do bloco ficam sem resposta
+        return [{'lead_id': update['lead_id'], 'success': False, 'error': str(e), 'error_code': 'RPC_ERROR'}
+                for _, update in chunk], 'error'
+    return response['results'], response['mode']
+
+
+def update_leads(client, updates, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Aplicar todas as atualizações; retorna (estatísticas, rejeitadas)"""
+
+    meter = Throughput()
+    totals = {'rows': len(updates), 'updated': 0, 'failed': 0, 'chunks': 0, 'row_mode_chunks': 0,
+              'pipeline_leads_synced': 0}
+    rejected = []
+
+    for chunk in chunked(updates, chunk_size):
+        results, mode = apply_chunk(client, chunk)
+        totals['chunks'] += 1
+        if mode != 'set':
+            totals['row_mode_chunks'] += 1
+        for (line_no, _), result in zip(chunk, results):
+            if result['success']:
+                totals['updated'] += 1
+                totals['pipeline_leads_synced'] += result.get('pipeline_leads_synced') or 0
+            else:
+                totals['failed'] += 1
+                rejected.append({'line': line_no, 'lead_id': result['lead_id'],
+                                 'error_code': result['error_code'], 'error': result['error']})
+        meter.add(len(chunk))
+        print(f"   📦 bloco {totals['chunks']}: {len(chunk)} linhas ({mode}) | {meter}")
+
+    totals['elapsed'] = meter.elapsed
+    totals['rows_per_second'] = meter.rate
+    totals['round_trips'] = client.round_trips
+    return totals, rejected
+
+
+def duplicate_count(updates):
+    lead_ids = [update['lead_id'] for _, update in updates]
+    return len(lead_ids) - len(set(lead_ids))
+
+
+def print_report(totals, rejected):
+    print(f"\n📊 Atualizações: {totals['rows']}")
+    print(f"   aplicadas:   {totals['updated']}")
+    print(f"   rejeitadas:  {totals['failed']}")
+    print(f"   pipeline_leads ressincronizados: {totals['pipeline_leads_synced']}")
+    print(f"   blocos: {totals['chunks']} (linha a linha: {totals['row_mode_chunks']})")
+    print(f"   {totals['rows_per_second']:,.0f} linhas/s, {totals['round_trips']} round trips")
+    for item in rejected[:SHOW_ERRORS]:
+        print(f"   ❌ linha {item['line']} ({item['lead_id']}): [{item['error_code']}] {item['error']}")
+    if len(rejected) > SHOW_ERRORS:
+        print(f"   ... e mais {len(rejected) - SHOW_ERRORS}")
+
+
+def write_errors(path, rejected):
+    with open(path, 'w', encoding='utf-8') as f:
+        for item in rejected:
+            f.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Atualizar leads em lote com as regras de safe_update_lead')
+    parser.add_argument('--input', required=True, help='CSV ou JSON lines com lead_id e campos')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f'atualizações por chamada (máx. {MAX_CHUNK_SIZE})')
+    parser.add_argument('--errors', help='gravar as linhas rejeitadas neste arquivo (JSON lines)')
+    parser.add_argument('--dry-run', action='store_true', help='apenas ler e validar o arquivo')
+    add_backend_argument(parser)
+    args = parser.parse_args(argv)
+    if not 1 <= args.chunk_size <= MAX_CHUNK_SIZE:
+        parser.error(f'--chunk-size deve estar entre 1 e {MAX_CHUNK_SIZE}')
+
+    print("✏️ ATUALIZAÇÃO EM LOTE: leads_master")
+    print("=" * 50)
+
+    updates = read_updates(args.input)
+    duplicates = duplicate_count(updates)
+    print(f"   atualizações: {len(updates)} | bloco: {args.chunk_size} | dry-run: {args.dry_run}")
+    if duplicates:
+        # lead repetido no mesmo bloco faz a função aplicar o bloco linha a linha, em ordem
+        print(f"⚠️  {duplicates} lead_id(s) repetidos: blocos com repetição são aplicados linha a linha")
+    if args.dry_run or not updates:
+        return 0
+
+    totals, rejected = update_leads(connect(args.backend), updates, args.chunk_size)
+    print_report(totals, rejected)
+    if args.errors and rejected:
+        write_errors(args.errors, rejected)
+        print(f"📋 Rejeitadas gravadas em {args.errors}")
+
+    print(f"\n🏁 TOTAL: {totals['updated']}/{totals['rows']} leads atualizados")
+    return 1 if rejected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+🎯 SIMULADOR DE DISTRIBUIÇÃO: Rodízio + Horário Comercial (offline)
+===================================================================
+
+Reproduz a lógica de DistributionService.distributeRoundRobin
+(backend/src/services/distributionService.ts) e de is_within_working_hours
+(20250811000001_add_working_hours_fields_to_distribution_rules.sql) sobre
+um modelo em memória baseado em arrays, sem criar leads reais.
+
+O modelo vem de um snapshot JSON ou é lido do Supabase:
+
+    {
+      "rules":   [{"pipeline_id": "...", "mode": "rodizio", "is_active": true,
+                   "working_hours_only": true, "working_hours_start": "09:00:00",
+                   "working_hours_end": "18:00:00", "working_days": [2,3,4,5,6],
+                   "skip_inactive_members": true, "fallback_to_manual": true,
+                   "last_assigned_member_id": null}],
+      "members": [{"pipeline_id": "...", "member_id": "...", "is_active": true}]
+    }
+
+Leads são lidos de CSV ou JSON lines com as colunas pipeline_id e created_at.
+
+Uso:
+    python lead_distribution_simulator.py --snapshot regras.json --leads leads.csv
+    python lead_distribution_simulator.py --snapshot atual.json --compare nova.json --leads leads.csv
+    python lead_distribution_simulator.py --snapshot regras.json --benchmark 200000
+    python lead_distribution_simulator.py --tenant <uuid> --export-snapshot regras.json
+"""
+
+import argparse
+import csv
+import json
+import random
+import sys
+import time
+from array import array
+from datetime import datetime, timedelta
+
+from supabase_rest import parse_timestamp
+
+# Resultados possíveis (mesmos "method" do DistributionService)
+ASSIGNED = 0     # rodizio: lead atribuído
+MANUAL = 1       # regra inexistente, inativa ou modo manual
+FALLBACK = 2     # fora do horário / sem membros, com fallback_to_manual
+REJECTED = 3     # fora do horário / sem membros, sem fallback
+
+OUTCOME_LABELS = {
+    ASSIGNED: 'rodizio',
+    MANUAL: 'manual',
+    FALLBACK: 'fallback',
+    REJECTED: 'rejeitado',
+}
+
+ALL_DAYS_MASK = 0b1111111
+END_OF_DAY = 24 * 3600 - 1
+
+
+def parse_time_of_day(value):
+    """'HH:MM[:SS]' -> segundos desde meia-noite"""
+
+    parts = [int(p) for p in str(value).split(':')]
+    while len(parts) < 3:
+        parts.append(0)
+    return parts[0] * 3600 + parts[1] * 60 + parts[2]
+
+
+def day_of_week(moment):
+    """Dia da semana no formato do banco (1=Domingo ... 7=Sábado)"""
+    return (moment.isoweekday() % 7) + 1
+
+
+class DistributionModel:
+    """Regras, membros e contadores em arrays paralelos (um slot por pipeline)
+
+    Os membros de cada pipeline ficam em um único vetor contíguo; o pipeline
+    `p` ocupa member_ids[offsets[p]:offsets[p + 1]] em ordem de id, como a
+    função assign_lead_round_robin_advanced.
+    """
+
+    def __init__(self):
+        self.pipeline_ids = []
+        self.pipeline_index = {}
+
+        self.auto = bytearray()          # regra ativa em modo rodizio
+        self.hours_only = bytearray()
+        self.fallback = bytearray()
+        self.day_mask = bytearray()      # bit (dia - 1) ligado se o dia é útil
+        self.start_s = array('i')
+        self.end_s = array('i')
+        self.position = array('i')       # índice do último membro atribuído (-1 = nenhum)
+
+        self.offsets = array('i', [0])
+        self.member_ids = []
+        self.member_counts = array('q')  # leads atribuídos por slot de membro
+
+        self.outcomes = array('q', [0, 0, 0, 0])
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        model = cls()
+
+        members_by_pipeline = {}
+        for member in snapshot.get('members', []):
+            members_by_pipeline.setdefault(member['pipeline_id'], []).append(member)
+
+        for rule in snapshot.get('rules', []):
+            pipeline_id = rule['pipeline_id']
+            slot = len(model.pipeline_ids)
+            model.pipeline_ids.append(pipeline_id)
+            model.pipeline_index[pipeline_id] = slot
+
+            model.auto.append(1 if rule.get('is_active', True) and rule.get('mode') == 'rodizio' else 0)
+            model.hours_only.append(1 if rule.get('working_hours_only') else 0)
+            model.fallback.append(1 if rule.get('fallback_to_manual', True) else 0)
+
+            # Como no backend: sem dias/horários configurados, não há restrição
+            mask = ALL_DAYS_MASK
+            if rule.get('working_days'):
+                mask = 0
+                for day in rule['working_days']:
+                    mask |= 1 << (int(day) - 1)
+            model.day_mask.append(mask)
+            if rule.get('working_hours_start') and rule.get('working_hours_end'):
+                model.start_s.append(parse_time_of_day(rule['working_hours_start']))
+                model.end_s.append(parse_time_of_day(rule['working_hours_end']))
+            else:
+                model.start_s.append(0)
+                model.end_s.append(END_OF_DAY)
+
+            skip_inactive = rule.get('skip_inactive_members', True)
+            eligible = sorted(
+                m['member_id'] for m in members_by_pipeline.get(pipeline_id, [])
+                if not skip_inactive or m.get('is_active', True) is not False
+            )
+            last_assigned = rule.get('last_assigned_member_id')
+            model.position.append(eligible.index(last_assigned) if last_assigned in eligible else -1)
+
+            model.member_ids.extend(eligible)
+            model.member_counts.extend([0] * len(eligible))
+            model.offsets.append(len(model.member_ids))
+
+        return model
+
+    def within_working_hours(self, slot, seconds, weekday):
+        if not self.hours_only[slot]:
+            return True
+        if not (self.day_mask[slot] >> (weekday - 1)) & 1:
+            return False
+        start = self.start_s[slot]
+        end = self.end_s[slot]
+        if start <= end:
+            return start <= seconds <= end
+        # Overnight: 22:00 - 06:00
+        return seconds >= start or seconds <= end
+
+    def assign(self, pipeline_id, moment):
+        """Distribuir um lead; retorna (resultado, member_id ou None)"""
+
+        slot = self.pipeline_index.get(pipeline_id)
+        if slot is None or not self.auto[slot]:
+            self.outcomes[MANUAL] += 1
+            return MANUAL, None
+
+        seconds = moment.hour * 3600 + moment.minute * 60 + moment.second
+        if not self.within_working_hours(slot, seconds, day_of_week(moment)):
+            outcome = FALLBACK if self.fallback[slot] else REJECTED
+            self.outcomes[outcome] += 1
+            return outcome, None
+
+        first = self.offsets[slot]
+        size = self.offsets[slot + 1] - first
+        if size == 0:
+            outcome = FALLBACK if self.fallback[slot] else REJECTED
+            self.outcomes[outcome] += 1
+            return outcome, None
+
+        position = (self.position[slot] + 1) % size
+        self.position[slot] = position
+        self.member_counts[first + position] += 1
+        self.outcomes[ASSIGNED] += 1
+        return ASSIGNED, self.member_ids[first + position]
+
+    def replay(self, leads):
+        """Distribuir uma sequência de (pipeline_id, datetime); retorna qtd. processada"""
+
+        assign = self.assign
+        processed = 0
+        for pipeline_id, moment in leads:
+            assign(pipeline_id, moment)
+            processed += 1
+        return processed
+
+    def assignments_by_member(self):
+        """{(pipeline_id, member_id): leads atribuídos}"""
+
+        result = {}
+        for slot, pipeline_id in enumerate(self.pipeline_ids):
+            for i in range(self.offsets[slot], self.offsets[slot + 1]):
+                result[(pipeline_id, self.member_ids[i])] = self.member_counts[i]
+        return result
+
+
+def read_leads(path, timezone=None):
+    """Ler leads de CSV ou JSON lines -> lista de (pipeline_id, datetime)"""
+
+    tz = None
+    if timezone:
+        from zoneinfo import ZoneInfo
+        tz = ZoneInfo(timezone)
+
+    def convert(row):
+        moment = parse_timestamp(row['created_at'])
+        if tz is not None and moment.tzinfo is not None:
+            moment = moment.astimezone(tz)
+        return row['pipeline_id'], moment
+
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.jsonl') or path.endswith('.ndjson') or path.endswith('.log'):
+            return [convert(json.loads(line)) for line in f if line.strip()]
+        return [convert(row) for row in csv.DictReader(f)]
+
+
+def synthetic_leads(pipeline_ids, count, seed=42):
+    """Leads aleatórios espalhados por uma semana, para benchmark"""
+
+    rng = random.Random(seed)
+    base = datetime(2025, 1, 5)  # domingo
+    week = 7 * 24 * 3600
+    return [
+        (rng.choice(pipeline_ids), base + timedelta(seconds=rng.randrange(week)))
+        for _ in range(count)
+    ]
+
+
+def load_snapshot(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def fetch_snapshot(tenant_id):
+    """Montar snapshot a partir do Supabase (regras + membros do tenant)"""
+
+    from supabase_rest import SupabaseRest, in_filter, chunked
+
+    client = SupabaseRest()
+    rule_columns = ('pipeline_id,mode,is_active,working_hours_only,working_hours_start,'
+                    'working_hours_end,working_days,skip_inactive_members,fallback_to_manual,'
+                    'last_assigned_member_id')
+
+    pipeline_ids = [row['id'] for rows in client.fetch_keyset(
+        'pipelines', 'id', filters={'tenant_id': f'eq.{tenant_id}'}) for row in rows]
+
+    rules = []
+    pipeline_members = []
+    for batch in chunked(pipeline_ids, 200):
+        rules.extend(client.select('pipeline_distribution_rules',
+                                   {'select': rule_columns, 'pipeline_id': in_filter(batch)}) or [])
+        pipeline_members.extend(client.select('pipeline_members',
+                                              {'select': 'pipeline_id,member_id',
+                                               'pipeline_id': in_filter(batch)}) or [])
+
+    users = {}
+    member_ids = sorted({m['member_id'] for m in pipeline_members})
+    for batch in chunked(member_ids, 200):
+        for user in client.select('users', {'select': 'id,is_active,tenant_id',
+                                            'id': in_filter(batch)}) or []:
+            users[user['id']] = user
+
+    members = []
+    for member in pipeline_members:
+        user = users.get(member['member_id'])
+        # getEligibleMembers filtra pelo tenant do usuário
+        if user is None or user.get('tenant_id') != tenant_id:
+            continue
+        members.append({
+            'pipeline_id': member['pipeline_id'],
+            'member_id': member['member_id'],
+            'is_active': user.get('is_active', True)
+        })
+
+    return {'rules': rules, 'members': members}
+
+
+def run(snapshot, leads):
+    model = DistributionModel.from_snapshot(snapshot)
+    started = time.perf_counter()
+    processed = model.replay(leads)
+    elapsed = time.perf_counter() - started
+    return model, processed, elapsed
+
+
+def print_summary(title, model, processed, elapsed):
+    rate = processed / elapsed if elapsed > 0 else 0.0
+    print(f"\n📊 {title}")
+    print(f"   leads: {processed} em {elapsed:.3f}s ({rate:,.0f} leads/s)")
+    for code, label in OUTCOME_LABELS.items():
+        print(f"   {label:<10} {model.outcomes[code]}")
+
+
+def print_distribution(model):
+    print("\n👥 ATRIBUIÇÕES POR MEMBRO:")
+    for (pipeline_id, member_id), count in sorted(model.assignments_by_member().items()):
+        print(f"   {pipeline_id[:8]} {member_id[:8]}: {count}")
+
+
+def print_comparison(model_a, model_b):
+    print("\n⚖️  COMPARAÇÃO (atual -> nova):")
+    for code, label in OUTCOME_LABELS.items():
+        delta = model_b.outcomes[code] - model_a.outcomes[code]
+        print(f"   {label:<10} {model_a.outcomes[code]} -> {model_b.outcomes[code]} ({delta:+d})")
+
+    counts_a = model_a.assignments_by_member()
+    counts_b = model_b.assignments_by_member()
+    changed = [
+        (key, counts_a.get(key, 0), counts_b.get(key, 0))
+        for key in sorted(set(counts_a) | set(counts_b))
+        if counts_a.get(key, 0) != counts_b.get(key, 0)
+    ]
+    if not changed:
+        print("   ✅ Distribuição por membro idêntica")
+        return
+    for (pipeline_id, member_id), before, after in changed:
+        print(f"   {pipeline_id[:8]} {member_id[:8]}: {before} -> {after} ({after - before:+d})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Simulador offline de distribuição de leads')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--snapshot', help='arquivo JSON com regras e membros')
+    source.add_argument('--tenant', help='ler regras e membros do Supabase')
+    parser.add_argument('--export-snapshot', help='salvar o snapshot lido em arquivo JSON')
+    parser.add_argument('--compare', help='snapshot alternativo para comparar com o atual')
+    parser.add_argument('--leads', help='CSV ou JSON lines com pipeline_id e created_at')
+    parser.add_argument('--timezone', help='converter timestamps com fuso para este fuso (ex.: America/Sao_Paulo)')
+    parser.add_argument('--benchmark', type=int, metavar='N', help='replay de N leads sintéticos')
+    parser.add_argument('--seed', type=int, default=42, help='semente dos leads sintéticos')
+    parser.add_argument('--per-member', action='store_true', help='listar atribuições por membro')
+    args = parser.parse_args(argv)
+
+    snapshot = load_snapshot(args.snapshot) if args.snapshot else fetch_snapshot(args.tenant)
+    if args.export_snapshot:
+        with open(args.export_snapshot, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, indent=2, ensure_ascii=False)
+        print(f"💾 Snapshot salvo em {args.export_snapshot}")
+
+    if args.leads:
+        leads = read_leads(args.leads, args.timezone)
+    elif args.benchmark:
+        pipeline_ids = [rule['pipeline_id'] for rule in snapshot.get('rules', [])]
+        if not pipeline_ids:
+            parser.error('snapshot sem regras para gerar leads sintéticos')
+        leads = synthetic_leads(pipeline_ids, args.benchmark, args.seed)
+    elif args.export_snapshot:
+        return 0
+    else:
+        parser.error('informe --leads ou --benchmark')
+
+    print("🎯 SIMULAÇÃO DE DISTRIBUIÇÃO DE LEADS")
+    print("=" * 40)
+
+    model, processed, elapsed = run(snapshot, leads)
+    print_summary('ATUAL' if args.compare else 'RESULTADO', model, processed, elapsed)
+    if args.per_member:
+        print_distribution(model)
+
+    if args.compare:
+        model_b, processed_b, elapsed_b = run(load_snapshot(args.compare), leads)
+        print_summary('NOVA', model_b, processed_b, elapsed_b)
+        print_comparison(model, model_b)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
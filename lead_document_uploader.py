@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+📎 UPLOAD EM LOTE: documentos de leads (lead_documents)
+======================================================
+
+Envia muitos arquivos do disco para o bucket lead-documents e grava os
+metadados em lead_documents com as mesmas regras da rota de upload
+(backend/src/routes/leadDocuments.ts):
+
+- extensões permitidas e limite de 10MB (constraints check_file_extension
+  e check_file_size);
+- o lead precisa existir em pipeline_leads; tenant_id vem do lead;
+- storage_path = <tenant_id>/<lead_id>/<uuid><extensão>;
+- se o INSERT falhar, o arquivo enviado é removido do storage.
+
+Os arquivos nunca são carregados inteiros na memória: o SHA-256 é
+calculado lendo blocos de 1MB e o upload lê do arquivo aberto em blocos.
+Arquivos com o mesmo conteúdo de um documento ativo do lead (content_hash,
+migration 20250825000005-add-lead-documents-content-hash.sql), ou repetidos
+na própria carga, são pulados antes do upload.
+
+Hash + upload rodam em um pool de --workers threads com no máximo
+2 x --workers arquivos em andamento; os metadados são inseridos em lotes
+de --batch-size pela thread principal.
+
+Entrada:
+- --dir: <dir>/<lead_id>/<arquivos>;
+- --manifest: CSV ou JSON lines com lead_id e path (relativo ao manifest).
+
+Storage:
+- local (padrão): stand-in em disco, <--storage-dir>/<bucket>/<storage_path>;
+- supabase: Storage API (SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY).
+
+Uso:
+    python lead_document_uploader.py --dir ./documentos --uploaded-by <uuid> [--dry-run]
+    python lead_document_uploader.py --manifest arquivos.csv --uploaded-by <uuid> --storage supabase --workers 8
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import sys
+import threading
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+from supabase_rest import (DEFAULT_TIMEOUT, SupabaseRestError, Throughput, add_backend_argument, chunked, connect,
+                           in_filter, load_config)
+
+ALLOWED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.pdf', '.csv', '.xlsx', '.xls')
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB, mesmo limite de check_file_size
+READ_CHUNK = 1024 * 1024
+DEFAULT_BUCKET = 'lead-documents'
+DEFAULT_STORAGE_DIR = '.storage'
+DEFAULT_WORKERS = 8
+DEFAULT_BATCH_SIZE = 100
+LEAD_CHUNK = 200
+SHOW_ERRORS = 20
+DUPLICATE_ERRORS = (409, '23505')  # PostgREST / SQLSTATE unique_violation
+
+
+class LocalStorage:
+    """Stand-in do Supabase Storage em disco: <root>/<bucket>/<storage_path>"""
+
+    def __init__(self, root=DEFAULT_STORAGE_DIR, bucket=DEFAULT_BUCKET):
+        self.root = os.path.join(root, bucket)
+
+    def upload(self, storage_path, stream, content_type):
+        target = os.path.join(self.root, storage_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        partial = f"{target}.part"
+        with open(partial, 'wb') as f:
+            shutil.copyfileobj(stream, f, READ_CHUNK)
+        os.replace(partial, target)
+
+    def remove(self, storage_paths):
+        for storage_path in storage_paths:
+            try:
+                os.remove(os.path.join(self.root, storage_path))
+            except FileNotFoundError:
+                pass
+
+
+class SupabaseStorage:
+    """Storage API do Supabase (/storage/v1), uma sessão HTTP por thread"""
+
+    def __init__(self, bucket=DEFAULT_BUCKET, timeout=DEFAULT_TIMEOUT):
+        url, key = load_config()
+        self.base_url = f"{url}/storage/v1/object/{bucket}"
+        self.headers = {'apikey': key, 'Authorization': f'Bearer {key}'}
+        self.timeout = timeout
+        self.local = threading.local()
+
+    @property
+    def session(self):
+        if not hasattr(self.local, 'session'):
+            import requests  # import tardio: só quem fala HTTP paga o custo
+            self.local.session = requests.Session()
+            self.local.session.headers.update(self.headers)
+        return self.local.session
+
+    def upload(self, storage_path, stream, content_type):
+        # requests envia o arquivo aberto em blocos (Content-Length pelo fstat)
+        response = self.session.post(f"{self.base_url}/{storage_path}", data=stream, timeout=self.timeout,
+                                     headers={'Content-Type': content_type, 'x-upsert': 'false'})
+        if response.status_code >= 400:
+            raise SupabaseRestError(response.status_code, response.text[:500])
+
+    def remove(self, storage_paths):
+        response = self.session.delete(self.base_url, json={'prefixes': list(storage_paths)}, timeout=self.timeout)
+        if response.status_code >= 400:
+            raise SupabaseRestError(response.status_code, response.text[:500])
+
+
+class SourceFile:
+    """Arquivo do disco a enviar para um lead"""
+
+    def __init__(self, lead_id, path):
+        self.lead_id = lead_id
+        self.path = path
+        self.original_name = os.path.basename(path)
+        self.extension = os.path.splitext(path)[1].lower()
+        self.size = None
+        self.tenant_id = None
+
+    def check(self):
+        """Mesmas validações da rota de upload; retorna o erro ou None"""
+
+        try:
+            uuid.UUID(str(self.lead_id))
+        except ValueError:
+            return f"lead_id inválido: {self.lead_id!r}"
+        if self.extension not in ALLOWED_EXTENSIONS:
+            return f"Tipo de arquivo não permitido. Use: {', '.join(ALLOWED_EXTENSIONS)}"
+        try:
+            self.size = os.path.getsize(self.path)
+        except OSError as e:
+            return f"Arquivo ilegível: {e.strerror}"
+        if not 0 < self.size <= MAX_FILE_SIZE:
+            return f"Tamanho inválido ({self.size} bytes; máximo {MAX_FILE_SIZE})"
+        return None
+
+    @property
+    def content_type(self):
+        return mimetypes.guess_type(self.original_name)[0] or 'application/octet-stream'
+
+
+class HashClaims:
+    """(lead_id, content_hash) já presentes ou reservados nesta carga"""
+
+    def __init__(self, existing=()):
+        self.claimed = set(existing)
+        self.lock = threading.Lock()
+
+    def claim(self, lead_id, content_hash):
+        with self.lock:
+            if (lead_id, content_hash) in self.claimed:
+                return False
+            self.claimed.add((lead_id, content_hash))
+            return True
+
+    def release(self, lead_id, content_hash):
+        """Devolver a reserva de um arquivo que não chegou a ser gravado"""
+
+        with self.lock:
+            self.claimed.discard((lead_id, content_hash))
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_CHUNK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def scan_dir(root):
+    """<root>/<lead_id>/<arquivo>"""
+
+    sources = []
+    for lead_id in sorted(os.listdir(root)):
+        lead_dir = os.path.join(root, lead_id)
+        if lead_id.startswith('.') or not os.path.isdir(lead_dir):
+            continue
+        for name in sorted(os.listdir(lead_dir)):
+            path = os.path.join(lead_dir, name)
+            if not name.startswith('.') and os.path.isfile(path):
+                sources.append(SourceFile(lead_id, path))
+    return sources
+
+
+def read_manifest(path):
+    """Ler (lead_id, path) de CSV ou JSON lines; paths relativos ao manifest"""
+
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.jsonl') or path.endswith('.ndjson'):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    return [SourceFile(row['lead_id'], os.path.join(base, row['path'])) for row in rows]
+
+
+def load_lead_tenants(client, lead_ids):
+    tenants = {}
+    for batch in chunked(sorted(lead_ids), LEAD_CHUNK):
+        for row in client.select('pipeline_leads', {'select': 'id,tenant_id', 'id': in_filter(batch)}) or []:
+            tenants[row['id']] = row['tenant_id']
+    return tenants
+
+
+def load_existing_hashes(client, lead_ids):
+    existing = set()
+    for batch in chunked(sorted(lead_ids), LEAD_CHUNK):
+        filters = {'lead_id': in_filter(batch), 'is_active': 'is.true', 'content_hash': 'not.is.null'}
+        for rows in client.fetch_keyset('lead_documents', 'id,lead_id,content_hash', filters=filters):
+            existing.update((row['lead_id'], row['content_hash']) for row in rows)
+    return existing
+
+
+def upload_file(source, storage, claims, uploaded_by, dry_run=False):
+    """Hash, deduplicação e upload de um arquivo (roda no pool); retorna (status, linha)"""
+
+    content_hash = hash_file(source.path)
+    if not claims.claim(source.lead_id, content_hash):
+        return 'duplicate', None
+
+    file_name = f"{uuid.uuid4()}{source.extension}"
+    storage_path = f"{source.tenant_id}/{source.lead_id}/{file_name}"
+    if not dry_run:
+        try:
+            with open(source.path, 'rb') as stream:
+                storage.upload(storage_path, stream, source.content_type)
+        except Exception:
+            # outra cópia do mesmo arquivo na carga ainda pode ser enviada
+            claims.release(source.lead_id, content_hash)
+            raise
+
+    return 'uploaded', {
+        'lead_id': source.lead_id,
+        'file_name': file_name,
+        'original_name': source.original_name,
+        'file_type': source.content_type,
+        'file_extension': source.extension,
+        'file_size': source.size,
+        'storage_path': storage_path,
+        'storage_bucket': DEFAULT_BUCKET,
+        'uploaded_by': uploaded_by,
+        'tenant_id': source.tenant_id,
+        'is_active': True,
+        'content_hash': content_hash,
+        'metadata': {
+            'uploaded_at': datetime.now(timezone.utc).isoformat(),
+            'user_agent': 'lead_document_uploader.py'
+        }
+    }
+
+
+class DocumentUploader:
+    """Pool limitado de uploads + INSERT em lote dos metadados"""
+
+    def __init__(self, client, storage, uploaded_by, workers=DEFAULT_WORKERS, batch_size=DEFAULT_BATCH_SIZE,
+                 dry_run=False):
+        self.client = client
+        self.storage = storage
+        self.uploaded_by = uploaded_by
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.pending_rows = []
+        self.rejected = []
+        self.claims = None
+        self.meter = Throughput()
+        self.totals = {'files': 0, 'uploaded': 0, 'bytes': 0, 'inserted': 0, 'duplicates': 0, 'batches': 0}
+
+    def reject(self, source, error):
+        self.rejected.append({'lead_id': source.lead_id, 'path': source.path, 'error': error})
+
+    def run(self, sources):
+        self.totals['files'] = len(sources)
+        valid = []
+        for source in sources:
+            error = source.check()
+            if error:
+                self.reject(source, error)
+            else:
+                valid.append(source)
+
+        lead_ids = {source.lead_id for source in valid}
+        tenants = load_lead_tenants(self.client, lead_ids)
+        for source in valid:
+            source.tenant_id = tenants.get(source.lead_id)
+            if source.tenant_id is None:
+                self.reject(source, 'Lead não encontrado')
+        valid = [source for source in valid if source.tenant_id is not None]
+
+        claims = self.claims = HashClaims(load_existing_hashes(self.client, list(tenants)))
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            in_flight = {}
+            for source in valid:
+                if len(in_flight) >= self.workers * 2:
+                    self.collect(in_flight, wait(in_flight, return_when=FIRST_COMPLETED).done)
+                future = executor.submit(upload_file, source, self.storage, claims, self.uploaded_by, self.dry_run)
+                in_flight[future] = source
+            self.collect(in_flight, wait(in_flight).done)
+        self.flush()
+        return self.report()
+
+    def collect(self, in_flight, done):
+        """Resultados dos uploads concluídos (thread principal: único uso do cliente de dados)"""
+
+        for future in done:
+            source = in_flight.pop(future)
+            try:
+                status, row = future.result()
+            except Exception as e:
+                self.reject(source, f"Falha no upload: {e}")
+                continue
+            if status == 'duplicate':
+                self.totals['duplicates'] += 1
+                continue
+            self.totals['uploaded'] += 1
+            self.totals['bytes'] += source.size
+            self.meter.add(source.size)
+            self.pending_rows.append((source, row))
+            if len(self.pending_rows) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        if not self.pending_rows:
+            return
+        batch, self.pending_rows = self.pending_rows, []
+        self.totals['batches'] += 1
+        if self.dry_run:
+            self.totals['inserted'] += len(batch)
+            return
+        try:
+            self.client.insert('lead_documents', [row for _, row in batch])
+            self.totals['inserted'] += len(batch)
+        except SupabaseRestError:
+            # lote recusado (ex.: outra carga gravou o mesmo hash antes): isolar linha a linha
+            for source, row in batch:
+                self.insert_one(source, row)
+        print(f"   📦 lote {self.totals['batches']}: {len(batch)} documentos | "
+              f"{self.totals['inserted']} gravados, {self.totals['bytes'] / 1048576:,.1f}MB enviados")
+
+    def insert_one(self, source, row):
+        try:
+            self.client.insert('lead_documents', [row])
+            self.totals['inserted'] += 1
+            return
+        except SupabaseRestError as e:
+            error = e
+        # como a rota de upload: sem metadados, o arquivo não fica no storage
+        try:
+            self.storage.remove([row['storage_path']])
+        except Exception as e:
+            print(f"⚠️  Não foi possível remover {row['storage_path']} do storage: {e}")
+        if error.status_code in DUPLICATE_ERRORS:
+            self.totals['duplicates'] += 1
+        else:
+            self.claims.release(row['lead_id'], row['content_hash'])
+            self.reject(source, f"Erro ao salvar metadados: {error.message}")
+
+    def report(self):
+        return dict(self.totals, rejected=len(self.rejected), elapsed=self.meter.elapsed,
+                    megabytes_per_second=self.meter.rate / 1048576, round_trips=self.client.round_trips)
+
+
+def print_report(totals, rejected):
+    print(f"\n📊 Arquivos: {totals['files']}")
+    print(f"   enviados:     {totals['uploaded']} ({totals['bytes'] / 1048576:,.1f}MB)")
+    print(f"   gravados:     {totals['inserted']} em {totals['batches']} lote(s)")
+    print(f"   duplicados:   {totals['duplicates']}")
+    print(f"   rejeitados:   {totals['rejected']}")
+    print(f"   {totals['megabytes_per_second']:,.1f}MB/s em {totals['elapsed']:.1f}s, "
+          f"{totals['round_trips']} round trips")
+    for item in rejected[:SHOW_ERRORS]:
+        print(f"   ❌ {item['path']} ({item['lead_id']}): {item['error']}")
+    if len(rejected) > SHOW_ERRORS:
+        print(f"   ... e mais {len(rejected) - SHOW_ERRORS}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Upload em lote de documentos de leads')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--dir', help='diretório com uma pasta por lead_id')
+    source.add_argument('--manifest', help='CSV ou JSON lines com lead_id e path')
+    parser.add_argument('--uploaded-by', required=True, help='uuid do usuário (auth.users) gravado em uploaded_by')
+    parser.add_argument('--storage', choices=('local', 'supabase'), default='local',
+                        help='local (stand-in em disco) ou supabase (Storage API)')
+    parser.add_argument('--storage-dir', default=DEFAULT_STORAGE_DIR, help='raiz do storage local')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='uploads simultâneos')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='linhas por INSERT')
+    parser.add_argument('--dry-run', action='store_true', help='validar e deduplicar sem enviar nem gravar')
+    add_backend_argument(parser)
+    args = parser.parse_args(argv)
+
+    print("📎 UPLOAD EM LOTE: lead_documents")
+    print("=" * 50)
+
+    sources = scan_dir(args.dir) if args.dir else read_manifest(args.manifest)
+    storage = SupabaseStorage() if args.storage == 'supabase' else LocalStorage(args.storage_dir)
+    print(f"   arquivos: {len(sources)} | storage: {args.storage} | workers: {args.workers} | "
+          f"lote: {args.batch_size} | dry-run: {args.dry_run}")
+
+    uploader = DocumentUploader(connect(args.backend), storage, args.uploaded_by, args.workers, args.batch_size,
+                                args.dry_run)
+    totals = uploader.run(sources)
+    print_report(totals, uploader.rejected)
+
+    print(f"\n🏁 TOTAL: {totals['inserted']} documento(s) gravados, {totals['duplicates']} duplicado(s) pulados")
+    return 1 if uploader.rejected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+🔄 SINCRONIZAÇÃO EM LOTE: leads_master ↔ pipeline_leads
+=======================================================
+
+Substitui a ressincronização linha a linha (trigger
+sync_pipeline_leads_from_master + scripts de órfãos 20250128000006/7/11) por
+um diff calculado em blocos:
+
+1. leads_master do tenant é lido por keyset e indexado em memória;
+2. pipeline_leads do tenant é lido em blocos e, para cada linha, o
+   custom_data esperado é montado com as MESMAS regras do trigger;
+3. fingerprints (hash do JSON canônico) do esperado x atual decidem quem mudou;
+4. só as linhas alteradas são gravadas, em lote, pela RPC
+   apply_pipeline_lead_sync (migration 20250825000006): um UPDATE chaveado
+   em id que toca apenas lead_master_id, custom_data e updated_at = agora
+   (como o UPDATE do trigger). Etapa e pipeline nunca são regravados, então
+   um lead movido no Kanban durante a execução continua onde foi posto.
+
+Órfãos (lead_master_id nulo) são vinculados por email e, em seguida, por
+nome + empresa, sempre dentro do mesmo tenant. Os que não casam com nenhum
+lead ganham um leads_master novo montado do custom_data, com o mesmo
+mapeamento de 20250128000011 (prioridade 3), e são vinculados a ele. Assim
+como lá, não é criado lead cujo email já exista em leads_master (o índice
+único é global); esses continuam órfãos e aparecem no relatório. Diferença:
+o tenant do lead novo é o do próprio pipeline_lead, não o do usuário
+criador. --no-create-masters só vincula e reporta os órfãos sem match.
+
+Uso:
+    python lead_sync_engine.py --tenant <uuid> [--tenant <uuid> ...]
+    python lead_sync_engine.py --all-tenants --workers 4 --dry-run
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from supabase_rest import Throughput, add_backend_argument, chunked, connect, in_filter, list_tenant_ids
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_BATCH_SIZE = 500
+SYNC_RPC = 'apply_pipeline_lead_sync'
+EMAIL_LOOKUP_CHUNK = 100  # emails por filtro in.(...) (limite de URL do PostgREST)
+
+# Colunas de leads_master lidas pelo trigger (numéricos já convertidos para
+# texto no servidor, igual ao ::text do PL/pgSQL)
+MASTER_COLUMNS = ','.join([
+    'id', 'first_name', 'last_name', 'email', 'phone', 'company', 'job_title',
+    'city', 'state', 'country', 'lead_source', 'notes', 'lead_temperature', 'status',
+    'utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content',
+    'estimated_value::text', 'lead_score::text', 'probability::text',
+    'campaign_name', 'referrer', 'landing_page', 'user_agent'
+])
+
+PIPELINE_LEAD_COLUMNS = 'id,tenant_id,created_by,created_at,lead_master_id,custom_data'
+
+# leads_master novo para órfão sem match: coluna -> chave em custom_data (20250128000011)
+ORPHAN_MASTER_FIELDS = [
+    ('phone', 'telefone'),
+    ('company', 'empresa'),
+    ('job_title', 'cargo'),
+    ('lead_source', 'origem'),
+    ('campaign_name', 'campanha'),
+    ('utm_source', 'utm_source'),
+    ('utm_medium', 'utm_medium'),
+    ('utm_campaign', 'utm_campaign'),
+    ('utm_term', 'utm_term'),
+    ('utm_content', 'utm_content'),
+    ('city', 'cidade'),
+    ('state', 'estado'),
+    ('country', 'pais'),
+    ('notes', 'observacoes'),
+]
+NUMERIC_VALUE_RE = re.compile(r'[0-9]+\.?[0-9]*')
+
+# chave em custom_data -> coluna em leads_master (COALESCE(NEW.coluna, custom_data->>chave))
+SYNCED_FIELDS = [
+    ('email', 'email'),
+    ('telefone', 'phone'),
+    ('lead_email', 'email'),
+    ('empresa', 'company'),
+    ('cargo', 'job_title'),
+    ('cidade', 'city'),
+    ('estado', 'state'),
+    ('pais', 'country'),
+    ('origem', 'lead_source'),
+    ('observacoes', 'notes'),
+    ('temperatura', 'lead_temperature'),
+    ('status', 'status'),
+    ('utm_source', 'utm_source'),
+    ('utm_medium', 'utm_medium'),
+    ('utm_campaign', 'utm_campaign'),
+    ('utm_term', 'utm_term'),
+    ('utm_content', 'utm_content'),
+    ('valor_estimado', 'estimated_value'),
+    ('lead_score', 'lead_score'),
+    ('probability', 'probability'),
+    ('campaign_name', 'campaign_name'),
+    ('referrer', 'referrer'),
+    ('landing_page', 'landing_page'),
+    ('user_agent', 'user_agent'),
+]
+
+# Campos específicos do pipeline que o trigger nunca sobrescreve
+PRESERVED_PIPELINE_KEYS = (
+    'nome_oportunidade', 'valor', 'valor_numerico', 'source',
+    'existing_lead_id', 'profissão', 'qtd._alunos', 'lead_id',
+    'position', 'job_title_extra', 'custom_field_1', 'custom_field_2'
+)
+
+
+def full_name(master):
+    """Nome completo com as mesmas regras do trigger"""
+
+    first_name = master.get('first_name')
+    last_name = master.get('last_name')
+    if first_name is not None and last_name is not None and last_name != '':
+        return f"{first_name} {last_name}"
+    if first_name is not None:
+        return first_name
+    if last_name is not None:
+        return last_name
+    return 'Lead'
+
+
+def build_custom_data(master, current):
+    """Reproduzir o jsonb_build_object(...) || campos preservados do trigger"""
+
+    current = current or {}
+    nome = full_name(master)
+    data = {'nome': nome, 'nome_lead': nome, 'lead_name': nome}
+
+    for key, column in SYNCED_FIELDS:
+        value = master.get(column)
+        if value is None:
+            value = current.get(key)
+            # custom_data->>chave sempre devolve texto
+            if value is not None and not isinstance(value, str):
+                value = json.dumps(value, ensure_ascii=False)
+        data[key] = value
+
+    data['lead_master_id'] = str(master['id'])
+
+    for key in PRESERVED_PIPELINE_KEYS:
+        if key in current:
+            data[key] = current[key]
+
+    return data
+
+
+def text_value(custom_data, key):
+    """custom_data->>chave: texto, ou None"""
+
+    value = custom_data.get(key)
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def master_from_orphan(row):
+    """leads_master novo com os campos do custom_data (20250128000011, prioridade 3)"""
+
+    custom_data = row['custom_data']
+    nome = text_value(custom_data, 'nome_lead')
+    valor = text_value(custom_data, 'valor')
+
+    email = text_value(custom_data, 'email')
+    temperature = text_value(custom_data, 'temperatura')
+    status = text_value(custom_data, 'status')
+
+    master = {
+        'id': str(uuid.uuid4()),
+        'first_name': nome.split(' ')[0] if nome is not None else 'Lead',
+        'last_name': nome.partition(' ')[2] if nome is not None and ' ' in nome else 'Migrado',
+        'email': email if email is not None else f"migrado-{row['id']}@sistema.com",
+        'lead_temperature': temperature if temperature is not None else 'warm',
+        'status': status if status is not None else 'active',
+        'estimated_value': valor if valor and NUMERIC_VALUE_RE.fullmatch(valor) else 0,
+        'created_by': row.get('created_by'),
+        'created_at': row.get('created_at'),
+        'tenant_id': row['tenant_id'],
+    }
+    for column, key in ORPHAN_MASTER_FIELDS:
+        master[column] = text_value(custom_data, key)
+    return master
+
+
+def fingerprint(data):
+    """Hash estável do JSON canônico (ordem de chaves irrelevante)"""
+
+    canonical = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).digest()
+
+
+def normalize_master(row):
+    """Garantir nomes de coluna sem o sufixo de cast (::text)"""
+    return {key.split('::')[0]: value for key, value in row.items()}
+
+
+class MasterIndex:
+    """Índice em memória dos leads_master de um tenant"""
+
+    def __init__(self):
+        self.by_id = {}
+        self.by_email = {}
+        self.by_name_company = {}
+
+    def add(self, master):
+        master_id = master['id']
+        self.by_id[master_id] = master
+
+        email = master.get('email')
+        if email:
+            self.by_email.setdefault(email, master_id)
+
+        first_name = master.get('first_name')
+        last_name = master.get('last_name')
+        company = master.get('company')
+        if first_name is not None and last_name is not None and company:
+            # (first_name || ' ' || last_name) = custom_data->>'nome_lead'
+            self.by_name_company.setdefault((f"{first_name} {last_name}", company), master_id)
+
+    def match_orphan(self, custom_data):
+        """Prioridade 1: email exato; prioridade 2: nome + empresa"""
+
+        custom_data = custom_data or {}
+        email = custom_data.get('email')
+        if email and email in self.by_email:
+            return self.by_email[email]
+
+        nome = custom_data.get('nome_lead')
+        empresa = custom_data.get('empresa')
+        if nome and empresa:
+            return self.by_name_company.get((nome, empresa))
+        return None
+
+    def __len__(self):
+        return len(self.by_id)
+
+
+def unmatched_orphans(rows, index):
+    """Órfãos com custom_data que não casam com nenhum lead do índice"""
+
+    return [row for row in rows
+            if row.get('lead_master_id') is None and row.get('custom_data') is not None
+            and index.match_orphan(row['custom_data']) is None]
+
+
+def plan_orphan_masters(orphans, taken_emails):
+    """leads_master a criar para os órfãos sem match
+
+    Retorna (novos leads_master, {pipeline_lead id: lead_master id}). Órfãos do
+    mesmo bloco com o mesmo email (ou nome + empresa) ficam com o mesmo lead,
+    como na migração, em que o segundo já encontraria o primeiro.
+    """
+
+    masters = []
+    assigned = {}
+    seen = {}
+    for row in orphans:
+        custom_data = row['custom_data']
+        email = text_value(custom_data, 'email')
+        if email is not None and email in taken_emails:
+            continue
+        keys = [('email', email)] if email is not None else []
+        nome, empresa = custom_data.get('nome_lead'), custom_data.get('empresa')
+        if nome and empresa:
+            keys.append(('nome', nome, empresa))
+
+        master_id = next((seen[key] for key in keys if key in seen), None)
+        if master_id is None:
+            master = master_from_orphan(row)
+            masters.append(master)
+            master_id = master['id']
+        for key in keys:
+            seen.setdefault(key, master_id)
+        assigned[row['id']] = master_id
+    return masters, assigned
+
+
+def existing_emails(client, emails):
+    """Emails que já estão em leads_master (qualquer tenant: o índice único é global)"""
+
+    found = set()
+    for batch in chunked(sorted(emails), EMAIL_LOOKUP_CHUNK):
+        found.update(row['email'] for row in client.select('leads_master', {
+            'select': 'email', 'email': in_filter(f'"{email}"' for email in batch)}) or [])
+    return found
+
+
+def diff_chunk(rows, index, repair_orphans=True, assigned=None, touched_at=None):
+    """Comparar um bloco de pipeline_leads contra o índice
+
+    assigned: {pipeline_lead id: lead_master id} dos leads criados para órfãos.
+    Retorna (linhas_para_gravar, estatísticas).
+    """
+
+    assigned = assigned or {}
+    changed = []
+    stats = {'scanned': 0, 'unchanged': 0, 'changed': 0, 'linked': 0, 'created': 0, 'orphans': 0,
+             'missing_master': 0}
+
+    for row in rows:
+        stats['scanned'] += 1
+        master_id = row.get('lead_master_id')
+        linked = False
+
+        if master_id is None:
+            if not repair_orphans:
+                stats['orphans'] += 1
+                continue
+            master_id = assigned.get(row['id']) or index.match_orphan(row.get('custom_data'))
+            if master_id is None:
+                stats['orphans'] += 1
+                continue
+            linked = True
+
+        master = index.by_id.get(master_id)
+        if master is None:
+            stats['missing_master'] += 1
+            continue
+
+        current = row.get('custom_data') or {}
+        expected = build_custom_data(master, current)
+
+        if not linked and fingerprint(expected) == fingerprint(current):
+            stats['unchanged'] += 1
+            continue
+
+        changed.append({'id': row['id'], 'lead_master_id': master_id, 'custom_data': expected,
+                        'updated_at': touched_at})
+
+        stats['changed'] += 1
+        if row['id'] in assigned:
+            stats['created'] += 1
+        elif linked:
+            stats['linked'] += 1
+
+    return changed, stats
+
+
+def load_master_index(client, tenant_id, chunk_size):
+    index = MasterIndex()
+    for rows in client.fetch_keyset('leads_master', MASTER_COLUMNS,
+                                    filters={'tenant_id': f'eq.{tenant_id}'},
+                                    page_size=chunk_size):
+        for row in rows:
+            index.add(normalize_master(row))
+    return index
+
+
+def create_orphan_masters(client, index, rows, batch_size, dry_run):
+    """Criar os leads_master dos órfãos sem match do bloco; retorna {pipeline_lead id: lead_master id}"""
+
+    orphans = unmatched_orphans(rows, index)
+    if not orphans:
+        return {}
+    emails = {email for email in (text_value(row['custom_data'], 'email') for row in orphans) if email is not None}
+    masters, assigned = plan_orphan_masters(orphans, existing_emails(client, emails))
+
+    if dry_run:
+        # sem gravar: os órfãos entram no diff como se o lead já existisse
+        for master in masters:
+            index.add(dict(master, estimated_value=str(master['estimated_value'])))
+        return assigned
+
+    for batch in chunked(masters, batch_size):
+        client.insert('leads_master', batch)
+    # relidos com os mesmos casts do índice (numéricos como o servidor os devolve)
+    for batch in chunked([master['id'] for master in masters], EMAIL_LOOKUP_CHUNK):
+        for row in client.select('leads_master', {'select': MASTER_COLUMNS, 'id': in_filter(batch)}) or []:
+            index.add(normalize_master(row))
+    return assigned
+
+
+def sync_tenant(tenant_id, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                dry_run=False, repair_orphans=True, create_masters=True, client=None, backend='rest'):
+    """Sincronizar um tenant inteiro; retorna dicionário de estatísticas"""
+
+    client = client or connect(backend)
+    meter = Throughput()
+    touched_at = datetime.now(timezone.utc).isoformat()
+
+    index = load_master_index(client, tenant_id, chunk_size)
+
+    totals = {'tenant_id': tenant_id, 'masters': len(index), 'scanned': 0, 'unchanged': 0,
+              'changed': 0, 'linked': 0, 'created': 0, 'orphans': 0, 'missing_master': 0, 'written': 0}
+
+    for rows in client.fetch_keyset('pipeline_leads', PIPELINE_LEAD_COLUMNS,
+                                    filters={'tenant_id': f'eq.{tenant_id}'},
+                                    page_size=chunk_size):
+        assigned = {}
+        if repair_orphans and create_masters:
+            assigned = create_orphan_masters(client, index, rows, batch_size, dry_run)
+        changed, stats = diff_chunk(rows, index, repair_orphans=repair_orphans, assigned=assigned,
+                                    touched_at=touched_at)
+        for key, value in stats.items():
+            totals[key] += value
+        meter.add(len(rows))
+
+        if dry_run:
+            continue
+
+        for batch in chunked(changed, batch_size):
+            totals['written'] += client.rpc(SYNC_RPC, {'p_rows': batch}) or 0
+
+    totals['elapsed'] = meter.elapsed
+    totals['rows_per_second'] = meter.rate
+    totals['round_trips'] = client.round_trips
+    return totals
+
+
+def print_report(totals):
+    print(f"\n📊 Tenant {totals['tenant_id']}")
+    print(f"   leads_master indexados: {totals['masters']}")
+    print(f"   pipeline_leads lidos:   {totals['scanned']} "
+          f"({totals['rows_per_second']:,.0f} linhas/s, {totals['round_trips']} round trips)")
+    print(f"   inalterados:            {totals['unchanged']}")
+    print(f"   alterados:              {totals['changed']} (gravados: {totals['written']})")
+    print(f"   órfãos vinculados:      {totals['linked']}")
+    print(f"   órfãos com lead novo:   {totals['created']}")
+    print(f"   órfãos sem match:       {totals['orphans']}")
+    if totals['missing_master']:
+        print(f"   ⚠️  lead_master_id inexistente: {totals['missing_master']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sincronização em lote leads_master ↔ pipeline_leads')
+    parser.add_argument('--tenant', action='append', default=[], help='tenant_id (pode repetir)')
+    parser.add_argument('--all-tenants', action='store_true', help='processar todas as empresas')
+    parser.add_argument('--workers', type=int, default=4, help='tenants processados em paralelo')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='linhas por página de leitura')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='linhas por escrita')
+    parser.add_argument('--no-orphans', action='store_true', help='não vincular pipeline_leads órfãos')
+    parser.add_argument('--no-create-masters', action='store_true',
+                        help='não criar leads_master para órfãos sem match (só reportar)')
+    parser.add_argument('--dry-run', action='store_true', help='apenas calcular o diff')
+    add_backend_argument(parser)
+    args = parser.parse_args(argv)
+
+    tenants = list(args.tenant)
+    if args.all_tenants:
+        tenants.extend(t for t in list_tenant_ids(connect(args.backend)) if t not in tenants)
+    if not tenants:
+        parser.error('informe --tenant ou --all-tenants')
+
+    print("🔄 SINCRONIZAÇÃO EM LOTE: leads_master ↔ pipeline_leads")
+    print("=" * 55)
+    print(f"   tenants: {len(tenants)} | workers: {args.workers} | dry-run: {args.dry_run}")
+
+    meter = Throughput()
+    failures = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {
+            executor.submit(sync_tenant, tenant_id, args.chunk_size, args.batch_size,
+                            args.dry_run, not args.no_orphans, not args.no_create_masters,
+                            backend=args.backend): tenant_id
+            for tenant_id in tenants
+        }
+        for future in as_completed(futures):
+            tenant_id = futures[future]
+            try:
+                totals = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"\n❌ Tenant {tenant_id}: {e}")
+                continue
+            meter.add(totals['scanned'])
+            print_report(totals)
+
+    print(f"\n🏁 TOTAL: {meter}")
+    if failures:
+        print(f"⚠️  {failures} tenant(s) falharam")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+⏱️ BENCHMARK DE MIGRATIONS: execuções completas contra o PostgREST falso
+========================================================================
+
+Mede, offline, quanto custa aplicar uma migration por cada caminho:
+
+- runner-bN: migration_runner.MigrationRunner via RPC, N statements por
+             chamada (b1 = o padrão dos antigos scripts apply_migration_*,
+             um POST por statement)
+- direct-bN: o mesmo runner pelo transporte postgres (só com --dsn):
+             conexão direta em pipeline mode, sem HTTP/JSON
+
+Cada execução usa um servidor fake_postgrest.py novo (estado limpo), com a
+mesma latência/falhas injetadas para todos os cenários (nada sai da máquina).
+Com --dsn, cada execução (runner e direct) cria um banco descartável a partir
+dessa conexão (CREATE DATABASE, o usuário precisa de CREATEDB) e o remove ao
+final; o banco do --dsn em si não é alterado.
+
+Métricas: statements executados, round trips HTTP, retries, tempo
+(mediana das repetições) e statements/segundo.
+
+Uso:
+    python migration_benchmark.py [--sql migration-sql-direct.sql] [--batch-sizes 1,5,25]
+    python migration_benchmark.py --synthetic 500 --latency-ms 40 --failure-rate 0.05 --seed 7
+    python migration_benchmark.py --synthetic 500 --dsn postgresql://postgres@localhost/bench
+"""
+
+import argparse
+import os
+import statistics
+import sys
+from contextlib import contextmanager
+
+from fake_postgrest import FakePostgrest, add_fault_arguments, build_backend, faults_from_args
+from migration_runner import MigrationRunner, RestRpcTransport, build_transport, read_statements
+from supabase_rest import SupabaseRest
+
+DEFAULT_SQL_FILE = 'migration-sql-direct.sql'
+DEFAULT_BATCH_SIZES = '1,5,25'
+DEFAULT_REPEAT = 3
+
+
+def synthetic_statements(count):
+    """Script sintético portátil (SQLite e Postgres) e idempotente: 1 CREATE TABLE + INSERTs"""
+
+    statements = ['CREATE TABLE IF NOT EXISTS benchmark_rows (id INTEGER PRIMARY KEY, label TEXT NOT NULL)']
+    statements.extend(
+        f"INSERT INTO benchmark_rows (id, label) VALUES ({i}, 'row {i}') ON CONFLICT (id) DO NOTHING"
+        for i in range(1, count)
+    )
+    return statements
+
+
+@contextmanager
+def scratch_database(dsn, run_number):
+    """Banco vazio por execução (estado limpo como o SQLite :memory:); retorna o DSN dele"""
+
+    import psycopg
+    from psycopg import sql
+    from psycopg.conninfo import make_conninfo
+
+    name = f'migration_benchmark_{os.getpid()}_{run_number}'
+    with psycopg.connect(dsn, autocommit=True) as admin:
+        admin.execute(sql.SQL('CREATE DATABASE {}').format(sql.Identifier(name)))
+    try:
+        yield make_conninfo(dsn, dbname=name)
+    finally:
+        with psycopg.connect(dsn, autocommit=True) as admin:
+            admin.execute(sql.SQL('DROP DATABASE IF EXISTS {} WITH (FORCE)').format(sql.Identifier(name)))
+
+
+def run_direct(batch_size, args, statements, dsn):
+    """Runner pelo transporte postgres (sem servidor HTTP)"""
+
+    transport = build_transport('postgres', dsn=dsn)
+    try:
+        runner = MigrationRunner(transport, batch_size=batch_size, retries=args.retries,
+                                 backoff=args.backoff, verbose=False)
+        result = runner.run(statements)
+    finally:
+        transport.close()
+
+    return {
+        'ok': result['failed'] == 0,
+        'elapsed': result['elapsed'],
+        'statements': result['executed'],
+        'round_trips': result['round_trips'],
+        'retries': result['retries'],
+        'injected_failures': 0
+    }
+
+
+def run_scenario(scenario, args, statements, run_number=0):
+    """Uma execução completa contra um servidor (e, com --dsn, um banco) novo; retorna métricas"""
+
+    if not args.dsn:
+        return run_once(scenario, args, statements, None)
+    with scratch_database(args.dsn, run_number) as dsn:
+        return run_once(scenario, args, statements, dsn)
+
+
+def run_once(scenario, args, statements, dsn):
+    if scenario.startswith('direct-b'):
+        return run_direct(int(scenario.split('-b')[1]), args, statements, dsn)
+
+    server = FakePostgrest(
+        backend=build_backend(dsn=dsn),
+        faults=faults_from_args(args)
+    ).start()
+
+    try:
+        client = SupabaseRest(server.url, server.service_role_key)
+        runner = MigrationRunner(RestRpcTransport(client), batch_size=int(scenario.split('-b')[1]),
+                                 retries=args.retries, backoff=args.backoff, verbose=False)
+        result = runner.run(statements)
+    finally:
+        server.stop()
+        server.backend.close()
+
+    return {
+        'ok': result['failed'] == 0,
+        'elapsed': result['elapsed'],
+        'statements': server.stats['statements'],
+        'round_trips': server.stats['requests'],
+        'retries': result['retries'],
+        'injected_failures': server.stats['injected_failures']
+    }
+
+
+def summarize(scenario, runs):
+    elapsed = statistics.median(run['elapsed'] for run in runs)
+    statements = statistics.median(run['statements'] for run in runs)
+    return {
+        'scenario': scenario,
+        'ok': sum(1 for run in runs if run['ok']),
+        'runs': len(runs),
+        'elapsed': elapsed,
+        'statements': statements,
+        'round_trips': statistics.median(run['round_trips'] for run in runs),
+        'retries': sum(run['retries'] for run in runs),
+        'injected_failures': sum(run['injected_failures'] for run in runs),
+        'statements_per_second': statements / elapsed if elapsed > 0 else 0.0
+    }
+
+
+def print_table(rows):
+    print(f"\n{'cenário':<15} {'ok':>5} {'stmts':>7} {'round trips':>12} {'retries':>8} "
+          f"{'falhas inj.':>11} {'tempo (s)':>10} {'stmts/s':>10}")
+    for row in rows:
+        print(f"{row['scenario']:<15} {row['ok']:>2}/{row['runs']:<2} {row['statements']:>7.0f} "
+              f"{row['round_trips']:>12.0f} {row['retries']:>8} {row['injected_failures']:>11} "
+              f"{row['elapsed']:>10.3f} {row['statements_per_second']:>10,.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark offline de execuções de migration')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--sql', default=DEFAULT_SQL_FILE, help='arquivo .sql para os cenários runner')
+    source.add_argument('--synthetic', type=int, help='gerar N statements portáteis em vez de --sql')
+    parser.add_argument('--batch-sizes', default=DEFAULT_BATCH_SIZES, help='statements por chamada (runner)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='execuções por cenário')
+    parser.add_argument('--retries', type=int, default=3, help='retries do runner em falhas transitórias')
+    parser.add_argument('--backoff', type=float, default=0.05, help='backoff inicial do runner (s)')
+    parser.add_argument('--dsn', help='Postgres local em vez de SQLite (um banco descartável por execução); '
+                             'habilita os cenários direct-bN')
+    add_fault_arguments(parser)
+    args = parser.parse_args(argv)
+
+    statements = synthetic_statements(args.synthetic) if args.synthetic else read_statements(args.sql)
+    batch_sizes = [size.strip() for size in args.batch_sizes.split(',') if size.strip()]
+    scenarios = [f'runner-b{size}' for size in batch_sizes]
+    if args.dsn:
+        scenarios.extend(f'direct-b{size}' for size in batch_sizes)
+
+    print("⏱️ BENCHMARK DE MIGRATIONS (PostgREST falso)")
+    print("=" * 45)
+    print(f"   backend: {'postgres' if args.dsn else 'sqlite'} | "
+          f"statements (runner): {len(statements)} | repetições: {args.repeat}")
+    print(f"   latência: {args.latency_ms:.0f}ms (+{args.jitter_ms:.0f}ms) | "
+          f"falhas: {args.failure_rate:.0%} (+{args.fail_first} iniciais)")
+
+    rows = []
+    for scenario in scenarios:
+        runs = [run_scenario(scenario, args, statements, run_number) for run_number in range(args.repeat)]
+        rows.append(summarize(scenario, runs))
+        print(f"   ✅ {scenario}: {rows[-1]['elapsed']:.3f}s")
+
+    print_table(rows)
+
+    failed = [row['scenario'] for row in rows if row['ok'] < row['runs']]
+    if failed:
+        print(f"\n⚠️ Cenários com execuções falhas: {', '.join(failed)}")
+        return 1
+    print("\n🏁 Benchmark concluído")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
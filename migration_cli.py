@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+🧰 MIGRATION CLI: apply / verify / plan / export / import
+=========================================================
+
+Substitui os scripts avulsos (apply_migration_rpc.py, apply_migration_final.py,
+apply_migration_direct.py, apply_rls_migration.py e setup_rpc_via_sql.py),
+que repetiam configuração, headers, SQL embutido e main(). O SQL fica nos
+arquivos .sql e a execução é do migration_runner (transporte rest ou postgres).
+
+Início rápido: no topo só argparse/os/sys; requests, psycopg, json, csv e o
+próprio runner são carregados dentro do subcomando que precisa deles.
+--help e plan não abrem conexão.
+
+Credenciais: ambiente primeiro; depois --env-file, .env e config.env.template
+(só preenchem variáveis ausentes; placeholders "your-..." são ignorados).
+
+Migration = caminho de um .sql, nome/prefixo de supabase/migrations ou um
+dos atalhos de NAMED_MIGRATIONS.
+
+Uso:
+    python migration_cli.py plan basic-auth-outcome
+    python migration_cli.py apply basic-auth-outcome [--backend postgres] [--batch-size 25] [--verify]
+    python migration_cli.py verify basic-auth-outcome
+    python migration_cli.py verify --table pipeline_leads
+    python migration_cli.py export pipeline_outcome_reasons --filter tenant_id=eq.<uuid> -o motivos.jsonl
+    python migration_cli.py import pipeline_outcome_reasons motivos.jsonl --on-conflict id
+"""
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MIGRATIONS_DIR = os.path.join(ROOT, 'supabase', 'migrations')
+ENV_FILES = ('.env', 'config.env.template')
+PLACEHOLDER_MARKERS = ('your-', 'your_', '<')
+
+# Atalhos para os SQLs que os scripts antigos traziam embutidos
+NAMED_MIGRATIONS = {
+    'basic-auth-outcome': 'migration-sql-direct.sql',
+    'secure-pipeline-leads-delete': 'apply-rls-fix.sql',
+    'setup-rpc': 'setup_rpc_function.sql',
+}
+
+# Funções RPC que executam SQL -> nome do parâmetro
+SQL_RPCS = {
+    'execute_migration_sql': 'sql_query',
+    'exec_sql': 'query',
+    'execute_sql': 'sql_query',
+}
+
+DEFAULT_BATCH_SIZE = 25
+DEFAULT_PAGE_SIZE = 1000
+DEFAULT_IMPORT_BATCH = 500
+
+
+class CliError(Exception):
+    """Erro de uso/entrada reportado sem traceback"""
+
+
+def load_env_file(path):
+    """KEY=VALUE -> os.environ sem sobrescrever; retorna quantas foram definidas"""
+
+    loaded = 0
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            key, _, value = line.partition('=')
+            key = key.strip()
+            if key.startswith('export '):
+                key = key[len('export '):].strip()
+            value = value.strip().strip('"').strip("'")
+            if not value or any(marker in value for marker in PLACEHOLDER_MARKERS) or key in os.environ:
+                continue
+            os.environ[key] = value
+            loaded += 1
+    return loaded
+
+
+def load_environment(env_file=None):
+    paths = [env_file] if env_file else []
+    paths.extend(os.path.join(ROOT, name) for name in ENV_FILES)
+    for path in paths:
+        if os.path.isfile(path):
+            load_env_file(path)
+
+
+def resolve_migration(name):
+    """Caminho do .sql a partir de caminho, atalho ou nome/prefixo em supabase/migrations"""
+
+    if os.path.isfile(name):
+        return name
+    if name in NAMED_MIGRATIONS:
+        return os.path.join(ROOT, NAMED_MIGRATIONS[name])
+
+    candidates = sorted(
+        entry for entry in (os.listdir(MIGRATIONS_DIR) if os.path.isdir(MIGRATIONS_DIR) else [])
+        if entry.endswith('.sql') and (entry == f'{name}.sql' or entry.startswith(name))
+    )
+    if len(candidates) == 1 or f'{name}.sql' in candidates:
+        return os.path.join(MIGRATIONS_DIR, f'{name}.sql' if f'{name}.sql' in candidates else candidates[0])
+    if candidates:
+        raise CliError(f'migration ambígua: {name!r} ({len(candidates)} arquivos: {", ".join(candidates[:5])}...)')
+    raise CliError(f'migration não encontrada: {name!r}')
+
+
+def summarize_statement(statement, width=80):
+    from migration_runner import strip_leading_comments
+
+    text = ' '.join(strip_leading_comments(statement).split())
+    return text if len(text) <= width else text[:width - 3] + '...'
+
+
+def connect_client(backend):
+    from supabase_rest import connect
+
+    return connect(backend)
+
+
+def fetch_policy_names(client, table):
+    """Policies de uma tabela (RPC check_rls_policies ou pg_policies direto)"""
+
+    from supabase_rest import SupabaseRest
+
+    if isinstance(client, SupabaseRest):
+        result = client.rpc('check_rls_policies', {'table_name': table}) or {}
+        return sorted(policy['policy_name'] for policy in result.get('policies') or [])
+    rows = client.query(
+        "SELECT policyname AS policy_name FROM pg_policies WHERE schemaname = 'public' AND tablename = %s",
+        (table,)
+    )
+    return sorted(row['policy_name'] for row in rows)
+
+
+def fetch_structured_columns(client, table):
+    """Colunas json/jsonb/array da tabela: no CSV viajam como texto JSON"""
+
+    from supabase_rest import SupabaseRest
+
+    if isinstance(client, SupabaseRest):
+        definitions = (client.openapi() or {}).get('definitions') or {}
+        if table not in definitions:
+            raise CliError(f'tabela não encontrada na API: {table!r}')
+        return {column for column, spec in (definitions[table].get('properties') or {}).items()
+                if spec.get('type') == 'array' or spec.get('format') in ('json', 'jsonb')}
+    rows = client.query(
+        "SELECT column_name FROM information_schema.columns WHERE table_schema = 'public' AND table_name = %s "
+        "AND data_type IN ('json', 'jsonb', 'ARRAY')",
+        (table,)
+    )
+    return {row['column_name'] for row in rows}
+
+
+# ---------- subcomandos ----------
+
+def cmd_plan(args):
+    from migration_runner import MigrationRunner, expected_policies, is_non_transactional, read_statements
+
+    path = resolve_migration(args.migration)
+    statements = read_statements(path)
+    batch_size = args.batch_size or len(statements) or 1
+    batches = sum(1 for _ in MigrationRunner(None, batch_size=batch_size).groups(statements))
+
+    print(f"📋 PLANO: {os.path.relpath(path)}")
+    print(f"   statements: {len(statements)} | lotes: {batches} "
+          f"(até {batch_size} por chamada, cada lote em uma transação; ⚠️  = lote próprio, sem transação)")
+
+    for number, statement in enumerate(statements, 1):
+        marker = '⚠️ ' if is_non_transactional(statement) else '  '
+        print(f"{marker}{number:>4}. {summarize_statement(statement)}")
+        if args.show_sql:
+            print(statement + ';\n')
+
+    for table, policies in sorted(expected_policies(statements).items()):
+        for name, exists in sorted(policies.items()):
+            print(f"   🔐 {table}: \"{name}\" {'criada' if exists else 'removida'}")
+
+    if any(is_non_transactional(statement) for statement in statements):
+        print("\n⚠️  Statements marcados não rodam dentro de transação: apply --backend postgres executa "
+              "cada um sozinho, em autocommit; o backend rest (RPC) recusa a migration")
+    return 0
+
+
+def cmd_apply(args):
+    from migration_runner import (MigrationRunner, RestRpcTransport, build_transport, is_non_transactional,
+                                  read_statements)
+
+    path = resolve_migration(args.migration)
+    statements = read_statements(path)
+    if not statements:
+        raise CliError(f'nenhum statement em {path}')
+    blocked = [number for number, statement in enumerate(statements, 1) if is_non_transactional(statement)]
+    if blocked and args.backend != 'postgres':
+        # a RPC executa dentro da transação da requisição: CONCURRENTLY/VACUUM falhariam no meio da migration
+        raise CliError(f'statements {", ".join(map(str, blocked))} não rodam dentro de transação; '
+                       f'aplique com --backend postgres')
+
+    print(f"🚀 APLICANDO: {os.path.relpath(path)} ({len(statements)} statements, backend {args.backend})")
+
+    if args.backend == 'postgres':
+        transport = build_transport('postgres')
+    else:
+        transport = RestRpcTransport(function_name=args.rpc, param_name=SQL_RPCS[args.rpc])
+
+    runner = MigrationRunner(transport, batch_size=args.batch_size or len(statements),
+                             retries=args.retries, stop_on_error=not args.keep_going)
+    try:
+        stats = runner.run(statements)
+    finally:
+        transport.close()
+
+    print(f"\n📊 RESULTADO: {stats['executed']}/{stats['statements']} statements | "
+          f"{stats['round_trips']} round trips | {stats['retries']} retries | "
+          f"{stats['elapsed']:.2f}s ({stats['statements_per_second']:,.0f} statements/s)")
+
+    if stats['failed']:
+        print("⚠️  MIGRATION NÃO APLICADA POR COMPLETO")
+        return 1
+    print("✅ MIGRATION APLICADA")
+
+    if args.verify:
+        return cmd_verify(args)
+    return 0
+
+
+def cmd_verify(args):
+    from migration_runner import expected_policies, read_statements
+
+    client = connect_client(args.backend)
+    failures = 0
+
+    if getattr(args, 'table', None):
+        for table in args.table:
+            names = fetch_policy_names(client, table)
+            print(f"📊 {table}: {len(names)} políticas")
+            for name in names:
+                print(f"   - {name}")
+
+    if args.migration:
+        path = resolve_migration(args.migration)
+        expected = expected_policies(read_statements(path))
+        print(f"\n🔍 VERIFICANDO: {os.path.relpath(path)}")
+        if not expected:
+            print("   ⚠️  A migration não cria nem remove policies; nada a verificar")
+        for table, policies in sorted(expected.items()):
+            present = set(fetch_policy_names(client, table))
+            for name, should_exist in sorted(policies.items()):
+                ok = (name in present) == should_exist
+                failures += 0 if ok else 1
+                state = 'presente' if should_exist else 'ausente'
+                print(f"   {'✅' if ok else '❌'} {table}: \"{name}\" {state}")
+
+    if failures:
+        print(f"\n❌ {failures} divergência(s)")
+        return 1
+    return 0
+
+
+def parse_filters(pairs):
+    filters = {}
+    for pair in pairs or []:
+        column, sep, expression = pair.partition('=')
+        if not sep or '.' not in expression:
+            raise CliError(f'filtro inválido: {pair!r} (use coluna=operador.valor)')
+        filters[column] = expression
+    return filters
+
+
+def detect_format(path, explicit):
+    if explicit:
+        return explicit
+    return 'csv' if path and path.endswith('.csv') else 'jsonl'
+
+
+def cmd_export(args):
+    import csv
+    import json
+    from supabase_rest import Throughput
+
+    client = connect_client(args.backend)
+    filters = parse_filters(args.filter)
+    fmt = detect_format(args.output, args.format)
+    structured = fetch_structured_columns(client, args.table) if fmt == 'csv' else set()
+    output = sys.stdout if args.output in (None, '-') else open(args.output, 'w', newline='', encoding='utf-8')
+    meter = Throughput()
+    writer = None
+
+    try:
+        for rows in client.fetch_keyset(args.table, args.columns, filters=filters, key=args.key,
+                                        page_size=args.page_size):
+            if fmt == 'csv':
+                if writer is None:
+                    writer = csv.DictWriter(output, fieldnames=list(rows[0]))
+                    writer.writeheader()
+                # json/jsonb/array sempre como JSON (inclusive escalares), para o import decodificar
+                writer.writerows(
+                    {k: json.dumps(v, ensure_ascii=False)
+                     if v is not None and (k in structured or isinstance(v, (dict, list))) else v
+                     for k, v in row.items()}
+                    for row in rows
+                )
+            else:
+                output.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+            meter.add(len(rows))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(f"📤 {args.table}: {meter}", file=sys.stderr)
+    return 0
+
+
+def read_rows(path, fmt, structured=()):
+    """Linhas de JSON lines ou CSV (vazio = NULL; colunas em `structured` decodificadas de JSON)"""
+
+    import csv
+    import json
+
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                decoded = {}
+                for key, value in row.items():
+                    if value == '':
+                        value = None
+                    elif key in structured:
+                        try:
+                            value = json.loads(value)
+                        except ValueError:
+                            raise CliError(f'linha {reader.line_num}: {key} não é JSON válido: {value[:80]!r}')
+                    decoded[key] = value
+                yield decoded
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def cmd_import(args):
+    from supabase_rest import Throughput, chunked
+
+    client = connect_client(args.backend)
+    fmt = detect_format(args.file, args.format)
+    structured = fetch_structured_columns(client, args.table) if fmt == 'csv' else set()
+    meter = Throughput()
+
+    for batch in chunked(read_rows(args.file, fmt, structured), args.batch_size):
+        if not args.dry_run:
+            if args.insert:
+                client.insert(args.table, batch)
+            else:
+                client.upsert(args.table, batch, on_conflict=args.on_conflict)
+        meter.add(len(batch))
+
+    label = 'lidas (dry-run)' if args.dry_run else 'gravadas'
+    print(f"📥 {args.table}: {meter.rows} linhas {label} em {meter.elapsed:.1f}s "
+          f"({meter.rate:,.0f} linhas/s, {client.round_trips} round trips)")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='migration_cli.py', description='Migrations e dados do CRM (Supabase)')
+    parser.add_argument('--env-file', help='arquivo KEY=VALUE extra (antes de .env/config.env.template)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_backend(sub):
+        sub.add_argument('--backend', choices=('rest', 'postgres'), default='rest',
+                         help='rest (PostgREST) ou postgres (SUPABASE_DB_URL)')
+
+    plan = subparsers.add_parser('plan', help='listar statements, lotes e policies (sem conexão)')
+    plan.add_argument('migration', help='arquivo .sql, atalho ou nome em supabase/migrations')
+    plan.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='statements por chamada')
+    plan.add_argument('--show-sql', action='store_true', help='imprimir o SQL completo')
+    plan.set_defaults(handler=cmd_plan)
+
+    apply = subparsers.add_parser('apply', help='aplicar uma migration')
+    apply.add_argument('migration', help='arquivo .sql, atalho ou nome em supabase/migrations')
+    add_backend(apply)
+    apply.add_argument('--rpc', choices=sorted(SQL_RPCS), default='execute_migration_sql',
+                       help='função RPC que executa o SQL (backend rest)')
+    apply.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                       help='statements por chamada (0 = script inteiro)')
+    apply.add_argument('--retries', type=int, default=3, help='retries em falhas transitórias')
+    apply.add_argument('--keep-going', action='store_true', help='seguir após lote com erro')
+    apply.add_argument('--verify', action='store_true', help='verificar policies ao final')
+    apply.set_defaults(handler=cmd_apply, table=None)
+
+    verify = subparsers.add_parser('verify', help='conferir policies esperadas / listar policies')
+    verify.add_argument('migration', nargs='?', help='migration cujas policies conferir')
+    verify.add_argument('--table', action='append', help='listar policies da tabela (pode repetir)')
+    add_backend(verify)
+    verify.set_defaults(handler=cmd_verify)
+
+    export = subparsers.add_parser('export', help='exportar tabela (keyset) para JSON lines ou CSV')
+    export.add_argument('table')
+    export.add_argument('--columns', default='*', help='colunas (sintaxe PostgREST)')
+    export.add_argument('--filter', action='append', metavar='COLUNA=OP.VALOR', help='filtro PostgREST')
+    export.add_argument('--key', default='id', help='coluna de paginação')
+    export.add_argument('--page-size', type=int, default=DEFAULT_PAGE_SIZE)
+    export.add_argument('--format', choices=('jsonl', 'csv'), help='padrão: pela extensão')
+    export.add_argument('-o', '--output', help='arquivo de saída (padrão: stdout)')
+    add_backend(export)
+    export.set_defaults(handler=cmd_export)
+
+    import_ = subparsers.add_parser('import', help='importar JSON lines ou CSV (upsert em lote)')
+    import_.add_argument('table')
+    import_.add_argument('file')
+    import_.add_argument('--on-conflict', default='id', help='colunas do upsert')
+    import_.add_argument('--insert', action='store_true', help='INSERT simples em vez de upsert')
+    import_.add_argument('--batch-size', type=int, default=DEFAULT_IMPORT_BATCH)
+    import_.add_argument('--format', choices=('jsonl', 'csv'), help='padrão: pela extensão')
+    import_.add_argument('--dry-run', action='store_true', help='apenas ler e contar')
+    add_backend(import_)
+    import_.set_defaults(handler=cmd_import)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command != 'plan':
+        load_environment(args.env_file)
+
+    from supabase_rest import SupabaseRestError
+
+    try:
+        return args.handler(args)
+    except (CliError, RuntimeError, SupabaseRestError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
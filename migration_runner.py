@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+🚀 MIGRATION RUNNER: Execução de migrations SQL por transporte plugável
+======================================================================
+
+Separa O QUE executar (statements de um arquivo .sql) de COMO executar
+(transporte). Transportes disponíveis:
+
+- rest (padrão): RPC execute_migration_sql via PostgREST, como
+  apply_migration_rpc.py / setup_rpc_via_sql.py;
+- postgres: protocolo do Postgres direto (postgres_direct.py), com os
+  statements de cada lote em pipeline mode, sem HTTP/JSON.
+
+Sobre qualquer transporte o runner oferece:
+
+- split seguro de statements (aspas, comentários e corpos $$ ... $$);
+- agrupamento opcional de N statements por chamada (menos round trips);
+  statements que não aceitam transação (CREATE INDEX CONCURRENTLY, VACUUM...)
+  vão sempre sozinhos, e só o transporte postgres os executa;
+- retry com backoff exponencial para falhas transitórias (5xx / rede);
+- estatísticas: statements, round trips, retries, statements/segundo.
+"""
+
+import re
+import time
+
+from supabase_rest import SupabaseRest, SupabaseRestError
+
+TRANSPORTS = ('rest', 'postgres')
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+RETRYABLE_STATUS = (408, 425, 429, 500, 502, 503, 504)
+
+CREATE_POLICY_RE = re.compile(
+    r'^\s*CREATE\s+POLICY\s+("(?:[^"]|"")+"|\w+)\s+ON\s+(?:(?:"?\w+"?)\.)?"?(\w+)"?'
+    r'(?:.*?\bFOR\s+(ALL|SELECT|INSERT|UPDATE|DELETE)\b)?',
+    re.IGNORECASE | re.DOTALL
+)
+# Não rodam dentro de transação: executados sozinhos, em autocommit
+NON_TRANSACTIONAL_RE = re.compile(
+    r'^(?:(?:CREATE|DROP)\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\b|REINDEX\b[^;]*\bCONCURRENTLY\b|VACUUM\b'
+    r'|ALTER\s+SYSTEM\b|ALTER\s+TYPE\b[^;]*\bADD\s+VALUE\b|(?:CREATE|DROP)\s+DATABASE\b'
+    r'|ALTER\s+TABLE\b[^;]*\bDETACH\s+PARTITION\b[^;]*\bCONCURRENTLY\b)',
+    re.IGNORECASE
+)
+DROP_POLICY_RE = re.compile(
+    r'^\s*DROP\s+POLICY\s+(IF\s+EXISTS\s+)?("(?:[^"]|"")+"|\w+)\s+ON\s+(?:(?:"?\w+"?)\.)?"?(\w+)"?',
+    re.IGNORECASE
+)
+
+
+def split_sql_statements(sql):
+    """Dividir um script SQL em statements (sem o ';' final)
+
+    Respeita strings ('...'), identificadores ("..."), comentários (-- e
+    /* */) e blocos com dollar quoting ($$ ... $$, $tag$ ... $tag$).
+    """
+
+    statements = []
+    current = []
+    i = 0
+    length = len(sql)
+
+    while i < length:
+        char = sql[i]
+        pair = sql[i:i + 2]
+
+        if pair == '--':
+            end = sql.find('\n', i)
+            end = length if end == -1 else end
+            current.append(sql[i:end])
+            i = end
+        elif pair == '/*':
+            end = sql.find('*/', i + 2)
+            end = length if end == -1 else end + 2
+            current.append(sql[i:end])
+            i = end
+        elif char in ("'", '"'):
+            end = i + 1
+            while end < length:
+                if sql[end] == char:
+                    # aspas duplicadas = escape
+                    if end + 1 < length and sql[end + 1] == char:
+                        end += 2
+                        continue
+                    break
+                end += 1
+            current.append(sql[i:end + 1])
+            i = end + 1
+        elif char == '$':
+            close = sql.find('$', i + 1)
+            tag = sql[i:close + 1] if close != -1 else ''
+            if tag and (tag == '$$' or tag[1:-1].replace('_', 'a').isalnum()) and not tag[1:2].isdigit():
+                end = sql.find(tag, close + 1)
+                end = length if end == -1 else end + len(tag)
+                current.append(sql[i:end])
+                i = end
+            else:
+                current.append(char)
+                i += 1
+        elif char == ';':
+            statement = ''.join(current).strip()
+            if has_code(statement):
+                statements.append(statement)
+            current = []
+            i += 1
+        else:
+            current.append(char)
+            i += 1
+
+    statement = ''.join(current).strip()
+    if has_code(statement):
+        statements.append(statement)
+    return statements
+
+
+def has_code(statement):
+    """True se o trecho tem algo além de comentários/espaços"""
+
+    for line in statement.splitlines():
+        stripped = line.strip()
+        if stripped and not stripped.startswith('--'):
+            return True
+    return False
+
+
+def strip_leading_comments(statement):
+    """Remover comentários (-- e /* */) antes do primeiro token"""
+
+    while True:
+        statement = statement.lstrip()
+        if statement.startswith('--'):
+            end = statement.find('\n')
+            statement = '' if end == -1 else statement[end + 1:]
+        elif statement.startswith('/*'):
+            end = statement.find('*/')
+            statement = '' if end == -1 else statement[end + 2:]
+        else:
+            return statement
+
+
+def is_non_transactional(statement):
+    """CREATE INDEX CONCURRENTLY, VACUUM, ALTER TYPE ... ADD VALUE etc. (não aceitam BEGIN)"""
+
+    return NON_TRANSACTIONAL_RE.match(strip_leading_comments(statement)) is not None
+
+
+def unquote_identifier(name):
+    if name.startswith('"') and name.endswith('"'):
+        return name[1:-1].replace('""', '"')
+    return name.lower()
+
+
+def expected_policies(statements):
+    """Estado final das policies tocadas pelo script: {tabela: {policy: existe?}}"""
+
+    expected = {}
+    for statement in map(strip_leading_comments, statements):
+        match = CREATE_POLICY_RE.match(statement)
+        if match:
+            expected.setdefault(match.group(2).lower(), {})[unquote_identifier(match.group(1))] = True
+            continue
+        match = DROP_POLICY_RE.match(statement)
+        if match:
+            expected.setdefault(match.group(3).lower(), {})[unquote_identifier(match.group(2))] = False
+    return expected
+
+
+def read_statements(path):
+    with open(path, encoding='utf-8') as f:
+        return split_sql_statements(f.read())
+
+
+class TransportError(Exception):
+    """Falha ao executar SQL; `retryable` indica falha transitória"""
+
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class RestRpcTransport:
+    """Executa SQL via POST /rest/v1/rpc/<função> (um round trip por chamada)"""
+
+    name = 'rest'
+
+    def __init__(self, client=None, function_name='execute_migration_sql', param_name='sql_query'):
+        self.client = client or SupabaseRest()
+        self.function_name = function_name
+        self.param_name = param_name
+
+    @property
+    def round_trips(self):
+        return self.client.round_trips
+
+    def execute(self, sql):
+        import requests  # exceções de rede
+
+        try:
+            result = self.client.rpc(self.function_name, {self.param_name: sql})
+        except SupabaseRestError as e:
+            raise TransportError(str(e), retryable=e.status_code in RETRYABLE_STATUS)
+        except requests.RequestException as e:
+            raise TransportError(str(e), retryable=True)
+
+        if isinstance(result, dict) and result.get('success') is False:
+            raise TransportError(result.get('error') or result.get('message') or 'falha', retryable=False)
+        return result
+
+    def execute_batch(self, statements):
+        """Lote inteiro em uma chamada (o EXECUTE da função roda tudo em uma transação)"""
+        return self.execute(';\n'.join(statements) + ';')
+
+    def close(self):
+        pass
+
+
+def build_transport(name='rest', client=None, dsn=None):
+    """Transporte escolhido por execução ('rest' ou 'postgres')"""
+
+    if name == 'postgres':
+        from postgres_direct import PostgresTransport  # só carrega psycopg se usado
+        return PostgresTransport(dsn)
+    if name != 'rest':
+        raise ValueError(f'transporte desconhecido: {name!r}')
+    return RestRpcTransport(client)
+
+
+class MigrationRunner:
+    """Executa statements em grupos de `batch_size` com retry"""
+
+    def __init__(self, transport, batch_size=1, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 stop_on_error=True, sleep=time.sleep, verbose=True):
+        self.transport = transport
+        self.batch_size = max(1, batch_size)
+        self.retries = retries
+        self.backoff = backoff
+        self.stop_on_error = stop_on_error
+        self.sleep = sleep
+        self.verbose = verbose
+
+    def _execute_with_retry(self, statements, stats):
+        attempt = 0
+        while True:
+            try:
+                return self.transport.execute_batch(statements)
+            except TransportError as e:
+                if not e.retryable or attempt >= self.retries:
+                    raise
+                attempt += 1
+                stats['retries'] += 1
+                delay = self.backoff * (2 ** (attempt - 1))
+                if self.verbose:
+                    print(f"   🔁 Retry {attempt}/{self.retries} em {delay:.1f}s: {e}")
+                self.sleep(delay)
+
+    def groups(self, statements):
+        """(índice inicial, lote): até batch_size statements; os não transacionais vão sozinhos"""
+
+        group, start = [], 0
+        for index, statement in enumerate(statements):
+            alone = is_non_transactional(statement)
+            if group and (alone or len(group) >= self.batch_size):
+                yield start, group
+                group = []
+            if not group:
+                start = index
+            group.append(statement)
+            if alone:
+                yield start, group
+                group = []
+        if group:
+            yield start, group
+
+    def run(self, statements):
+        """Executar; retorna dicionário de estatísticas"""
+
+        stats = {'statements': len(statements), 'executed': 0, 'failed': 0, 'retries': 0,
+                 'calls': 0, 'errors': []}
+        round_trips_before = self.transport.round_trips
+        started = time.perf_counter()
+
+        for start, group in self.groups(statements):
+            stats['calls'] += 1
+            try:
+                self._execute_with_retry(group, stats)
+                stats['executed'] += len(group)
+                if self.verbose:
+                    print(f"   ✅ {start + len(group)}/{len(statements)}: {' '.join(group[-1].split())[:60]}...")
+            except TransportError as e:
+                stats['failed'] += len(group)
+                stats['errors'].append({'index': start, 'error': str(e)})
+                if self.verbose:
+                    print(f"   ❌ Falha no statement {start + 1}: {e}")
+                if self.stop_on_error:
+                    break
+
+        stats['elapsed'] = time.perf_counter() - started
+        stats['round_trips'] = self.transport.round_trips - round_trips_before
+        stats['statements_per_second'] = stats['executed'] / stats['elapsed'] if stats['elapsed'] > 0 else 0.0
+        return stats
@@ -0,0 +1,836 @@
+#!/usr/bin/env python3
+"""
+🗂️ PARTICIONAMENTO MENSAL: notifications e email_history
+========================================================
+
+notifications (20250129000000/1 + enterprise-enhancement) e email_history
+(20250108) só crescem; toda consulta de não lidas/targeting
+(idx_notifications_unread_priority) e todo histórico percorre o passado
+inteiro. Este job converte as tabelas para RANGE por mês, sem parar a
+escrita, e mantém só os meses recentes no banco:
+
+- convert: cria <tabela>_partitioned (mesmas colunas, CHECKs, FKs,
+  policies, grants e índices; PK vira (id, coluna de partição)), os meses
+  existentes + os próximos e uma partição default. Um trigger espelha
+  INSERT/UPDATE/DELETE da tabela original enquanto as linhas são copiadas
+  por keyset em lotes curtos (FOR SHARE + lock_timeout). No fim, contagem
+  conferida no mesmo snapshot e troca de nomes em uma transação curta
+  (triggers, views e publicações do Realtime são recriados). A original
+  fica como <tabela>_legacy para rollback;
+- maintain: cria os meses à frente e arquiva as partições mais antigas que
+  a retenção: COPY da partição ainda anexada, em um snapshot REPEATABLE
+  READ, para <archive-dir>/<tabela>/<partição>.csv.gz (relido para conferir
+  a contagem); só depois DETACH, conferência de que nada mudou desde o
+  snapshot (senão o arquivo é refeito da tabela já desanexada),
+  manifest.jsonl com sha256 e DROP. Tabelas <tabela>_pAAAA_MM desanexadas
+  por uma execução interrompida são concluídas na próxima;
+- restore: devolve um arquivo .csv.gz para a tabela (recria o mês);
+- status: partições, linhas estimadas e tamanho.
+
+Os índices definidos na tabela particionada existem em cada partição;
+consultas com filtro em created_at/sent_at só tocam os meses do filtro.
+
+DDL precisa de conexão direta: SUPABASE_DB_URL (ou DATABASE_URL), porta
+5432 (não o pooler 6543). Todo DDL roda com lock_timeout e retry.
+
+Uso:
+    python partition_maintenance.py status
+    python partition_maintenance.py convert notifications [--dry-run]
+    python partition_maintenance.py maintain [--retention-months 6] [--archive-dir .partition_archive]
+    python partition_maintenance.py restore .partition_archive/notifications/notifications_p2025_01.csv.gz
+"""
+
+import argparse
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import time
+from datetime import date, datetime, timezone
+
+from supabase_rest import Throughput
+
+DEFAULT_MONTHS_AHEAD = 3
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_LOCK_TIMEOUT_MS = 2000
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 0.5
+DEFAULT_ARCHIVE_DIR = '.partition_archive'
+COPY_CHUNK = 1 << 20
+
+# pg_get_indexdef: CREATE [UNIQUE ]INDEX nome ON [ONLY ]tabela USING ...
+INDEX_DEF_RE = re.compile(r'^CREATE (UNIQUE )?INDEX \S+ ON (?:ONLY )?\S+ (USING .*)$', re.DOTALL)
+
+
+class PartitionSpec:
+    """Tabela particionada por mês em `column`, com retenção em meses"""
+
+    def __init__(self, table, column, retention_months):
+        self.table = table
+        self.column = column
+        self.retention_months = retention_months
+
+    @property
+    def shadow(self):
+        return f'{self.table}_partitioned'
+
+    @property
+    def legacy(self):
+        return f'{self.table}_legacy'
+
+    @property
+    def default_partition(self):
+        return f'{self.table}_default'
+
+    @property
+    def sync_function(self):
+        return f'{self.table}_partition_sync'
+
+    def partition_name(self, month):
+        return f'{self.table}_p{month.year:04d}_{month.month:02d}'
+
+    def partition_month(self, name):
+        """notifications_p2025_01 -> date(2025, 1, 1) (None se não for mensal)"""
+
+        match = re.fullmatch(re.escape(self.table) + r'_p(\d{4})_(\d{2})', name)
+        return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+SPECS = {
+    'notifications': PartitionSpec('notifications', 'created_at', retention_months=6),
+    'email_history': PartitionSpec('email_history', 'sent_at', retention_months=12),
+}
+
+
+class MaintenanceError(Exception):
+    """Pré-condição não atendida; nada foi alterado pela etapa que falhou"""
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def month_literal(month):
+    return f'{month.isoformat()} 00:00:00+00'
+
+
+def index_alias(name, suffix):
+    """Nome temporário de índice (limite de 63 bytes do Postgres)"""
+    return f'{name[:63 - len(suffix)]}{suffix}'
+
+
+class PartitionManager:
+    """Operações de particionamento de uma tabela sobre uma conexão autocommit"""
+
+    def __init__(self, connection, spec, schema='public', batch_size=DEFAULT_BATCH_SIZE,
+                 lock_timeout_ms=DEFAULT_LOCK_TIMEOUT_MS, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 sleep=time.sleep, verbose=True):
+        from psycopg import sql
+
+        self.sql = sql
+        self.connection = connection
+        self.spec = spec
+        self.schema = schema
+        self.batch_size = batch_size
+        self.retries = retries
+        self.backoff = backoff
+        self.sleep = sleep
+        self.verbose = verbose
+        self.lock_retries = 0
+        connection.execute(f"SET lock_timeout = '{int(lock_timeout_ms)}ms'")
+
+    # ------------------------------------------------------------------ catálogo
+
+    def ident(self, name):
+        return self.sql.Identifier(self.schema, name)
+
+    def qualified(self, name):
+        return f'{self.schema}.{name}'
+
+    def fetch(self, query, params=None):
+        return self.connection.execute(query, params).fetchall()
+
+    def relkind(self, name):
+        row = self.fetch("SELECT c.relkind FROM pg_class c WHERE c.oid = to_regclass(%s)", (self.qualified(name),))
+        return row[0][0] if row else None
+
+    def is_partitioned(self):
+        return self.relkind(self.spec.table) == 'p'
+
+    def columns(self, name):
+        return [row[0] for row in self.fetch(
+            "SELECT attname FROM pg_attribute WHERE attrelid = %s::regclass AND attnum > 0 "
+            "AND NOT attisdropped AND attgenerated = '' ORDER BY attnum", (self.qualified(name),))]
+
+    def primary_key(self, name):
+        return [row[0] for row in self.fetch(
+            "SELECT a.attname FROM pg_index i JOIN pg_attribute a ON a.attrelid = i.indrelid "
+            "AND a.attnum = ANY(i.indkey) WHERE i.indrelid = %s::regclass AND i.indisprimary",
+            (self.qualified(name),))]
+
+    def indexes(self, name):
+        """[(nome, definição, primária, única, colunas)]"""
+
+        return self.fetch(
+            "SELECT c.relname, pg_get_indexdef(i.indexrelid), i.indisprimary, i.indisunique, "
+            "ARRAY(SELECT a.attname FROM pg_attribute a WHERE a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)) "
+            "FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE i.indrelid = %s::regclass "
+            "ORDER BY c.relname", (self.qualified(name),))
+
+    def foreign_keys(self, name):
+        return self.fetch("SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                          "WHERE conrelid = %s::regclass AND contype = 'f' ORDER BY conname",
+                          (self.qualified(name),))
+
+    def referencing_tables(self, name):
+        return [row[0] for row in self.fetch(
+            "SELECT conrelid::regclass::text FROM pg_constraint WHERE confrelid = %s::regclass AND contype = 'f'",
+            (self.qualified(name),))]
+
+    def policies(self, name):
+        return self.fetch("SELECT policyname, permissive, roles, cmd, qual, with_check FROM pg_policies "
+                          "WHERE schemaname = %s AND tablename = %s ORDER BY policyname", (self.schema, name))
+
+    def grants(self, name):
+        return self.fetch("SELECT grantee, string_agg(privilege_type, ', ') FROM information_schema.role_table_grants "
+                          "WHERE table_schema = %s AND table_name = %s GROUP BY grantee ORDER BY grantee",
+                          (self.schema, name))
+
+    def triggers(self, name):
+        return self.fetch("SELECT tgname, pg_get_triggerdef(oid) FROM pg_trigger "
+                          "WHERE tgrelid = %s::regclass AND NOT tgisinternal AND tgname <> %s ORDER BY tgname",
+                          (self.qualified(name), self.spec.sync_function))
+
+    def dependent_views(self, name):
+        return self.fetch(
+            "SELECT DISTINCT v.oid::regclass::text, v.relkind, pg_get_viewdef(v.oid) FROM pg_depend d "
+            "JOIN pg_rewrite r ON r.oid = d.objid JOIN pg_class v ON v.oid = r.ev_class "
+            "WHERE d.refobjid = %s::regclass AND v.oid <> d.refobjid", (self.qualified(name),))
+
+    def publications(self, name):
+        return [row[0] for row in self.fetch(
+            "SELECT pubname FROM pg_publication_tables WHERE schemaname = %s AND tablename = %s",
+            (self.schema, name))]
+
+    def partitions(self, parent=None):
+        """[(nome, mês | None, linhas estimadas, bytes)] das partições de `parent`"""
+
+        rows = self.fetch(
+            "SELECT c.relname, c.reltuples::bigint, pg_total_relation_size(c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass ORDER BY c.relname",
+            (self.qualified(parent or self.spec.table),))
+        return [(name, self.spec.partition_month(name), max(estimate, 0), size) for name, estimate, size in rows]
+
+    # ------------------------------------------------------------------ execução
+
+    def log(self, message):
+        if self.verbose:
+            print(message)
+
+    def with_lock_retry(self, action):
+        """Executar `action` repetindo em lock_timeout/deadlock com backoff exponencial"""
+
+        import psycopg
+
+        for attempt in range(self.retries + 1):
+            try:
+                return action()
+            except (psycopg.errors.LockNotAvailable, psycopg.errors.DeadlockDetected) as e:
+                if attempt == self.retries:
+                    raise MaintenanceError(f'lock não obtido após {self.retries} retries: {e}'.strip())
+                self.lock_retries += 1
+                self.sleep(self.backoff * (2 ** attempt))
+
+    def in_transaction(self, statements):
+        def run():
+            with self.connection.transaction():
+                for statement in statements:
+                    self.connection.execute(statement)
+        self.with_lock_retry(run)
+
+    def create_partition_statement(self, parent, month):
+        sql = self.sql
+        return sql.SQL('CREATE TABLE IF NOT EXISTS {} PARTITION OF {} FOR VALUES FROM ({}) TO ({})').format(
+            self.ident(self.spec.partition_name(month)), self.ident(parent),
+            sql.Literal(month_literal(month)), sql.Literal(month_literal(add_months(month, 1))))
+
+    def ensure_partitions(self, first_month, last_month, parent=None):
+        """Criar (se faltarem) as partições de first_month..last_month"""
+
+        existing = {name for name, _, _, _ in self.partitions(parent)}
+        created = []
+        month = first_month
+        while month <= last_month:
+            name = self.spec.partition_name(month)
+            if name not in existing:
+                self.in_transaction([self.create_partition_statement(parent or self.spec.table, month)])
+                created.append(name)
+            month = add_months(month, 1)
+        return created
+
+    # ------------------------------------------------------------------ convert
+
+    def conversion_plan(self, months_ahead):
+        spec = self.spec
+        if self.relkind(spec.table) is None:
+            raise MaintenanceError(f'tabela {spec.table} não existe')
+
+        column = self.sql.Identifier(spec.column)
+        bounds = self.fetch(self.sql.SQL('SELECT min({}), max({}), count(*) FILTER (WHERE {} IS NULL) FROM {}')
+                            .format(column, column, column, self.ident(spec.table)))[0]
+        today = month_start(datetime.now(timezone.utc).date())
+        first = month_start(bounds[0]) if bounds[0] else today
+        last = max(add_months(today, months_ahead), month_start(bounds[1]) if bounds[1] else today)
+
+        return {
+            'first_month': first,
+            'last_month': last,
+            'null_keys': bounds[2],
+            'primary_key': self.primary_key(spec.table),
+            'indexes': self.indexes(spec.table),
+            'foreign_keys': self.foreign_keys(spec.table),
+            'referenced_by': self.referencing_tables(spec.table),
+            'policies': self.policies(spec.table),
+            'triggers': self.triggers(spec.table),
+            'views': self.dependent_views(spec.table),
+            'publications': self.publications(spec.table),
+        }
+
+    def check_plan(self, plan):
+        if len(plan['primary_key']) != 1:
+            raise MaintenanceError(f"{self.spec.table}: PK de uma coluna é necessária (atual: {plan['primary_key']})")
+        if plan['referenced_by']:
+            raise MaintenanceError(f"{self.spec.table} é referenciada por FK em {', '.join(plan['referenced_by'])}; "
+                                   "a PK particionada inclui a coluna de partição")
+        materialized = [name for name, kind, _ in plan['views'] if kind != 'v']
+        if materialized:
+            raise MaintenanceError(f"views materializadas dependem da tabela: {', '.join(materialized)}")
+
+    def shadow_statements(self, plan):
+        """DDL da tabela particionada + trigger de espelhamento (uma transação)"""
+
+        sql = self.sql
+        spec = self.spec
+        table, shadow = self.ident(spec.table), self.ident(spec.shadow)
+        column = sql.Identifier(spec.column)
+        key = plan['primary_key'][0]
+
+        statements = [
+            sql.SQL('CREATE TABLE {} (LIKE {} INCLUDING ALL EXCLUDING INDEXES) PARTITION BY RANGE ({})')
+            .format(shadow, table, column),
+            sql.SQL('ALTER TABLE {} ALTER COLUMN {} SET NOT NULL').format(shadow, column),
+            sql.SQL('ALTER TABLE {} ADD CONSTRAINT {} PRIMARY KEY ({}, {})').format(
+                shadow, sql.Identifier(index_alias(f'{spec.table}_pkey', '_part')), sql.Identifier(key), column),
+        ]
+
+        for name, definition, primary, unique, columns in plan['indexes']:
+            if primary:
+                continue
+            if unique and spec.column not in columns:
+                self.log(f"   ⚠️  índice único {name} não inclui {spec.column}; não é recriado")
+                continue
+            match = INDEX_DEF_RE.match(definition)
+            statements.append(sql.SQL('CREATE {}INDEX {} ON {} ').format(
+                sql.SQL(match.group(1) or ''), sql.Identifier(index_alias(name, '_part')), shadow)
+                + sql.SQL(match.group(2)))
+
+        for name, definition in plan['foreign_keys']:
+            statements.append(sql.SQL('ALTER TABLE {} ADD CONSTRAINT {} ').format(shadow, sql.Identifier(name))
+                              + sql.SQL(definition))
+
+        for name, permissive, roles, command, qual, with_check in plan['policies']:
+            statement = sql.SQL('CREATE POLICY {} ON {} AS {} FOR {} TO {}').format(
+                sql.Identifier(name), shadow, sql.SQL(permissive), sql.SQL(command),
+                sql.SQL(', ').join(sql.SQL('PUBLIC') if role == 'public' else sql.Identifier(role) for role in roles))
+            if qual:
+                statement += sql.SQL(' USING ({})').format(sql.SQL(qual))
+            if with_check:
+                statement += sql.SQL(' WITH CHECK ({})').format(sql.SQL(with_check))
+            statements.append(statement)
+
+        security = self.fetch("SELECT relrowsecurity, relforcerowsecurity, obj_description(oid, 'pg_class') "
+                              "FROM pg_class WHERE oid = %s::regclass", (self.qualified(spec.table),))[0]
+        if security[0]:
+            statements.append(sql.SQL('ALTER TABLE {} ENABLE ROW LEVEL SECURITY').format(shadow))
+        if security[1]:
+            statements.append(sql.SQL('ALTER TABLE {} FORCE ROW LEVEL SECURITY').format(shadow))
+        if security[2]:
+            statements.append(sql.SQL('COMMENT ON TABLE {} IS {}').format(shadow, sql.Literal(security[2])))
+        for grantee, privileges in self.grants(spec.table):
+            statements.append(sql.SQL('GRANT {} ON {} TO {}').format(
+                sql.SQL(privileges), shadow, sql.SQL('PUBLIC') if grantee == 'PUBLIC' else sql.Identifier(grantee)))
+
+        month = plan['first_month']
+        while month <= plan['last_month']:
+            statements.append(self.create_partition_statement(spec.shadow, month))
+            month = add_months(month, 1)
+        statements.append(sql.SQL('CREATE TABLE {} PARTITION OF {} DEFAULT')
+                          .format(self.ident(spec.default_partition), shadow))
+
+        statements.extend(self.sync_trigger_statements(key))
+        return statements
+
+    def column_lists(self, prefix=None):
+        """(lista de colunas, expressões de valor) com a chave de partição nunca nula"""
+
+        sql = self.sql
+        names = self.columns(self.spec.table)
+        targets = sql.SQL(', ').join(sql.Identifier(name) for name in names)
+        values = []
+        for name in names:
+            value = sql.Identifier(prefix, name) if prefix else sql.Identifier(name)
+            if name == self.spec.column:
+                value = sql.SQL('COALESCE({}, now())').format(value)
+            values.append(value)
+        return targets, sql.SQL(', ').join(values)
+
+    def sync_trigger_statements(self, key):
+        sql = self.sql
+        spec = self.spec
+        targets, values = self.column_lists(prefix='new')
+        function = self.ident(spec.sync_function)
+        body = sql.SQL(
+            "BEGIN\n"
+            "    IF TG_OP <> 'INSERT' THEN\n"
+            "        DELETE FROM {shadow} WHERE {key} = OLD.{key};\n"
+            "    END IF;\n"
+            "    IF TG_OP <> 'DELETE' THEN\n"
+            "        INSERT INTO {shadow} ({targets}) VALUES ({values}) ON CONFLICT DO NOTHING;\n"
+            "    END IF;\n"
+            "    RETURN NULL;\n"
+            "END"
+        ).format(shadow=self.ident(spec.shadow), key=sql.Identifier(key), targets=targets, values=values)
+
+        return [
+            sql.SQL('CREATE OR REPLACE FUNCTION {}() RETURNS trigger LANGUAGE plpgsql AS {}').format(
+                function, sql.Literal(body.as_string(self.connection))),
+            sql.SQL('CREATE TRIGGER {} AFTER INSERT OR UPDATE OR DELETE ON {} FOR EACH ROW EXECUTE FUNCTION {}()')
+            .format(sql.Identifier(spec.sync_function), self.ident(spec.table), function),
+        ]
+
+    def copy_rows(self, key):
+        """Copiar por keyset; FOR SHARE impede UPDATE/DELETE concorrente do lote até o commit"""
+
+        sql = self.sql
+        spec = self.spec
+        targets, values = self.column_lists()
+        key_id = sql.Identifier(key)
+        select_first = sql.SQL('SELECT {} FROM {} ORDER BY {} LIMIT %s FOR SHARE').format(
+            key_id, self.ident(spec.table), key_id)
+        select_next = sql.SQL('SELECT {} FROM {} WHERE {} > %s ORDER BY {} LIMIT %s FOR SHARE').format(
+            key_id, self.ident(spec.table), key_id, key_id)
+        insert = sql.SQL('INSERT INTO {} ({}) SELECT {} FROM {} WHERE {} = ANY(%s) ON CONFLICT DO NOTHING').format(
+            self.ident(spec.shadow), targets, values, self.ident(spec.table), key_id)
+
+        meter = Throughput()
+        last_key = None
+        batches = 0
+
+        def copy_batch():
+            with self.connection.transaction():
+                if last_key is None:
+                    keys = [row[0] for row in self.fetch(select_first, (self.batch_size,))]
+                else:
+                    keys = [row[0] for row in self.fetch(select_next, (last_key, self.batch_size))]
+                if keys:
+                    self.connection.execute(insert, (keys,))
+                return keys
+
+        while True:
+            keys = self.with_lock_retry(copy_batch)
+            if not keys:
+                break
+            last_key = keys[-1]
+            meter.add(len(keys))
+            batches += 1
+            if batches % 20 == 0:
+                self.log(f"   ... {meter}")
+            if len(keys) < self.batch_size:
+                break
+
+        return meter
+
+    def counts_match(self):
+        """Contagem das duas tabelas no mesmo snapshot (o trigger mantém a sincronia)"""
+
+        sql = self.sql
+        with self.connection.transaction():
+            self.connection.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+            source = self.fetch(sql.SQL('SELECT count(*) FROM {}').format(self.ident(self.spec.table)))[0][0]
+            target = self.fetch(sql.SQL('SELECT count(*) FROM {}').format(self.ident(self.spec.shadow)))[0][0]
+        return source, target
+
+    def swap_statements(self, plan):
+        """Troca de nomes: original -> _legacy, particionada -> original"""
+
+        sql = self.sql
+        spec = self.spec
+        table, legacy = self.ident(spec.table), sql.Identifier(spec.legacy)
+        statements = [
+            sql.SQL('LOCK TABLE {} IN ACCESS EXCLUSIVE MODE').format(table),
+            sql.SQL('DROP TRIGGER {} ON {}').format(sql.Identifier(spec.sync_function), table),
+            sql.SQL('DROP FUNCTION {}()').format(self.ident(spec.sync_function)),
+            sql.SQL('ALTER TABLE {} RENAME TO {}').format(table, legacy),
+        ]
+        for name, _, primary, _, _ in plan['indexes']:
+            statements.append(sql.SQL('ALTER INDEX {} RENAME TO {}').format(
+                self.ident(name), sql.Identifier(index_alias(name, '_legacy'))))
+        statements.append(sql.SQL('ALTER TABLE {} RENAME TO {}').format(
+            self.ident(spec.shadow), sql.Identifier(spec.table)))
+
+        shadow_indexes = {name for name, _, _, _, _ in self.indexes(spec.shadow)}
+        for name in [f'{spec.table}_pkey'] + [row[0] for row in plan['indexes'] if not row[2]]:
+            alias = index_alias(name, '_part')
+            if alias in shadow_indexes:
+                statements.append(sql.SQL('ALTER INDEX {} RENAME TO {}').format(
+                    self.ident(alias), sql.Identifier(name)))
+
+        # definições capturadas antes da troca: o texto referencia o nome original
+        for _, definition in plan['triggers']:
+            statements.append(sql.SQL(definition))
+        for name, _, definition in plan['views']:
+            statements.append(sql.SQL('CREATE OR REPLACE VIEW {} AS ').format(sql.SQL(name)) + sql.SQL(definition))
+        for publication in plan['publications']:
+            statements.append(sql.SQL('ALTER PUBLICATION {} DROP TABLE {}').format(
+                sql.Identifier(publication), self.ident(spec.legacy)))
+            statements.append(sql.SQL('ALTER PUBLICATION {} ADD TABLE {}').format(
+                sql.Identifier(publication), table))
+            # Realtime continua vendo as mudanças com o nome da tabela, não das partições
+            statements.append(sql.SQL('ALTER PUBLICATION {} SET (publish_via_partition_root = true)').format(
+                sql.Identifier(publication)))
+        return statements
+
+    def convert(self, months_ahead=DEFAULT_MONTHS_AHEAD, dry_run=False):
+        spec = self.spec
+        if self.is_partitioned():
+            self.log(f"   ✅ {spec.table} já é particionada")
+            return {'converted': False, 'rows': 0}
+
+        plan = self.conversion_plan(months_ahead)
+        self.check_plan(plan)
+        months = (plan['last_month'].year - plan['first_month'].year) * 12 + \
+            plan['last_month'].month - plan['first_month'].month + 1
+
+        self.log(f"   meses: {plan['first_month']:%Y-%m} .. {plan['last_month']:%Y-%m} ({months} partições + default)")
+        self.log(f"   índices: {len(plan['indexes'])} | FKs: {len(plan['foreign_keys'])} | "
+                 f"policies: {len(plan['policies'])} | triggers: {len(plan['triggers'])} | "
+                 f"views: {len(plan['views'])} | publicações: {', '.join(plan['publications']) or '-'}")
+        if plan['null_keys']:
+            self.log(f"   ⚠️  {plan['null_keys']} linhas com {spec.column} nulo serão gravadas com now()")
+        if dry_run:
+            return {'converted': False, 'rows': 0}
+
+        if self.relkind(spec.shadow) is None:
+            self.in_transaction(self.shadow_statements(plan))
+            self.log(f"   ✅ {spec.shadow} criada; espelhamento ativo")
+        else:
+            self.log(f"   ↪️  {spec.shadow} já existe; retomando a cópia")
+            # meses novos desde a execução anterior
+            self.ensure_partitions(plan['first_month'], plan['last_month'], parent=spec.shadow)
+
+        meter = self.copy_rows(plan['primary_key'][0])
+        self.log(f"   ✅ cópia: {meter}")
+
+        source, target = self.counts_match()
+        if source != target:
+            raise MaintenanceError(f'contagens divergentes: {spec.table}={source} {spec.shadow}={target}')
+
+        self.in_transaction(self.swap_statements(plan))
+        # partições novas não têm estatísticas; sem ANALYZE o planner estima às cegas
+        self.connection.execute(self.sql.SQL('ANALYZE {}').format(self.ident(spec.table)))
+        self.log(f"   ✅ troca concluída ({source} linhas); original em {spec.legacy}")
+        return {'converted': True, 'rows': source, 'rows_per_second': meter.rate}
+
+    # ------------------------------------------------------------------ archive / restore
+
+    def detached_partitions(self):
+        """[(nome, mês)] de partições mensais desanexadas e não removidas (archive interrompido)"""
+
+        rows = self.fetch(
+            "SELECT c.relname FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = %s AND c.relkind = 'r' AND NOT c.relispartition AND c.relname LIKE %s "
+            "ORDER BY c.relname", (self.schema, f'{self.spec.table}_p%'))
+        return [(name, self.spec.partition_month(name)) for name, in rows
+                if self.spec.partition_month(name) is not None]
+
+    def content_state(self, relation):
+        """(linhas, soma dos hashes das linhas): muda se qualquer linha mudar"""
+
+        return tuple(self.fetch(self.sql.SQL(
+            'SELECT count(*), COALESCE(sum(hashtext(t::text)::bigint), 0) FROM {} t').format(relation))[0])
+
+    def export_partition(self, relation, path):
+        """COPY comprimido em um snapshot; retorna (estado no snapshot, sha256)
+
+        O arquivo é gravado em <path>.part e só vira <path> depois de relido e
+        conferido com a contagem do mesmo snapshot.
+        """
+
+        sql = self.sql
+        partial = f'{path}.part'
+        digest = hashlib.sha256()
+        with self.connection.transaction():
+            self.connection.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+            state = self.content_state(relation)
+            with gzip.open(partial, 'wb') as output:
+                with self.connection.cursor().copy(
+                        sql.SQL('COPY {} TO STDOUT (FORMAT csv, HEADER)').format(relation)) as copy:
+                    for data in copy:
+                        output.write(data)
+                        digest.update(data)
+
+        with gzip.open(partial, 'rt', encoding='utf-8', newline='') as archived:
+            written = sum(1 for _ in csv.reader(archived)) - 1
+        if written != state[0]:
+            raise MaintenanceError(f'{partial}: {written} linhas no arquivo, {state[0]} na partição '
+                                   f'(partição mantida)')
+        os.replace(partial, path)
+        return state, digest.hexdigest()
+
+    def archive_partition(self, name, month, archive_dir, attached=True):
+        """COPY + conferência com a partição ainda anexada, depois DETACH + manifest + DROP
+
+        attached=False conclui uma partição que já estava desanexada.
+        """
+
+        sql = self.sql
+        spec = self.spec
+        partition = self.ident(name)
+
+        directory = os.path.join(archive_dir, spec.table)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{name}.csv.gz')
+
+        # falha aqui deixa a partição anexada: o próximo maintain tenta de novo
+        state, digest = self.export_partition(partition, path)
+
+        if attached:
+            self.in_transaction([sql.SQL('ALTER TABLE {} DETACH PARTITION {}').format(
+                self.ident(spec.table), partition)])
+            if self.content_state(partition) != state:
+                # escrita entre o snapshot e o DETACH: refaz da tabela desanexada (estática)
+                self.log(f"   ↻ {name} mudou durante a exportação; exportando de novo")
+                state, digest = self.export_partition(partition, path)
+
+        entry = {
+            'table': spec.table, 'partition': name, 'month': month.isoformat(), 'rows': state[0],
+            'file': os.path.relpath(path, archive_dir), 'sha256': digest,
+            'archived_at': datetime.now(timezone.utc).isoformat()
+        }
+        with open(os.path.join(archive_dir, 'manifest.jsonl'), 'a', encoding='utf-8') as manifest:
+            manifest.write(json.dumps(entry) + '\n')
+
+        self.in_transaction([sql.SQL('DROP TABLE {}').format(partition)])
+        return entry
+
+    def archive(self, retention_months, archive_dir, dry_run=False):
+        cutoff = add_months(month_start(datetime.now(timezone.utc).date()), -retention_months)
+        expired = [(name, month, estimate) for name, month, estimate, _ in self.partitions()
+                   if month is not None and month < cutoff]
+        archived = []
+        for name, month in self.detached_partitions():
+            if dry_run:
+                self.log(f"   📦 {name}: desanexada por execução anterior, seria concluída")
+                continue
+            entry = self.archive_partition(name, month, archive_dir, attached=False)
+            archived.append(entry)
+            self.log(f"   📦 {name}: {entry['rows']} linhas -> {entry['file']} (concluída)")
+        for name, month, estimate in expired:
+            if dry_run:
+                self.log(f"   📦 {name}: ~{estimate} linhas seriam arquivadas")
+                continue
+            entry = self.archive_partition(name, month, archive_dir)
+            archived.append(entry)
+            self.log(f"   📦 {name}: {entry['rows']} linhas -> {entry['file']}")
+        return archived
+
+    def restore(self, path, archive_dir):
+        """Recarregar um .csv.gz arquivado na tabela particionada"""
+
+        sql = self.sql
+        spec = self.spec
+        name = os.path.basename(path)[:-len('.csv.gz')]
+        month = spec.partition_month(name)
+        if month is None:
+            raise MaintenanceError(f'{path}: nome não corresponde a uma partição mensal de {spec.table}')
+
+        entry = None
+        manifest_path = os.path.join(archive_dir, 'manifest.jsonl')
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding='utf-8') as manifest:
+                for line in manifest:
+                    if line.strip() and json.loads(line)['partition'] == name:
+                        entry = json.loads(line)
+        if entry is not None:
+            digest = hashlib.sha256()
+            with gzip.open(path, 'rb') as archived:
+                for data in iter(lambda: archived.read(COPY_CHUNK), b''):
+                    digest.update(data)
+            if digest.hexdigest() != entry['sha256']:
+                raise MaintenanceError(f'{path}: sha256 não confere com o manifest')
+
+        self.ensure_partitions(month, month)
+        with gzip.open(path, 'rb') as archived:
+            header = next(csv.reader(io.TextIOWrapper(io.BytesIO(archived.readline()), encoding='utf-8')))
+            statement = sql.SQL('COPY {} ({}) FROM STDIN (FORMAT csv)').format(
+                self.ident(spec.table), sql.SQL(', ').join(sql.Identifier(column) for column in header))
+            with self.connection.transaction():
+                cursor = self.connection.cursor()
+                with cursor.copy(statement) as copy:
+                    for data in iter(lambda: archived.read(COPY_CHUNK), b''):
+                        copy.write(data)
+                restored = cursor.rowcount
+        return {'partition': name, 'rows': restored, 'expected': entry['rows'] if entry else None}
+
+
+def format_size(size):
+    for unit in ('B', 'kB', 'MB', 'GB'):
+        if size < 1024:
+            return f'{size:.0f} {unit}'
+        size /= 1024
+    return f'{size:.1f} TB'
+
+
+def selected_specs(names):
+    unknown = [name for name in names if name not in SPECS]
+    if unknown:
+        raise MaintenanceError(f"tabela sem configuração de partição: {', '.join(unknown)} "
+                               f"(disponíveis: {', '.join(SPECS)})")
+    return [SPECS[name] for name in (names or SPECS)]
+
+
+def open_manager(args, spec, connection):
+    return PartitionManager(connection, spec, batch_size=getattr(args, 'batch_size', DEFAULT_BATCH_SIZE),
+                            lock_timeout_ms=args.lock_timeout_ms, retries=args.retries)
+
+
+def cmd_status(args, connection):
+    for spec in selected_specs(args.tables):
+        manager = open_manager(args, spec, connection)
+        kind = manager.relkind(spec.table)
+        if kind is None:
+            print(f"\n📋 {spec.table}: não existe")
+            continue
+        if kind != 'p':
+            print(f"\n📋 {spec.table}: não particionada (convert pendente)")
+            continue
+        print(f"\n📋 {spec.table} (por {spec.column}, retenção {spec.retention_months} meses)")
+        for name, _, estimate, size in manager.partitions():
+            print(f"   {name:<32} {estimate:>12,} linhas {format_size(size):>10}")
+    return 0
+
+
+def cmd_convert(args, connection):
+    for spec in selected_specs([args.table]):
+        print(f"\n🔄 {spec.table}")
+        manager = open_manager(args, spec, connection)
+        manager.convert(args.months_ahead, args.dry_run)
+        if manager.lock_retries:
+            print(f"   ⚠️  retries de lock: {manager.lock_retries}")
+    return 0
+
+
+def cmd_maintain(args, connection):
+    today = month_start(datetime.now(timezone.utc).date())
+    for spec in selected_specs(args.tables):
+        manager = open_manager(args, spec, connection)
+        print(f"\n🛠️ {spec.table}")
+        if not manager.is_partitioned():
+            print("   ⚠️  não particionada; rode convert antes")
+            continue
+        if args.dry_run:
+            print(f"   meses garantidos até {add_months(today, args.months_ahead):%Y-%m}")
+        else:
+            created = manager.ensure_partitions(today, add_months(today, args.months_ahead))
+            print(f"   partições criadas: {', '.join(created) or 'nenhuma'}")
+        retention = args.retention_months if args.retention_months is not None else spec.retention_months
+        archived = manager.archive(retention, args.archive_dir, args.dry_run)
+        if not args.dry_run:
+            print(f"   partições arquivadas: {len(archived)} ({sum(e['rows'] for e in archived)} linhas)")
+    return 0
+
+
+def cmd_restore(args, connection):
+    table = next((name for name in SPECS if os.path.basename(args.file).startswith(f'{name}_p')), None)
+    if table is None:
+        raise MaintenanceError(f'{args.file}: tabela não reconhecida pelo nome do arquivo')
+    manager = open_manager(args, SPECS[table], connection)
+    result = manager.restore(args.file, args.archive_dir)
+    print(f"\n✅ {result['partition']}: {result['rows']} linhas restauradas")
+    if result['expected'] is not None and result['expected'] != result['rows']:
+        print(f"⚠️  manifest registrava {result['expected']} linhas")
+        return 1
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='partition_maintenance.py',
+                                     description='Particionamento mensal e arquivamento de notifications/email_history')
+    parser.add_argument('--dsn', help='connection string (padrão: SUPABASE_DB_URL / DATABASE_URL)')
+    parser.add_argument('--lock-timeout-ms', type=int, default=DEFAULT_LOCK_TIMEOUT_MS,
+                        help='lock_timeout de cada DDL/lote')
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES, help='retries quando o lock não sai')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    status = subparsers.add_parser('status', help='partições, linhas estimadas e tamanho')
+    status.add_argument('tables', nargs='*', help=f"padrão: {', '.join(SPECS)}")
+    status.set_defaults(handler=cmd_status)
+
+    convert = subparsers.add_parser('convert', help='converter uma tabela para partições mensais (online)')
+    convert.add_argument('table', choices=sorted(SPECS))
+    convert.add_argument('--months-ahead', type=int, default=DEFAULT_MONTHS_AHEAD, help='meses futuros criados')
+    convert.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='linhas por lote de cópia')
+    convert.add_argument('--dry-run', action='store_true', help='apenas mostrar o plano')
+    convert.set_defaults(handler=cmd_convert)
+
+    maintain = subparsers.add_parser('maintain', help='criar meses à frente e arquivar os antigos')
+    maintain.add_argument('tables', nargs='*', help=f"padrão: {', '.join(SPECS)}")
+    maintain.add_argument('--months-ahead', type=int, default=DEFAULT_MONTHS_AHEAD)
+    maintain.add_argument('--retention-months', type=int, help='padrão: retenção configurada por tabela')
+    maintain.add_argument('--archive-dir', default=DEFAULT_ARCHIVE_DIR, help='destino dos .csv.gz e manifest')
+    maintain.add_argument('--dry-run', action='store_true', help='apenas listar')
+    maintain.set_defaults(handler=cmd_maintain)
+
+    restore = subparsers.add_parser('restore', help='recarregar uma partição arquivada')
+    restore.add_argument('file', help='<archive-dir>/<tabela>/<partição>.csv.gz')
+    restore.add_argument('--archive-dir', default=DEFAULT_ARCHIVE_DIR, help='onde está o manifest.jsonl')
+    restore.set_defaults(handler=cmd_restore)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    print("🗂️ PARTICIONAMENTO MENSAL")
+    print("=" * 30)
+
+    import psycopg
+    from postgres_direct import connect_database
+
+    try:
+        connection = connect_database(args.dsn, prepare=False)
+    except (RuntimeError, psycopg.OperationalError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+
+    try:
+        return args.handler(args, connection)
+    except (MaintenanceError, psycopg.Error) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 2
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+🗄️ ARQUIVAMENTO EM LOTE: pipelines e tudo que pendura neles
+===========================================================
+
+Arquiva (ou restaura) muitos pipelines de uma vez, com as mesmas flags de
+pipelineService.archivePipeline/unarchivePipeline (is_archived, archived_at,
+is_active), e propaga o archived_at do pipeline para:
+
+- cadence_task_instances
+- lead_outcome_history
+- pipeline_leads
+- pipeline_stages
+
+(colunas da migration 20250825000003-add-archived-at-to-pipeline-children.sql).
+
+Ordem:
+- arquivar: primeiro as flags dos pipelines (somem do board na hora; o
+  trigger update_archived_timestamp define archived_at), depois a cascata
+  com esse mesmo archived_at;
+- restaurar: primeiro a cascata (limpa só as linhas com o archived_at do
+  pipeline), por último as flags. Linhas arquivadas antes, por outro
+  motivo, não são tocadas.
+
+Interrompido no meio, basta rodar de novo com a mesma seleção: pipelines
+já arquivados reaproveitam o próprio archived_at e a cascata continua de
+onde parou. Com --tenant, os pipelines já arquivados que ainda têm filhos
+sem archived_at entram na seleção (independente de --inactive-days).
+
+A cascata anda pipeline a pipeline em lotes keyset (pipeline_id = X AND
+id > último, servidos pelo índice (pipeline_id, id)) e cada UPDATE segura
+os locks das linhas só pelo tempo do próprio statement. O tamanho do lote se ajusta
+ao orçamento --lock-budget-ms (cai pela metade quando um lote estoura,
+cresce quando sobra folga) e --pause-ms dá respiro ao board entre lotes.
+Os tenants são processados em sequência de propósito.
+
+Uso:
+    python pipeline_archiver.py --pipeline <uuid> [--pipeline <uuid> ...]
+    python pipeline_archiver.py --tenant <uuid> --inactive-days 180 [--dry-run]
+    python pipeline_archiver.py --restore --tenant <uuid>
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from supabase_rest import Throughput, add_backend_argument, chunked, connect, in_filter
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_MAX_BATCH_SIZE = 500
+DEFAULT_LOCK_BUDGET_MS = 250
+DEFAULT_PAUSE_MS = 50
+PIPELINE_CHUNK = 100
+PROGRESS_INTERVAL = 5.0
+
+# Filhos antes dos pais: tasks e histórico referenciam leads, leads referenciam etapas
+CASCADE_TABLES = ('cadence_task_instances', 'lead_outcome_history', 'pipeline_leads', 'pipeline_stages')
+
+
+class LockBudget:
+    """Tamanho de lote adaptativo para que cada UPDATE caiba em budget_ms"""
+
+    def __init__(self, budget_ms=DEFAULT_LOCK_BUDGET_MS, batch_size=DEFAULT_BATCH_SIZE,
+                 max_batch_size=DEFAULT_MAX_BATCH_SIZE, min_batch_size=10):
+        self.budget = budget_ms / 1000
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max(max_batch_size, min_batch_size)
+        self.batch_size = min(max(batch_size, min_batch_size), self.max_batch_size)
+        self.slowest = 0.0
+        self.over_budget = 0
+
+    def record(self, seconds):
+        self.slowest = max(self.slowest, seconds)
+        if seconds > self.budget:
+            self.over_budget += 1
+            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+        elif seconds < self.budget / 2:
+            self.batch_size = min(self.max_batch_size, self.batch_size + self.batch_size // 2)
+
+
+class Progress:
+    """Linha de progresso a cada PROGRESS_INTERVAL segundos"""
+
+    def __init__(self, meter, budget):
+        self.meter = meter
+        self.budget = budget
+        self.last = time.perf_counter()
+
+    def tick(self, table, rows):
+        now = time.perf_counter()
+        if now - self.last >= PROGRESS_INTERVAL:
+            self.last = now
+            print(f"   🔄 {table}: {rows} linhas | total {self.meter} | lote {self.budget.batch_size}")
+
+
+def select_pipelines(client, pipeline_ids=(), tenant_ids=(), archived=False, inactive_days=None):
+    """Pipelines a processar: os --pipeline informados, mais os dos tenants no estado oposto ao alvo"""
+
+    columns = 'id,tenant_id,name,is_archived,archived_at'
+    selected = {}
+    for batch in chunked(list(pipeline_ids), PIPELINE_CHUNK):
+        for row in client.select('pipelines', {'select': columns, 'id': in_filter(batch)}) or []:
+            selected[row['id']] = row
+
+    filters = {'is_archived': 'is.true' if archived else 'is.false'}
+    if inactive_days is not None:
+        cutoff = datetime.now(timezone.utc) - timedelta(days=inactive_days)
+        filters['updated_at'] = f'lt.{cutoff.isoformat()}'
+    for tenant_id in tenant_ids:
+        for rows in client.fetch_keyset('pipelines', columns, filters=dict(filters, tenant_id=f'eq.{tenant_id}')):
+            selected.update((row['id'], row) for row in rows)
+        if not archived:
+            # rodada anterior interrompida: o pipeline já está arquivado (e o updated_at mudou
+            # com a flag), mas ainda há filhos sem archived_at
+            for rows in client.fetch_keyset('pipelines', columns,
+                                            filters={'is_archived': 'is.true', 'tenant_id': f'eq.{tenant_id}'}):
+                selected.update((row['id'], row) for row in rows
+                                if row['id'] not in selected and has_pending_children(client, row['id']))
+    return list(selected.values())
+
+
+def has_pending_children(client, pipeline_id):
+    """Alguma tabela filha ainda tem linha do pipeline sem archived_at?"""
+
+    params = {'select': 'id', 'pipeline_id': f'eq.{pipeline_id}', 'archived_at': 'is.null', 'limit': '1'}
+    return any(client.select(table, params) for table in CASCADE_TABLES)
+
+
+def flag_pipelines(client, pipelines, archive, archived_by=None):
+    """Virar as flags; retorna as linhas atualizadas (com o archived_at gravado)"""
+
+    if archive:
+        values = {'is_archived': True, 'archived_at': datetime.now(timezone.utc).isoformat(), 'is_active': False}
+        if archived_by:
+            values['archived_by'] = archived_by
+        match = 'is.false'
+    else:
+        values = {'is_archived': False, 'archived_at': None, 'is_active': True}
+        match = 'is.true'
+
+    updated = []
+    for batch in chunked([row['id'] for row in pipelines], PIPELINE_CHUNK):
+        updated.extend(client.update('pipelines', {'id': in_filter(batch), 'is_archived': match}, values,
+                                     returning=True))
+    return updated
+
+
+def group_by_archived_at(pipelines):
+    """Pipelines arquivados no mesmo statement compartilham o archived_at: uma cascata por grupo"""
+
+    groups = {}
+    for row in pipelines:
+        if row.get('archived_at'):
+            groups.setdefault(row['archived_at'], []).append(row['id'])
+    return groups
+
+
+def cascade_table(client, table, pipeline_id, match, values, budget, meter, progress, pause, dry_run=False):
+    """Percorrer as linhas do pipeline em lotes keyset e aplicar `values` nas que casam com `match`"""
+
+    touched = 0
+    after = None
+    while True:
+        limit = budget.batch_size
+        # um pipeline por vez: pipeline_id = X AND id > último é uma faixa contínua do índice
+        params = {'select': 'id', 'pipeline_id': f'eq.{pipeline_id}', 'archived_at': match,
+                  'order': 'id.asc', 'limit': str(limit)}
+        if after is not None:
+            params['id'] = f'gt.{after}'
+        ids = [row['id'] for row in client.select(table, params) or []]
+        if not ids:
+            break
+
+        if not dry_run:
+            started = time.perf_counter()
+            client.update(table, {'id': in_filter(ids), 'archived_at': match}, values)
+            budget.record(time.perf_counter() - started)
+            if pause:
+                time.sleep(pause)
+
+        touched += len(ids)
+        meter.add(len(ids))
+        progress.tick(table, touched)
+        after = ids[-1]
+        if len(ids) < limit:
+            break
+    return touched
+
+
+def run_cascade(client, groups, restore, budget, meter, pause, dry_run=False):
+    """Cascata de todos os grupos; retorna linhas tocadas por tabela"""
+
+    tables = tuple(reversed(CASCADE_TABLES)) if restore else CASCADE_TABLES
+    progress = Progress(meter, budget)
+    counts = dict.fromkeys(tables, 0)
+    for archived_at, pipeline_ids in groups.items():
+        match = f'eq.{archived_at}' if restore else 'is.null'
+        values = {'archived_at': None if restore else archived_at}
+        for pipeline_id in pipeline_ids:
+            for table in tables:
+                counts[table] += cascade_table(client, table, pipeline_id, match, values, budget, meter,
+                                               progress, pause, dry_run)
+    return counts
+
+
+def archive_pipelines(client, pipelines, archived_by=None, budget=None, pause=0.0, dry_run=False):
+    """Arquivar os pipelines e propagar para as tabelas filhas"""
+
+    budget = budget or LockBudget()
+    meter = Throughput()
+    pending = [row for row in pipelines if not row['is_archived']]
+    flagged = pending if dry_run else flag_pipelines(client, pending, True, archived_by)
+
+    if dry_run:
+        # sem archived_at real ainda: conta as linhas ativas de todos os selecionados juntos
+        groups = {'dry-run': [row['id'] for row in pipelines]}
+    else:
+        flagged_ids = {row['id'] for row in flagged}
+        groups = group_by_archived_at(flagged + [row for row in pipelines
+                                                 if row['is_archived'] and row['id'] not in flagged_ids])
+
+    counts = run_cascade(client, groups, False, budget, meter, pause, dry_run)
+    return build_totals('archive', pipelines, len(flagged), counts, budget, meter, client)
+
+
+def restore_pipelines(client, pipelines, budget=None, pause=0.0, dry_run=False):
+    """Restaurar a cascata (só as linhas com o archived_at do pipeline) e depois as flags"""
+
+    budget = budget or LockBudget()
+    meter = Throughput()
+    archived = [row for row in pipelines if row['is_archived']]
+    counts = run_cascade(client, group_by_archived_at(archived), True, budget, meter, pause, dry_run)
+    flagged = archived if dry_run else flag_pipelines(client, archived, False)
+    return build_totals('restore', pipelines, len(flagged), counts, budget, meter, client)
+
+
+def build_totals(mode, pipelines, flagged, counts, budget, meter, client):
+    return {
+        'mode': mode,
+        'pipelines': len(pipelines),
+        'flagged': flagged,
+        'tables': counts,
+        'rows': meter.rows,
+        'batch_size': budget.batch_size,
+        'slowest_ms': budget.slowest * 1000,
+        'over_budget': budget.over_budget,
+        'elapsed': meter.elapsed,
+        'rows_per_second': meter.rate,
+        'round_trips': client.round_trips
+    }
+
+
+def print_report(totals):
+    action = 'arquivados' if totals['mode'] == 'archive' else 'restaurados'
+    print(f"\n📊 Pipelines selecionados: {totals['pipelines']} ({action} agora: {totals['flagged']})")
+    for table, count in totals['tables'].items():
+        print(f"   {table + ':':<24} {count}")
+    print(f"   lote final: {totals['batch_size']} | UPDATE mais lento: {totals['slowest_ms']:.0f}ms | "
+          f"acima do orçamento: {totals['over_budget']}")
+    print(f"   {totals['rows']} linhas em {totals['elapsed']:.1f}s ({totals['rows_per_second']:,.0f} linhas/s), "
+          f"{totals['round_trips']} round trips")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Arquivar/restaurar pipelines em lote, com cascata')
+    parser.add_argument('--pipeline', action='append', default=[], help='pipeline_id (pode repetir)')
+    parser.add_argument('--tenant', action='append', default=[],
+                        help='pipelines do tenant ainda não arquivados (ou arquivados, com --restore), mais os '
+                             'arquivados com cascata pendente')
+    parser.add_argument('--inactive-days', type=int, help='--tenant: só pipelines sem atualização há N dias')
+    parser.add_argument('--restore', action='store_true', help='restaurar em vez de arquivar')
+    parser.add_argument('--archived-by', help='archived_by gravado nos pipelines (uuid do usuário)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='linhas no primeiro lote')
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE, help='teto do lote')
+    parser.add_argument('--lock-budget-ms', type=int, default=DEFAULT_LOCK_BUDGET_MS,
+                        help='tempo máximo desejado por UPDATE (ajusta o lote)')
+    parser.add_argument('--pause-ms', type=int, default=DEFAULT_PAUSE_MS, help='pausa entre lotes')
+    parser.add_argument('--dry-run', action='store_true', help='apenas contar as linhas afetadas')
+    add_backend_argument(parser)
+    args = parser.parse_args(argv)
+    if not (args.pipeline or args.tenant):
+        parser.error('informe --pipeline ou --tenant')
+
+    print("🗄️ ARQUIVAMENTO EM LOTE: pipelines")
+    print("=" * 50)
+
+    client = connect(args.backend)
+    pipelines = select_pipelines(client, args.pipeline, args.tenant, archived=args.restore,
+                                 inactive_days=args.inactive_days)
+    missing = set(args.pipeline) - {row['id'] for row in pipelines}
+    for pipeline_id in sorted(missing):
+        print(f"⚠️  Pipeline {pipeline_id} não encontrado")
+
+    print(f"   modo: {'restaurar' if args.restore else 'arquivar'} | pipelines: {len(pipelines)} | "
+          f"orçamento: {args.lock_budget_ms}ms | pausa: {args.pause_ms}ms | dry-run: {args.dry_run}")
+    if not pipelines:
+        print("✅ Nada a fazer")
+        return 1 if missing else 0
+
+    budget = LockBudget(args.lock_budget_ms, args.batch_size, args.max_batch_size)
+    pause = args.pause_ms / 1000
+    if args.restore:
+        totals = restore_pipelines(client, pipelines, budget, pause, args.dry_run)
+    else:
+        totals = archive_pipelines(client, pipelines, args.archived_by, budget, pause, args.dry_run)
+    print_report(totals)
+
+    print(f"\n🏁 TOTAL: {totals['rows']} linhas, {totals['flagged']} pipeline(s) "
+          f"{'restaurados' if args.restore else 'arquivados'}")
+    if missing:
+        print(f"⚠️  {len(missing)} pipeline(s) não encontrados")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
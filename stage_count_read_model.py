@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+📊 READ MODEL DO KANBAN: pipeline_stage_counts
+==============================================
+
+Mantém a tabela pipeline_stage_counts (migration
+20250825000001-create-pipeline-stage-counts.sql) com a quantidade de leads e
+a soma de valor_total_calculado por (tenant, pipeline, etapa). O board lê uma
+linha por etapa em vez de contar pipeline_leads a cada carregamento.
+
+Dois modos de escrita:
+
+- eventos: JSON lines no formato dos Database Webhooks do Supabase para
+  pipeline_leads ({"type": "INSERT|UPDATE|DELETE", "record": {...},
+  "old_record": {...}}). Os deltas são agregados em memória por etapa (um
+  lead que entra e sai da etapa no mesmo bloco se anula) e somados às
+  contagens pela RPC apply_pipeline_stage_count_deltas, uma chamada por
+  bloco. Cada evento é identificado pelo "id" do payload ou pelo SHA-256 do
+  payload; chaves já registradas em pipeline_stage_count_events são puladas
+  e a RPC registra as novas na mesma transação dos deltas, então reenviar ou
+  reprocessar um arquivo não soma o mesmo evento duas vezes;
+- rebuild: recontagem completa por tenant, em paralelo, lendo pipeline_leads
+  por keyset; toda etapa da pipeline ganha linha (inclusive as vazias) e
+  linhas antigas do tenant que não foram regravadas são removidas. Corrige
+  qualquer deriva dos eventos; pause a aplicação de eventos enquanto roda.
+
+Uso:
+    python stage_count_read_model.py --events webhooks.jsonl [--key-retention-days 30]
+    python stage_count_read_model.py --rebuild --all-tenants --workers 4 [--dry-run]
+    python stage_count_read_model.py --show <pipeline_id>
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from supabase_rest import Throughput, add_backend_argument, chunked, connect, in_filter, list_tenant_ids
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_EVENT_CHUNK = 5000
+DEFAULT_KEY_RETENTION_DAYS = 30
+KEY_LOOKUP_CHUNK = 100  # chaves por filtro in.(...) (limite de URL do PostgREST)
+
+COUNTS_TABLE = 'pipeline_stage_counts'
+EVENTS_TABLE = 'pipeline_stage_count_events'
+DELTAS_RPC = 'apply_pipeline_stage_count_deltas'
+LEAD_COLUMNS = 'id,pipeline_id,stage_id,valor_total_calculado::text'
+
+
+def lead_value(record):
+    """valor_total_calculado como Decimal (nulo = 0)"""
+
+    value = record.get('valor_total_calculado')
+    return Decimal(str(value)) if value not in (None, '') else Decimal(0)
+
+
+class StageCountDeltas:
+    """Deltas de (lead_count, value_sum) por (tenant_id, pipeline_id, stage_id)"""
+
+    def __init__(self):
+        self.deltas = {}
+        self.events = 0
+        self.ignored = 0
+
+    def add(self, record, sign):
+        if not record or not record.get('stage_id') or not record.get('pipeline_id'):
+            return
+        key = (record.get('tenant_id'), record['pipeline_id'], record['stage_id'])
+        count, value = self.deltas.get(key, (0, Decimal(0)))
+        self.deltas[key] = (count + sign, value + sign * lead_value(record))
+
+    def apply_event(self, event):
+        kind = (event.get('type') or '').upper()
+        if kind not in ('INSERT', 'UPDATE', 'DELETE') or event.get('table', 'pipeline_leads') != 'pipeline_leads':
+            self.ignored += 1
+            return
+        self.events += 1
+        if kind in ('UPDATE', 'DELETE'):
+            self.add(event.get('old_record'), -1)
+        if kind in ('INSERT', 'UPDATE'):
+            self.add(event.get('record'), 1)
+
+    def rows(self):
+        """Somente etapas com delta diferente de zero"""
+
+        return [
+            {'tenant_id': tenant_id, 'pipeline_id': pipeline_id, 'stage_id': stage_id,
+             'lead_count': count, 'value_sum': str(value)}
+            for (tenant_id, pipeline_id, stage_id), (count, value) in self.deltas.items()
+            if count or value
+        ]
+
+
+def read_events(path):
+    """Payloads de webhook em JSON lines ('-' = stdin)"""
+
+    f = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def event_key(event):
+    """'id' do payload ou SHA-256 do payload canônico"""
+
+    if event.get('id'):
+        return str(event['id'])
+    payload = json.dumps(event, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def applied_keys(client, keys):
+    """Chaves que já estão em pipeline_stage_count_events"""
+
+    found = set()
+    for batch in chunked(keys, KEY_LOOKUP_CHUNK):
+        found.update(row['event_key'] for row in client.select(EVENTS_TABLE, {
+            'select': 'event_key', 'event_key': in_filter(batch)}) or [])
+    return found
+
+
+def apply_events(client, events, event_chunk=DEFAULT_EVENT_CHUNK, dry_run=False):
+    """Agregar eventos em blocos e somar os deltas via RPC, uma vez por evento"""
+
+    totals = {'events': 0, 'ignored': 0, 'duplicates': 0, 'deltas': 0, 'applied': 0}
+    meter = Throughput()
+
+    for block in chunked(events, event_chunk):
+        # repetidos no bloco contam uma vez; os já registrados ficam de fora
+        keyed = {}
+        for event in block:
+            keyed.setdefault(event_key(event), event)
+        seen = applied_keys(client, list(keyed))
+        new_keys = [key for key in keyed if key not in seen]
+
+        deltas = StageCountDeltas()
+        for key in new_keys:
+            deltas.apply_event(keyed[key])
+        rows = deltas.rows()
+
+        totals['events'] += deltas.events
+        totals['ignored'] += deltas.ignored
+        totals['duplicates'] += len(block) - len(new_keys)
+        totals['deltas'] += len(rows)
+        meter.add(len(block))
+
+        if dry_run or not new_keys:
+            continue
+        # chaves e deltas na mesma transação: uma única chamada por bloco
+        totals['applied'] += client.rpc(DELTAS_RPC, {'p_deltas': rows, 'p_event_keys': new_keys}) or 0
+
+    totals['elapsed'] = meter.elapsed
+    totals['events_per_second'] = meter.rate
+    return totals
+
+
+def prune_event_keys(client, retention_days):
+    """Apagar chaves de eventos mais antigas que a janela de reenvio"""
+
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).isoformat()
+    client.delete(EVENTS_TABLE, {'applied_at': f'lt.{cutoff}'})
+
+
+def load_stages(client, tenant_id):
+    """{stage_id: pipeline_id} de todas as pipelines do tenant"""
+
+    pipeline_ids = [row['id'] for rows in client.fetch_keyset('pipelines', 'id',
+                                                              filters={'tenant_id': f'eq.{tenant_id}'})
+                    for row in rows]
+    stages = {}
+    for batch in chunked(pipeline_ids, 200):
+        for stage in client.select('pipeline_stages', {'select': 'id,pipeline_id',
+                                                       'pipeline_id': in_filter(batch)}) or []:
+            stages[stage['id']] = stage['pipeline_id']
+    return stages
+
+
+def count_leads(client, tenant_id, stages, chunk_size):
+    """Contagem completa: {stage_id: [lead_count, value_sum]} + leads fora das etapas conhecidas"""
+
+    counts = {stage_id: [0, Decimal(0)] for stage_id in stages}
+    scanned = 0
+    unknown_stage = 0
+
+    for rows in client.fetch_keyset('pipeline_leads', LEAD_COLUMNS,
+                                    filters={'tenant_id': f'eq.{tenant_id}'}, page_size=chunk_size):
+        scanned += len(rows)
+        for row in rows:
+            slot = counts.get(row['stage_id'])
+            if slot is None or stages[row['stage_id']] != row['pipeline_id']:
+                unknown_stage += 1
+                continue
+            slot[0] += 1
+            slot[1] += lead_value(row)
+
+    return counts, scanned, unknown_stage
+
+
+def load_current(client, tenant_id):
+    current = {}
+    for rows in client.fetch_keyset(COUNTS_TABLE, 'stage_id,lead_count,value_sum::text',
+                                    filters={'tenant_id': f'eq.{tenant_id}'}, key='stage_id'):
+        for row in rows:
+            current[row['stage_id']] = (row['lead_count'], Decimal(row['value_sum']))
+    return current
+
+
+def rebuild_tenant(tenant_id, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=DEFAULT_BATCH_SIZE,
+                   dry_run=False, client=None, backend='rest'):
+    """Recontar um tenant inteiro; em dry-run só mede a deriva do read model"""
+
+    client = client or connect(backend)
+    meter = Throughput()
+    started_at = datetime.now(timezone.utc).isoformat()
+
+    stages = load_stages(client, tenant_id)
+    counts, scanned, unknown_stage = count_leads(client, tenant_id, stages, chunk_size)
+    meter.add(scanned)
+
+    current = load_current(client, tenant_id)
+    drifted = sum(1 for stage_id, (count, value) in counts.items()
+                  if current.get(stage_id) != (count, value))
+    stale = sum(1 for stage_id in current if stage_id not in counts)
+
+    totals = {'tenant_id': tenant_id, 'stages': len(stages), 'scanned': scanned,
+              'unknown_stage': unknown_stage, 'drifted': drifted, 'stale': stale, 'written': 0}
+
+    if not dry_run:
+        rows = [
+            {'pipeline_id': stages[stage_id], 'stage_id': stage_id, 'tenant_id': tenant_id,
+             'lead_count': count, 'value_sum': str(value), 'updated_at': started_at}
+            for stage_id, (count, value) in counts.items()
+        ]
+        for batch in chunked(rows, batch_size):
+            client.upsert(COUNTS_TABLE, batch, on_conflict='pipeline_id,stage_id')
+            totals['written'] += len(batch)
+        if stale:
+            client.delete(COUNTS_TABLE, {'tenant_id': f'eq.{tenant_id}', 'updated_at': f'lt.{started_at}'})
+
+    totals['elapsed'] = meter.elapsed
+    totals['rows_per_second'] = meter.rate
+    totals['round_trips'] = client.round_trips
+    return totals
+
+
+def board_counts(client, pipeline_id):
+    """Contagens do board na ordem das etapas (O(etapas) linhas lidas)"""
+
+    stages = client.select('pipeline_stages', {'select': 'id,name,order_index',
+                                               'pipeline_id': f'eq.{pipeline_id}',
+                                               'order': 'order_index.asc'}) or []
+    counts = {row['stage_id']: row for row in client.select(COUNTS_TABLE, {
+        'select': 'stage_id,lead_count,value_sum::text',
+        'pipeline_id': f'eq.{pipeline_id}'
+    }) or []}
+
+    return [
+        {'stage_id': stage['id'], 'name': stage['name'],
+         'lead_count': counts.get(stage['id'], {}).get('lead_count', 0),
+         'value_sum': Decimal(counts.get(stage['id'], {}).get('value_sum') or 0)}
+        for stage in stages
+    ]
+
+
+def print_rebuild_report(totals, dry_run):
+    print(f"\n📊 Tenant {totals['tenant_id']}")
+    print(f"   etapas:                {totals['stages']}")
+    print(f"   pipeline_leads lidos:  {totals['scanned']} "
+          f"({totals['rows_per_second']:,.0f} linhas/s, {totals['round_trips']} round trips)")
+    print(f"   etapas com deriva:     {totals['drifted']}")
+    print(f"   linhas obsoletas:      {totals['stale']}")
+    if not dry_run:
+        print(f"   linhas gravadas:       {totals['written']}")
+    if totals['unknown_stage']:
+        print(f"   ⚠️  leads em etapa desconhecida: {totals['unknown_stage']}")
+
+
+def run_rebuild(args):
+    tenants = list(args.tenant)
+    if args.all_tenants:
+        tenants.extend(t for t in list_tenant_ids(connect(args.backend)) if t not in tenants)
+
+    print(f"   rebuild | tenants: {len(tenants)} | workers: {args.workers} | dry-run: {args.dry_run}")
+
+    meter = Throughput()
+    failures = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {
+            executor.submit(rebuild_tenant, tenant_id, args.chunk_size, args.batch_size,
+                            args.dry_run, backend=args.backend): tenant_id
+            for tenant_id in tenants
+        }
+        for future in as_completed(futures):
+            tenant_id = futures[future]
+            try:
+                totals = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"\n❌ Tenant {tenant_id}: {e}")
+                continue
+            meter.add(totals['scanned'])
+            print_rebuild_report(totals, args.dry_run)
+
+    print(f"\n🏁 TOTAL: {meter}")
+    if failures:
+        print(f"⚠️  {failures} tenant(s) falharam")
+        return 1
+    return 0
+
+
+def run_events(args):
+    client = connect(args.backend)
+    totals = apply_events(client, read_events(args.events), args.event_chunk, args.dry_run)
+    if not args.dry_run and args.key_retention_days:
+        prune_event_keys(client, args.key_retention_days)
+
+    print(f"\n📊 RESULTADO:")
+    print(f"   eventos aplicados:     {totals['events']} ({totals['events_per_second']:,.0f} eventos/s)")
+    if totals['ignored']:
+        print(f"   ⚠️  eventos ignorados:   {totals['ignored']}")
+    if totals['duplicates']:
+        print(f"   eventos já aplicados:  {totals['duplicates']} (pulados)")
+    label = 'a aplicar (dry-run)' if args.dry_run else 'aplicados'
+    print(f"   deltas por etapa:      {totals['deltas']} ({label}: {totals['applied']})")
+    print(f"   round trips:           {client.round_trips}")
+    return 0
+
+
+def run_show(args):
+    rows = board_counts(connect(args.backend), args.show)
+    print(f"\n{'etapa':<30} {'leads':>8} {'valor':>16}")
+    for row in rows:
+        print(f"{row['name'][:30]:<30} {row['lead_count']:>8} {row['value_sum']:>16,.2f}")
+    print(f"{'TOTAL':<30} {sum(r['lead_count'] for r in rows):>8} {sum(r['value_sum'] for r in rows):>16,.2f}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Read model de contagens por etapa do Kanban')
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--events', help="JSON lines de webhooks de pipeline_leads ('-' = stdin)")
+    mode.add_argument('--rebuild', action='store_true', help='recontagem completa por tenant')
+    mode.add_argument('--show', metavar='PIPELINE_ID', help='mostrar as contagens de um pipeline')
+    parser.add_argument('--tenant', action='append', default=[], help='rebuild: tenant_id (pode repetir)')
+    parser.add_argument('--all-tenants', action='store_true', help='rebuild: todas as empresas')
+    parser.add_argument('--workers', type=int, default=4, help='rebuild: tenants em paralelo')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='linhas por página de leitura')
+    parser.add_argument('--event-chunk', type=int, default=DEFAULT_EVENT_CHUNK, help='eventos agregados por bloco')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='rebuild: linhas por escrita')
+    parser.add_argument('--key-retention-days', type=int, default=DEFAULT_KEY_RETENTION_DAYS,
+                        help='eventos: dias que as chaves aplicadas ficam registradas (0 = não apagar)')
+    parser.add_argument('--dry-run', action='store_true', help='apenas calcular')
+    add_backend_argument(parser)
+    args = parser.parse_args(argv)
+    if args.rebuild and not (args.tenant or args.all_tenants):
+        parser.error('informe --tenant ou --all-tenants')
+
+    print("📊 READ MODEL: pipeline_stage_counts")
+    print("=" * 40)
+
+    if args.rebuild:
+        return run_rebuild(args)
+    if args.events:
+        return run_events(args)
+    return run_show(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
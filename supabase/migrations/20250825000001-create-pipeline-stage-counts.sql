@@ -0,0 +1,111 @@
+-- Migration: Criar read model pipeline_stage_counts para o Kanban
+-- Data: 2025-08-25
+-- Descrição: Contagem de leads e soma de valores por (tenant, pipeline, etapa),
+-- mantida por stage_count_read_model.py. O board lê O(etapas) linhas em vez de
+-- contar pipeline_leads a cada carregamento.
+
+-- =====================================================================================
+-- TABELA: pipeline_stage_counts
+-- Uma linha por etapa; lead_count/value_sum refletem pipeline_leads
+-- =====================================================================================
+
+CREATE TABLE IF NOT EXISTS pipeline_stage_counts (
+    pipeline_id UUID NOT NULL REFERENCES pipelines(id) ON DELETE CASCADE,
+    stage_id UUID NOT NULL REFERENCES pipeline_stages(id) ON DELETE CASCADE,
+    tenant_id UUID NOT NULL,
+    lead_count INTEGER NOT NULL DEFAULT 0,
+    value_sum DECIMAL(15,2) NOT NULL DEFAULT 0, -- Soma de pipeline_leads.valor_total_calculado
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (pipeline_id, stage_id)
+);
+
+-- =====================================================================================
+-- TABELA: pipeline_stage_count_events
+-- Eventos de webhook já somados às contagens (chave = id do payload ou SHA-256
+-- do payload); um evento reenviado ou reprocessado não é somado duas vezes
+-- =====================================================================================
+
+CREATE TABLE IF NOT EXISTS pipeline_stage_count_events (
+    event_key TEXT PRIMARY KEY,
+    applied_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- =====================================================================================
+-- ÍNDICES PARA PERFORMANCE
+-- =====================================================================================
+
+-- Leitura do board: WHERE pipeline_id = ? (coberto pela PK)
+-- Rebuild e limpeza por tenant
+CREATE INDEX IF NOT EXISTS idx_pipeline_stage_counts_tenant ON pipeline_stage_counts(tenant_id, pipeline_id);
+
+-- Limpeza das chaves mais antigas que a janela de reenvio dos webhooks
+CREATE INDEX IF NOT EXISTS idx_pipeline_stage_count_events_applied_at ON pipeline_stage_count_events(applied_at);
+
+-- =====================================================================================
+-- ROW LEVEL SECURITY (RLS)
+-- Somente leitura para usuários; escrita apenas via service role
+-- =====================================================================================
+
+ALTER TABLE pipeline_stage_counts ENABLE ROW LEVEL SECURITY;
+ALTER TABLE pipeline_stage_count_events ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "pipeline_stage_counts_tenant_read" ON pipeline_stage_counts
+    FOR SELECT USING (
+        tenant_id = (auth.jwt() ->> 'tenant_id')::UUID
+        OR (auth.jwt() ->> 'role') = 'super_admin'
+    );
+
+-- =====================================================================================
+-- FUNÇÃO: apply_pipeline_stage_count_deltas
+-- Registra as chaves dos eventos e soma os deltas (já agregados no cliente) às
+-- contagens atuais na mesma transação. Se alguma chave já estiver registrada
+-- (outra execução aplicou o evento), nada é gravado. Deltas de etapas que não
+-- existem mais são ignorados.
+-- =====================================================================================
+
+CREATE OR REPLACE FUNCTION apply_pipeline_stage_count_deltas(p_deltas JSONB, p_event_keys JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    v_applied INTEGER;
+    v_registered INTEGER;
+BEGIN
+    INSERT INTO pipeline_stage_count_events (event_key)
+    SELECT DISTINCT k.value FROM jsonb_array_elements_text(p_event_keys) AS k(value)
+    ON CONFLICT (event_key) DO NOTHING;
+
+    GET DIAGNOSTICS v_registered = ROW_COUNT;
+    IF v_registered < (SELECT COUNT(DISTINCT k.value) FROM jsonb_array_elements_text(p_event_keys) AS k(value)) THEN
+        RAISE EXCEPTION 'eventos já aplicados ao read model (execução concorrente?)'
+            USING ERRCODE = 'serialization_failure';
+    END IF;
+
+    INSERT INTO pipeline_stage_counts (pipeline_id, stage_id, tenant_id, lead_count, value_sum, updated_at)
+    SELECT d.pipeline_id, d.stage_id, d.tenant_id, d.lead_count, d.value_sum, NOW()
+    FROM jsonb_to_recordset(p_deltas) AS d(
+        pipeline_id UUID, stage_id UUID, tenant_id UUID, lead_count INTEGER, value_sum DECIMAL(15,2)
+    )
+    WHERE EXISTS (
+        SELECT 1 FROM pipeline_stages s WHERE s.id = d.stage_id AND s.pipeline_id = d.pipeline_id
+    )
+    ON CONFLICT (pipeline_id, stage_id) DO UPDATE SET
+        lead_count = pipeline_stage_counts.lead_count + EXCLUDED.lead_count,
+        value_sum = pipeline_stage_counts.value_sum + EXCLUDED.value_sum,
+        updated_at = NOW();
+
+    GET DIAGNOSTICS v_applied = ROW_COUNT;
+    RETURN v_applied;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE ALL ON FUNCTION apply_pipeline_stage_count_deltas(JSONB, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION apply_pipeline_stage_count_deltas(JSONB, JSONB) TO service_role;
+
+-- =====================================================================================
+-- COMENTÁRIOS DA TABELA
+-- =====================================================================================
+
+COMMENT ON TABLE pipeline_stage_counts IS 'Read model do Kanban: leads e valor total por etapa (stage_count_read_model.py)';
+COMMENT ON COLUMN pipeline_stage_counts.lead_count IS 'Quantidade de pipeline_leads na etapa';
+COMMENT ON COLUMN pipeline_stage_counts.value_sum IS 'Soma de valor_total_calculado dos leads na etapa';
+COMMENT ON TABLE pipeline_stage_count_events IS 'Eventos de pipeline_leads já aplicados a pipeline_stage_counts';
+COMMENT ON FUNCTION apply_pipeline_stage_count_deltas(JSONB, JSONB) IS 'Aplica deltas incrementais de contagem/valor por etapa, uma vez por evento';
@@ -0,0 +1,140 @@
+-- Migration: Criar agregados diários de conversão de formulários
+-- Data: 2025-08-25
+-- Descrição: Views e submissões por (formulário, dia), mantidas por
+-- form_conversion_refresher.py a partir das linhas agregadas de form_analytics
+-- (views por form_id/date) e de form_submissions. Dashboards leem os buckets
+-- prontos em vez de agregar as fontes a cada requisição.
+--
+-- Formulários: custom_forms, a tabela referenciada por form_submissions.form_id
+-- (20250617015606) e por form_analytics.form_id em types.ts. Linhas de
+-- form_analytics cujo form_id não é um custom_forms.id são ignoradas.
+
+-- =====================================================================================
+-- TABELA: form_conversion_daily
+-- conversion_rate segue a fórmula de calculate_form_conversion_rate()
+-- =====================================================================================
+
+CREATE TABLE IF NOT EXISTS form_conversion_daily (
+    form_id UUID NOT NULL REFERENCES custom_forms(id) ON DELETE CASCADE,
+    day DATE NOT NULL, -- Dia UTC do evento
+    tenant_id UUID NOT NULL,
+    views INTEGER NOT NULL DEFAULT 0,
+    submissions INTEGER NOT NULL DEFAULT 0,
+    conversion_rate DECIMAL(7,2) GENERATED ALWAYS AS (
+        CASE WHEN views > 0 THEN ROUND((submissions::DECIMAL / views::DECIMAL) * 100, 2) ELSE 0 END
+    ) STORED,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (form_id, day)
+);
+
+-- =====================================================================================
+-- TABELA: form_conversion_watermarks
+-- Até onde (form_analytics.updated_at / form_submissions.submitted_at) cada
+-- tenant já foi agregado
+-- =====================================================================================
+
+CREATE TABLE IF NOT EXISTS form_conversion_watermarks (
+    tenant_id UUID PRIMARY KEY,
+    refreshed_until TIMESTAMP WITH TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- =====================================================================================
+-- ÍNDICES PARA PERFORMANCE
+-- =====================================================================================
+
+-- Dashboards por tenant/período; rebuild e limpeza por tenant
+CREATE INDEX IF NOT EXISTS idx_form_conversion_daily_tenant_day ON form_conversion_daily(tenant_id, day);
+
+-- Leitura incremental a partir do watermark: agregados alterados e
+-- recálculo dos dias tocados (idx_form_analytics_form_date já existe em
+-- 20250127000000, mas não nas variantes posteriores do form builder)
+CREATE INDEX IF NOT EXISTS idx_form_analytics_form_updated_at ON form_analytics(form_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_form_analytics_form_date ON form_analytics(form_id, date);
+CREATE INDEX IF NOT EXISTS idx_form_submissions_form_submitted_at
+    ON form_submissions(form_id, submitted_at);
+
+-- =====================================================================================
+-- ROW LEVEL SECURITY (RLS)
+-- Somente leitura para usuários; escrita apenas via service role
+-- =====================================================================================
+
+ALTER TABLE form_conversion_daily ENABLE ROW LEVEL SECURITY;
+ALTER TABLE form_conversion_watermarks ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "form_conversion_daily_tenant_read" ON form_conversion_daily
+    FOR SELECT USING (
+        tenant_id = (auth.jwt() ->> 'tenant_id')::UUID
+        OR (auth.jwt() ->> 'role') = 'super_admin'
+    );
+
+-- =====================================================================================
+-- FUNÇÃO: apply_form_conversion_deltas
+-- Aplica uma janela (p_since, p_until] e avança o watermark do tenant na mesma
+-- transação. Cada item de p_deltas traz:
+--   views: total ABSOLUTO do dia (recalculado de form_analytics) ou null se o
+--          dia não foi tocado na janela;
+--   submissions: DELTA de submissões da janela.
+-- Se o watermark não for mais p_since (outra execução já aplicou a janela),
+-- nada é gravado.
+-- =====================================================================================
+
+CREATE OR REPLACE FUNCTION apply_form_conversion_deltas(
+    p_tenant_id UUID,
+    p_since TIMESTAMP WITH TIME ZONE,
+    p_until TIMESTAMP WITH TIME ZONE,
+    p_deltas JSONB
+)
+RETURNS INTEGER AS $$
+DECLARE
+    v_applied INTEGER;
+BEGIN
+    UPDATE form_conversion_watermarks
+    SET refreshed_until = p_until, updated_at = NOW()
+    WHERE tenant_id = p_tenant_id AND refreshed_until = p_since;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'watermark de % não está em % (janela já aplicada?)', p_tenant_id, p_since
+            USING ERRCODE = 'serialization_failure';
+    END IF;
+
+    SELECT COUNT(*) INTO v_applied
+    FROM jsonb_to_recordset(p_deltas) AS d(form_id UUID, day DATE, views INTEGER, submissions INTEGER)
+    WHERE EXISTS (SELECT 1 FROM custom_forms f WHERE f.id = d.form_id);
+
+    -- Views: substitui pelo total recalculado
+    INSERT INTO form_conversion_daily (form_id, day, tenant_id, views, submissions, updated_at)
+    SELECT d.form_id, d.day, p_tenant_id, d.views, 0, NOW()
+    FROM jsonb_to_recordset(p_deltas) AS d(form_id UUID, day DATE, views INTEGER, submissions INTEGER)
+    WHERE d.views IS NOT NULL
+    AND EXISTS (SELECT 1 FROM custom_forms f WHERE f.id = d.form_id)
+    ON CONFLICT (form_id, day) DO UPDATE SET
+        views = EXCLUDED.views,
+        updated_at = NOW();
+
+    -- Submissões: soma o delta da janela
+    INSERT INTO form_conversion_daily (form_id, day, tenant_id, views, submissions, updated_at)
+    SELECT d.form_id, d.day, p_tenant_id, 0, d.submissions, NOW()
+    FROM jsonb_to_recordset(p_deltas) AS d(form_id UUID, day DATE, views INTEGER, submissions INTEGER)
+    WHERE d.submissions <> 0
+    AND EXISTS (SELECT 1 FROM custom_forms f WHERE f.id = d.form_id)
+    ON CONFLICT (form_id, day) DO UPDATE SET
+        submissions = form_conversion_daily.submissions + EXCLUDED.submissions,
+        updated_at = NOW();
+
+    RETURN v_applied;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE ALL ON FUNCTION apply_form_conversion_deltas(UUID, TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE, JSONB)
+    FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION apply_form_conversion_deltas(UUID, TIMESTAMP WITH TIME ZONE, TIMESTAMP WITH TIME ZONE, JSONB)
+    TO service_role;
+
+-- =====================================================================================
+-- COMENTÁRIOS DA TABELA
+-- =====================================================================================
+
+COMMENT ON TABLE form_conversion_daily IS 'Views/submissões por formulário e dia (form_conversion_refresher.py)';
+COMMENT ON COLUMN form_conversion_daily.conversion_rate IS 'submissions / views * 100 (mesma regra de calculate_form_conversion_rate)';
+COMMENT ON TABLE form_conversion_watermarks IS 'Último instante de evento agregado por tenant';
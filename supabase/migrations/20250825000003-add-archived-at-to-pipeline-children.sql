@@ -0,0 +1,33 @@
+-- Migration: Propagar o arquivamento de pipelines para leads, etapas, tasks e histórico
+-- Data: 2025-08-25
+-- Descrição: archived_at nas tabelas filhas de pipelines, preenchido em lote por
+-- pipeline_archiver.py com o mesmo archived_at do pipeline. A restauração limpa
+-- apenas as linhas com esse carimbo, preservando o que já estava arquivado antes.
+
+-- =====================================================================================
+-- COLUNAS: archived_at
+-- NULL = linha ativa; mesmo valor de pipelines.archived_at = arquivada em cascata
+-- =====================================================================================
+
+ALTER TABLE pipeline_leads ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE pipeline_stages ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE cadence_task_instances ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP WITH TIME ZONE;
+ALTER TABLE lead_outcome_history ADD COLUMN IF NOT EXISTS archived_at TIMESTAMP WITH TIME ZONE;
+
+-- =====================================================================================
+-- ÍNDICES PARA PERFORMANCE
+-- Varredura keyset do arquivador: WHERE pipeline_id = ? AND id > ? ORDER BY id
+-- =====================================================================================
+
+CREATE INDEX IF NOT EXISTS idx_pipeline_leads_pipeline_id_id ON pipeline_leads(pipeline_id, id);
+CREATE INDEX IF NOT EXISTS idx_cadence_task_instances_pipeline_id_id ON cadence_task_instances(pipeline_id, id);
+CREATE INDEX IF NOT EXISTS idx_lead_outcome_history_pipeline_id_id ON lead_outcome_history(pipeline_id, id);
+
+-- =====================================================================================
+-- COMENTÁRIOS DAS COLUNAS
+-- =====================================================================================
+
+COMMENT ON COLUMN pipeline_leads.archived_at IS 'Arquivado junto com o pipeline (pipeline_archiver.py)';
+COMMENT ON COLUMN pipeline_stages.archived_at IS 'Arquivado junto com o pipeline (pipeline_archiver.py)';
+COMMENT ON COLUMN cadence_task_instances.archived_at IS 'Arquivado junto com o pipeline (pipeline_archiver.py)';
+COMMENT ON COLUMN lead_outcome_history.archived_at IS 'Arquivado junto com o pipeline (pipeline_archiver.py)';
@@ -0,0 +1,188 @@
+-- Migration: Criar safe_update_leads_batch (variante em lote de safe_update_lead)
+-- Data: 2025-08-25
+-- Descrição: Valida e aplica centenas de atualizações de leads_master em uma
+-- chamada, com o mesmo resultado por linha de safe_update_lead(target_lead_id,
+-- lead_data): campos filtrados como em validate_lead_update, COALESCE com o
+-- valor atual, updated_at = now() e nome sincronizado em pipeline_leads.
+-- Usada por lead_batch_updater.py.
+
+-- =====================================================================================
+-- FUNÇÃO: apply_lead_updates (interna)
+-- Um UPDATE para todas as linhas + um UPDATE de sincronização em pipeline_leads.
+-- Qualquer erro (cast, constraint, uuid inválido) aborta o conjunto inteiro;
+-- safe_update_leads_batch decide como isolar a linha com problema.
+-- =====================================================================================
+
+CREATE OR REPLACE FUNCTION apply_lead_updates(p_updates JSONB, p_columns TEXT[])
+RETURNS TABLE (updated_lead_id UUID, synced_count INTEGER) AS $$
+DECLARE
+    v_ids UUID[];
+    v_names TEXT[];
+BEGIN
+    -- Mesmo SET de safe_update_lead, com os dados já filtrados pelas colunas editáveis
+    WITH input AS (
+        SELECT
+            (u.value->>'lead_id')::UUID AS lead_id,
+            COALESCE(
+                (SELECT jsonb_object_agg(d.key, d.value) FROM jsonb_each(u.value->'data') d WHERE d.key = ANY(p_columns)),
+                '{}'::JSONB
+            ) AS data
+        FROM jsonb_array_elements(p_updates) u
+    ),
+    updated AS (
+        UPDATE leads_master lm
+        SET
+            first_name = COALESCE((i.data->>'first_name'), lm.first_name),
+            last_name = COALESCE((i.data->>'last_name'), lm.last_name),
+            email = COALESCE((i.data->>'email'), lm.email),
+            phone = COALESCE((i.data->>'phone'), lm.phone),
+            company = COALESCE((i.data->>'company'), lm.company),
+            job_title = COALESCE((i.data->>'job_title'), lm.job_title),
+            lead_source = COALESCE((i.data->>'lead_source'), lm.lead_source),
+            city = COALESCE((i.data->>'city'), lm.city),
+            state = COALESCE((i.data->>'state'), lm.state),
+            country = COALESCE((i.data->>'country'), lm.country),
+            notes = COALESCE((i.data->>'notes'), lm.notes),
+            lead_temperature = COALESCE((i.data->>'lead_temperature'), lm.lead_temperature),
+            status = COALESCE((i.data->>'status'), lm.status),
+            estimated_value = COALESCE((i.data->>'estimated_value')::decimal, lm.estimated_value),
+            utm_source = COALESCE((i.data->>'utm_source'), lm.utm_source),
+            utm_medium = COALESCE((i.data->>'utm_medium'), lm.utm_medium),
+            utm_campaign = COALESCE((i.data->>'utm_campaign'), lm.utm_campaign),
+            utm_term = COALESCE((i.data->>'utm_term'), lm.utm_term),
+            utm_content = COALESCE((i.data->>'utm_content'), lm.utm_content),
+            position = COALESCE((i.data->>'position'), lm.position),
+            source = COALESCE((i.data->>'source'), lm.source),
+            lead_score = COALESCE((i.data->>'lead_score')::integer, lm.lead_score),
+            probability = COALESCE((i.data->>'probability')::integer, lm.probability),
+            campaign_name = COALESCE((i.data->>'campaign_name'), lm.campaign_name),
+            referrer = COALESCE((i.data->>'referrer'), lm.referrer),
+            landing_page = COALESCE((i.data->>'landing_page'), lm.landing_page),
+            user_agent = COALESCE((i.data->>'user_agent'), lm.user_agent),
+            last_contact_date = COALESCE((i.data->>'last_contact_date')::timestamptz, lm.last_contact_date),
+            next_action_date = COALESCE((i.data->>'next_action_date')::timestamptz, lm.next_action_date),
+            updated_at = now()
+        FROM input i
+        WHERE lm.id = i.lead_id
+        RETURNING lm.id,
+            COALESCE(lm.first_name, '') ||
+            CASE WHEN lm.last_name IS NOT NULL AND lm.last_name != '' THEN ' ' || lm.last_name ELSE '' END AS nome
+    )
+    SELECT array_agg(updated.id), array_agg(updated.nome) INTO v_ids, v_names FROM updated;
+
+    IF v_ids IS NULL THEN
+        RETURN;
+    END IF;
+
+    -- O trigger de leads_master já sincroniza; corrige só o que ficou diferente
+    RETURN QUERY
+    WITH synced AS (
+        UPDATE pipeline_leads pl
+        SET custom_data = pl.custom_data || jsonb_build_object('nome', n.nome, 'nome_lead', n.nome),
+            updated_at = NOW()
+        FROM unnest(v_ids, v_names) AS n(lead_master_id, nome)
+        WHERE pl.lead_master_id = n.lead_master_id
+        AND (pl.custom_data->>'nome') IS DISTINCT FROM n.nome
+        RETURNING pl.lead_master_id
+    )
+    SELECT n.id, (SELECT COUNT(*)::INTEGER FROM synced s WHERE s.lead_master_id = n.id)
+    FROM unnest(v_ids) AS n(id);
+END;
+$$ LANGUAGE plpgsql;
+
+REVOKE ALL ON FUNCTION apply_lead_updates(JSONB, TEXT[]) FROM PUBLIC, anon, authenticated;
+
+-- =====================================================================================
+-- FUNÇÃO: safe_update_leads_batch
+-- p_updates: [{"lead_id": "<uuid>", "data": {...mesmo lead_data de safe_update_lead}}]
+--
+-- Caminho rápido: todas as linhas em um único UPDATE. Se algo falhar (ou se o
+-- mesmo lead_id aparecer mais de uma vez), o lote é reaplicado linha a linha, em
+-- ordem, cada uma em seu próprio bloco de exceção, e a linha com problema recebe
+-- o mesmo error/error_code que safe_update_lead devolveria.
+-- =====================================================================================
+
+CREATE OR REPLACE FUNCTION safe_update_leads_batch(p_updates JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    v_columns TEXT[];
+    v_applied JSONB := '{}';
+    v_errors JSONB := '{}';
+    v_mode TEXT := 'set';
+    v_update RECORD;
+    v_row RECORD;
+BEGIN
+    IF jsonb_typeof(p_updates) IS DISTINCT FROM 'array' THEN
+        RAISE EXCEPTION 'p_updates deve ser um array JSON' USING ERRCODE = 'invalid_parameter_value';
+    END IF;
+    IF jsonb_array_length(p_updates) > 1000 THEN
+        RAISE EXCEPTION 'Máximo de 1000 atualizações por chamada (recebidas %)', jsonb_array_length(p_updates)
+            USING ERRCODE = 'program_limit_exceeded';
+    END IF;
+
+    -- Colunas editáveis: mesma consulta de validate_lead_update, uma vez por chamada
+    SELECT array_agg(column_name::TEXT) INTO v_columns
+    FROM information_schema.columns
+    WHERE table_schema = 'public'
+    AND table_name = 'leads_master'
+    AND column_name NOT IN ('id', 'created_at');
+
+    BEGIN
+        IF (SELECT COUNT(DISTINCT u.value->>'lead_id') FROM jsonb_array_elements(p_updates) u)
+            < jsonb_array_length(p_updates) THEN
+            RAISE EXCEPTION 'lead_id repetido no lote';
+        END IF;
+
+        SELECT COALESCE(jsonb_object_agg(a.updated_lead_id::TEXT, a.synced_count), '{}') INTO v_applied
+        FROM apply_lead_updates(p_updates, v_columns) a;
+    EXCEPTION WHEN OTHERS THEN
+        v_mode := 'row';
+        v_applied := '{}';
+        FOR v_update IN SELECT u.value, u.ordinality FROM jsonb_array_elements(p_updates) WITH ORDINALITY u LOOP
+            BEGIN
+                FOR v_row IN SELECT * FROM apply_lead_updates(jsonb_build_array(v_update.value), v_columns) LOOP
+                    v_applied := v_applied || jsonb_build_object(v_row.updated_lead_id::TEXT, v_row.synced_count);
+                END LOOP;
+            EXCEPTION WHEN OTHERS THEN
+                v_errors := v_errors || jsonb_build_object(v_update.ordinality::TEXT,
+                    jsonb_build_object('error', SQLERRM, 'error_code', SQLSTATE));
+            END;
+        END LOOP;
+    END;
+
+    RETURN (
+        SELECT jsonb_build_object(
+            'success', true,
+            'mode', v_mode,
+            'updated', COUNT(*) FILTER (WHERE r.value->>'success' = 'true'),
+            'failed', COUNT(*) FILTER (WHERE r.value->>'success' = 'false'),
+            'results', COALESCE(jsonb_agg(r.value ORDER BY r.idx), '[]')
+        )
+        FROM (
+            SELECT u.ordinality AS idx,
+                CASE
+                    WHEN v_errors ? u.ordinality::TEXT THEN
+                        jsonb_build_object('index', u.ordinality - 1, 'lead_id', u.value->'lead_id', 'success', false)
+                        || (v_errors -> u.ordinality::TEXT)
+                    WHEN v_applied ? (u.value->>'lead_id') THEN
+                        jsonb_build_object('index', u.ordinality - 1, 'lead_id', u.value->'lead_id', 'success', true,
+                            'pipeline_leads_synced', v_applied -> (u.value->>'lead_id'))
+                    ELSE
+                        jsonb_build_object('index', u.ordinality - 1, 'lead_id', u.value->'lead_id', 'success', false,
+                            'error', 'Lead não encontrado', 'error_code', 'LEAD_NOT_FOUND')
+                END AS value
+            FROM jsonb_array_elements(p_updates) WITH ORDINALITY u
+        ) r
+    );
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE ALL ON FUNCTION safe_update_leads_batch(JSONB) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION safe_update_leads_batch(JSONB) TO authenticated, service_role;
+
+-- =====================================================================================
+-- COMENTÁRIOS
+-- =====================================================================================
+
+COMMENT ON FUNCTION safe_update_leads_batch(JSONB) IS 'Lote de safe_update_lead: valida e atualiza até 1000 leads por chamada, com resultado por linha';
+COMMENT ON FUNCTION apply_lead_updates(JSONB, TEXT[]) IS 'Interna de safe_update_leads_batch: UPDATE em conjunto + sincronização de pipeline_leads';
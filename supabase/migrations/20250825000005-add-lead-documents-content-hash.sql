@@ -0,0 +1,27 @@
+-- Migration: Adicionar content_hash em lead_documents
+-- Data: 2025-08-25
+-- Descrição: SHA-256 do conteúdo do arquivo, gravado por lead_document_uploader.py.
+-- Permite pular arquivos repetidos do mesmo lead no upload em lote; o índice
+-- único garante a regra mesmo com duas cargas rodando ao mesmo tempo.
+
+-- =====================================================================================
+-- COLUNA: content_hash
+-- NULL para documentos enviados antes (ou pela rota de upload individual)
+-- =====================================================================================
+
+ALTER TABLE lead_documents ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- =====================================================================================
+-- ÍNDICES PARA PERFORMANCE
+-- =====================================================================================
+
+-- Um mesmo conteúdo ativo por lead; também atende a busca de hashes por lead
+CREATE UNIQUE INDEX IF NOT EXISTS idx_lead_documents_lead_content_hash
+    ON lead_documents(lead_id, content_hash)
+    WHERE is_active = true AND content_hash IS NOT NULL;
+
+-- =====================================================================================
+-- COMENTÁRIOS DA COLUNA
+-- =====================================================================================
+
+COMMENT ON COLUMN lead_documents.content_hash IS 'SHA-256 (hex) do conteúdo; duplicatas ativas do mesmo lead são recusadas';
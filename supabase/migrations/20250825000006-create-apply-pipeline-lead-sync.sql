@@ -0,0 +1,44 @@
+-- Migration: Criar apply_pipeline_lead_sync (escrita em lote de lead_sync_engine.py)
+-- Data: 2025-08-25
+-- Descrição: Grava o resultado da sincronização leads_master -> pipeline_leads
+-- com um único UPDATE por lote, chaveado em id. Só lead_master_id,
+-- custom_data e updated_at são tocados: etapa, pipeline e demais colunas
+-- ficam como estão, mesmo que o lead tenha sido movido no Kanban entre a
+-- leitura e a escrita.
+
+-- =====================================================================================
+-- FUNÇÃO: apply_pipeline_lead_sync
+-- p_rows: [{"id": "<uuid>", "lead_master_id": "<uuid>", "custom_data": {...}, "updated_at": "..."}]
+-- Linhas que outro processo vinculou a um lead_master diferente no meio do
+-- caminho não são sobrescritas (ficam para a próxima execução).
+-- =====================================================================================
+
+CREATE OR REPLACE FUNCTION apply_pipeline_lead_sync(p_rows JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    v_updated INTEGER;
+BEGIN
+    UPDATE pipeline_leads pl
+    SET
+        lead_master_id = r.lead_master_id,
+        custom_data = r.custom_data,
+        updated_at = COALESCE(r.updated_at, NOW())
+    FROM jsonb_to_recordset(p_rows) AS r(
+        id UUID, lead_master_id UUID, custom_data JSONB, updated_at TIMESTAMP WITH TIME ZONE
+    )
+    WHERE pl.id = r.id
+    AND (pl.lead_master_id IS NULL OR pl.lead_master_id = r.lead_master_id);
+
+    GET DIAGNOSTICS v_updated = ROW_COUNT;
+    RETURN v_updated;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+REVOKE ALL ON FUNCTION apply_pipeline_lead_sync(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION apply_pipeline_lead_sync(JSONB) TO service_role;
+
+-- =====================================================================================
+-- COMENTÁRIOS
+-- =====================================================================================
+
+COMMENT ON FUNCTION apply_pipeline_lead_sync(JSONB) IS 'Grava vínculo e custom_data sincronizados em pipeline_leads (lead_sync_engine.py); não toca etapa nem pipeline';
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+🔌 SUPABASE REST: Cliente PostgREST compartilhado pelas ferramentas de dados
+===========================================================================
+
+Centraliza configuração, headers e os padrões de acesso em lote usados pelos
+scripts Python (paginação por keyset, upsert em lote e chamadas RPC).
+
+As credenciais vêm SEMPRE do ambiente (SUPABASE_URL e
+SUPABASE_SERVICE_ROLE_KEY), como no backend.
+
+`connect(backend)` escolhe, por execução, entre este cliente ('rest') e o
+PostgresClient de postgres_direct.py ('postgres'), que tem a mesma interface.
+"""
+
+import os
+import time
+from datetime import datetime
+
+# Configurações Supabase
+DEFAULT_TIMEOUT = 30
+DEFAULT_PAGE_SIZE = 1000
+BACKENDS = ('rest', 'postgres')
+
+
+class SupabaseRestError(Exception):
+    """Erro retornado pelo PostgREST"""
+
+    def __init__(self, status_code, message):
+        super().__init__(f"{status_code}: {message}")
+        self.status_code = status_code
+        self.message = message
+
+
+def load_config():
+    """Ler URL e service role key do ambiente"""
+
+    url = os.environ.get('SUPABASE_URL') or os.environ.get('VITE_SUPABASE_URL')
+    key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
+
+    if not url:
+        raise RuntimeError('SUPABASE_URL é obrigatória e deve estar definida na variável de ambiente')
+    if not key:
+        raise RuntimeError('SUPABASE_SERVICE_ROLE_KEY é obrigatória e deve estar definida na variável de ambiente')
+
+    return url.rstrip('/'), key
+
+
+def build_headers(service_role_key):
+    """Headers para service role"""
+
+    return {
+        'apikey': service_role_key,
+        'Authorization': f'Bearer {service_role_key}',
+        'Content-Type': 'application/json',
+        'Accept': 'application/json'
+    }
+
+
+class SupabaseRest:
+    """Sessão HTTP reutilizável contra /rest/v1 (uma por thread)"""
+
+    def __init__(self, url=None, service_role_key=None, timeout=DEFAULT_TIMEOUT, session=None):
+        if url is None or service_role_key is None:
+            url, service_role_key = load_config()
+
+        self.base_url = f"{url.rstrip('/')}/rest/v1"
+        self.timeout = timeout
+        self.round_trips = 0
+
+        if session is None:
+            import requests  # import tardio: só quem fala HTTP paga o custo
+            session = requests.Session()
+        session.headers.update(build_headers(service_role_key))
+        self.session = session
+
+    def _request(self, method, path, **kwargs):
+        self.round_trips += 1
+        response = self.session.request(
+            method, f"{self.base_url}/{path}", timeout=self.timeout, **kwargs
+        )
+        if response.status_code >= 400:
+            raise SupabaseRestError(response.status_code, response.text[:500])
+        if not response.content:
+            return None
+        return response.json()
+
+    def select(self, table, params):
+        """GET simples com filtros PostgREST"""
+        return self._request('GET', table, params=params)
+
+    def fetch_keyset(self, table, columns, filters=None, key='id', page_size=DEFAULT_PAGE_SIZE, after=None):
+        """Iterar uma tabela em páginas ordenadas por chave (sem OFFSET)
+
+        Cada página é uma lista de linhas; a próxima página começa depois da
+        maior chave já vista, então o custo por página é constante.
+        """
+
+        last_key = after
+        while True:
+            params = dict(filters or {})
+            params['select'] = columns
+            params['order'] = f'{key}.asc'
+            params['limit'] = str(page_size)
+            if last_key is not None:
+                params[key] = f'gt.{last_key}'
+
+            rows = self.select(table, params) or []
+            if not rows:
+                return
+            yield rows
+
+            if len(rows) < page_size:
+                return
+            last_key = rows[-1][key]
+
+    def upsert(self, table, rows, on_conflict='id', returning=False):
+        """INSERT ... ON CONFLICT DO UPDATE em um único round trip"""
+
+        if not rows:
+            return []
+        prefer = 'resolution=merge-duplicates,'
+        prefer += 'return=representation' if returning else 'return=minimal'
+        return self._request(
+            'POST', table,
+            params={'on_conflict': on_conflict},
+            json=rows,
+            headers={'Prefer': prefer}
+        ) or []
+
+    def insert(self, table, rows, returning=False):
+        """INSERT em lote"""
+
+        if not rows:
+            return []
+        prefer = 'return=representation' if returning else 'return=minimal'
+        return self._request('POST', table, json=rows, headers={'Prefer': prefer}) or []
+
+    def update(self, table, filters, values, returning=False):
+        """PATCH com filtros PostgREST (ex.: {'id': 'in.(...)'})"""
+
+        prefer = 'return=representation' if returning else 'return=minimal'
+        return self._request('PATCH', table, params=filters, json=values, headers={'Prefer': prefer}) or []
+
+    def delete(self, table, filters):
+        """DELETE com filtros PostgREST"""
+        return self._request('DELETE', table, params=filters, headers={'Prefer': 'return=minimal'})
+
+    def rpc(self, function_name, params):
+        """Chamar função RPC (POST /rest/v1/rpc/<nome>)"""
+        return self._request('POST', f'rpc/{function_name}', json=params)
+
+    def openapi(self):
+        """Documento OpenAPI do PostgREST (tabelas, colunas e formatos)"""
+        return self._request('GET', '', headers={'Accept': 'application/openapi+json'})
+
+
+def connect(backend='rest'):
+    """Cliente de dados do backend escolhido (um por thread)"""
+
+    if backend == 'postgres':
+        from postgres_direct import PostgresClient  # só carrega psycopg se usado
+        return PostgresClient()
+    if backend != 'rest':
+        raise ValueError(f'backend desconhecido: {backend!r}')
+    return SupabaseRest()
+
+
+def add_backend_argument(parser):
+    parser.add_argument('--backend', choices=BACKENDS, default='rest',
+                        help='rest (PostgREST) ou postgres (conexão direta via SUPABASE_DB_URL)')
+
+
+def list_tenant_ids(client):
+    """IDs de todas as empresas (tenant_id = companies.id)"""
+
+    tenants = []
+    for rows in client.fetch_keyset('companies', 'id'):
+        tenants.extend(row['id'] for row in rows)
+    return tenants
+
+
+def parse_timestamp(value):
+    """timestamptz do PostgREST (ISO 8601, aceita sufixo Z) -> datetime"""
+
+    if value is None:
+        return None
+    value = value.strip()
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    return datetime.fromisoformat(value)
+
+
+def in_filter(values):
+    """Montar filtro PostgREST `in.(a,b,c)`"""
+    return 'in.(' + ','.join(str(v) for v in values) + ')'
+
+
+def chunked(items, size):
+    """Dividir uma sequência em listas de até `size` itens"""
+
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Throughput:
+    """Contador simples de linhas/segundo para relatórios"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.rows = 0
+
+    def add(self, count):
+        self.rows += count
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+    @property
+    def rate(self):
+        elapsed = self.elapsed
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self):
+        return f"{self.rows} linhas em {self.elapsed:.1f}s ({self.rate:,.0f} linhas/s)"
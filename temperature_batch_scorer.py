@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+🌡️ RECÁLCULO EM LOTE: Temperatura e score dos leads por tenant
+==============================================================
+
+Reaplica a configuração de temperatura (temperature_config /
+update_temperature_config) a um tenant inteiro em uma única passada, sem
+disparar o trigger linha a linha:
+
+1. configurações e etapas iniciais do tenant são carregadas uma vez em
+   vetores indexados por pipeline;
+2. pipeline_leads é lido por keyset e convertido em colunas NumPy, uma
+   coluna por vez (np.fromiter sobre os valores da coluna);
+3. temperatura (calculate_temperature_level) e score são calculados de
+   forma vetorizada para o bloco inteiro;
+4. só as linhas alteradas são gravadas, agrupadas por valor final em
+   PATCHes `id=in.(...)`.
+
+Regras (mesmas do banco):
+- temperatura só é recalculada para leads na etapa inicial com
+  initial_stage_entry_time preenchido (update_all_temperatures);
+- horas = EXTRACT(EPOCH ...) / 3600 arredondado para INTEGER;
+- score numérico (pipeline_leads.temperature) segue o mapeamento de
+  20250125000005-fix-temperature-columns.sql: hot 75, warm 50, cold 25,
+  demais 50, e só é regravado nos leads cuja temperatura foi recalculada.
+
+Fora do escopo: leads.score. update_lead_score (20250121000000) soma o
+score_change das regras ativas de lead_scoring_rules ao score atual de
+leads a cada INSERT/UPDATE e registra lead_scoring_history. É cumulativo
+por escrita, não uma função do estado atual, então um recálculo não o
+reproduz (reaplicar somaria de novo). Esse score continua com o trigger;
+este job não lê lead_scoring_rules nem grava em leads.
+
+Uso:
+    python temperature_batch_scorer.py --tenant <uuid> [--dry-run]
+    python temperature_batch_scorer.py --all-tenants --workers 4
+"""
+
+import argparse
+import operator
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import numpy as np
+
+from supabase_rest import (
+    Throughput, add_backend_argument, chunked, connect, in_filter, list_tenant_ids, parse_timestamp
+)
+
+DEFAULT_CHUNK_SIZE = 5000
+# ids por PATCH (limitado pelo tamanho da URL)
+DEFAULT_UPDATE_BATCH = 200
+
+# Nomes da etapa inicial ('Lead' após 20250714000001; nomes antigos mantidos)
+INITIAL_STAGE_NAMES = ('Lead', 'Novo Lead', 'Novos Leads', 'Novos leads')
+
+DEFAULT_THRESHOLDS = (24, 72, 168)
+
+LEVELS = ('hot', 'warm', 'cold', 'frozen')
+LEVEL_CODES = {level: code for code, level in enumerate(LEVELS)}
+UNKNOWN_LEVEL = -1
+
+# temperature_level -> temperature (ELSE 50 na migração original)
+LEVEL_SCORES = np.array([75, 50, 25, 50], dtype=np.int64)
+
+LEAD_COLUMNS = 'id,pipeline_id,stage_id,initial_stage_entry_time,temperature_level,temperature'
+
+
+class TenantScoringContext:
+    """Configuração do tenant em vetores indexados por pipeline"""
+
+    def __init__(self, pipeline_ids, thresholds, initial_stage_ids):
+        self.pipeline_slot = {pipeline_id: slot for slot, pipeline_id in enumerate(pipeline_ids)}
+        # linha extra no fim = pipeline desconhecido (padrões)
+        self.thresholds = np.array(list(thresholds) + [DEFAULT_THRESHOLDS], dtype=np.float64).reshape(-1, 3)
+        self.initial_stage_ids = frozenset(initial_stage_ids)
+
+    @property
+    def default_slot(self):
+        return len(self.pipeline_slot)
+
+
+def load_context(client, tenant_id):
+    pipeline_ids = [row['id'] for rows in client.fetch_keyset(
+        'pipelines', 'id', filters={'tenant_id': f'eq.{tenant_id}'}) for row in rows]
+
+    configs = {}
+    initial_stage_ids = []
+    for batch in chunked(pipeline_ids, 200):
+        for config in client.select('temperature_config', {
+            'select': 'pipeline_id,hot_threshold,warm_threshold,cold_threshold',
+            'pipeline_id': in_filter(batch)
+        }) or []:
+            configs[config['pipeline_id']] = config
+
+        for stage in client.select('pipeline_stages', {
+            'select': 'id',
+            'pipeline_id': in_filter(batch),
+            'name': in_filter(f'"{name}"' for name in INITIAL_STAGE_NAMES)
+        }) or []:
+            initial_stage_ids.append(stage['id'])
+
+    thresholds = []
+    for pipeline_id in pipeline_ids:
+        config = configs.get(pipeline_id)
+        if config is None:
+            thresholds.append(DEFAULT_THRESHOLDS)
+        else:
+            thresholds.append(tuple(
+                value if value is not None else default
+                for value, default in zip(
+                    (config['hot_threshold'], config['warm_threshold'], config['cold_threshold']),
+                    DEFAULT_THRESHOLDS
+                )
+            ))
+
+    return TenantScoringContext(pipeline_ids, thresholds, initial_stage_ids)
+
+
+def to_columns(rows, context):
+    """Converter um bloco de linhas em colunas NumPy"""
+
+    count = len(rows)
+
+    def column(name, convert, dtype):
+        return np.fromiter(map(convert, map(operator.itemgetter(name), rows)), dtype=dtype, count=count)
+
+    slots = column('pipeline_id', lambda value: context.pipeline_slot.get(value, context.default_slot), np.int64)
+    entry = column('initial_stage_entry_time',
+                   lambda value: np.nan if value is None else parse_timestamp(value).timestamp(), np.float64)
+    initial = column('stage_id', context.initial_stage_ids.__contains__, bool)
+    level = column('temperature_level', lambda value: LEVEL_CODES.get(value, UNKNOWN_LEVEL), np.int64)
+    score = column('temperature', lambda value: -1 if value is None else value, np.int64)
+
+    return slots, entry, initial, level, score
+
+
+def score_chunk(slots, entry, initial, level, score, context, now_epoch):
+    """Calcular temperatura e score do bloco; retorna (novo_nível, novo_score, alterados)"""
+
+    recalculate = initial & ~np.isnan(entry)
+
+    # INTEGER := numeric / 3600 arredonda (meio para longe do zero)
+    seconds = now_epoch - np.where(recalculate, entry, now_epoch)
+    hours = np.sign(seconds) * np.floor(np.abs(seconds) / 3600.0 + 0.5)
+
+    limits = context.thresholds[slots]
+    computed = np.select(
+        [hours <= limits[:, 0], hours <= limits[:, 1], hours <= limits[:, 2]],
+        [0, 1, 2],
+        default=3
+    )
+    new_level = np.where(recalculate, computed, level)
+
+    # score só acompanha o nível recalculado; leads fora da etapa inicial mantêm o temperature atual
+    rescore = recalculate & (new_level != UNKNOWN_LEVEL)
+    new_score = np.where(rescore, LEVEL_SCORES[np.where(rescore, new_level, 0)], score)
+
+    changed = (new_level != level) | (new_score != score)
+    return new_level, new_score, changed
+
+
+def write_changes(client, rows, level, new_level, new_score, changed, touched_at, batch_size):
+    """PATCH agrupado por (nível, score): poucos round trips por bloco"""
+
+    groups = {}
+    for i in np.flatnonzero(changed):
+        # nível só é regravado (com temperature_updated_at) quando mudou
+        level_code = int(new_level[i]) if new_level[i] != level[i] else UNKNOWN_LEVEL
+        groups.setdefault((level_code, int(new_score[i])), []).append(rows[i]['id'])
+
+    written = 0
+    for (level_code, score_value), ids in groups.items():
+        values = {'temperature': score_value}
+        if level_code != UNKNOWN_LEVEL:
+            values['temperature_level'] = LEVELS[level_code]
+            values['temperature_updated_at'] = touched_at
+        for batch in chunked(ids, batch_size):
+            client.update('pipeline_leads', {'id': in_filter(batch)}, values)
+            written += len(batch)
+    return written
+
+
+def score_tenant(tenant_id, chunk_size=DEFAULT_CHUNK_SIZE, batch_size=DEFAULT_UPDATE_BATCH,
+                 dry_run=False, now=None, client=None, backend='rest'):
+    """Recalcular um tenant inteiro; retorna dicionário de estatísticas"""
+
+    client = client or connect(backend)
+    now = now or datetime.now(timezone.utc)
+    now_epoch = now.timestamp()
+    touched_at = now.isoformat()
+    meter = Throughput()
+
+    context = load_context(client, tenant_id)
+    totals = {'tenant_id': tenant_id, 'pipelines': len(context.pipeline_slot), 'scanned': 0,
+              'recalculated': 0, 'changed': 0, 'written': 0,
+              'levels': dict.fromkeys(LEVELS, 0)}
+
+    for rows in client.fetch_keyset('pipeline_leads', LEAD_COLUMNS,
+                                    filters={'tenant_id': f'eq.{tenant_id}'},
+                                    page_size=chunk_size):
+        slots, entry, initial, level, score = to_columns(rows, context)
+        new_level, new_score, changed = score_chunk(slots, entry, initial, level, score, context, now_epoch)
+
+        totals['scanned'] += len(rows)
+        totals['recalculated'] += int(np.count_nonzero(initial & ~np.isnan(entry)))
+        totals['changed'] += int(np.count_nonzero(changed))
+        counts = np.bincount(new_level[new_level != UNKNOWN_LEVEL], minlength=len(LEVELS))
+        for code, name in enumerate(LEVELS):
+            totals['levels'][name] += int(counts[code])
+        meter.add(len(rows))
+
+        if not dry_run:
+            totals['written'] += write_changes(client, rows, level, new_level, new_score, changed,
+                                               touched_at, batch_size)
+
+    totals['elapsed'] = meter.elapsed
+    totals['rows_per_second'] = meter.rate
+    totals['round_trips'] = client.round_trips
+    return totals
+
+
+def print_report(totals):
+    levels = totals['levels']
+    print(f"\n📊 Tenant {totals['tenant_id']}")
+    print(f"   pipelines:        {totals['pipelines']}")
+    print(f"   leads lidos:      {totals['scanned']} "
+          f"({totals['rows_per_second']:,.0f} linhas/s, {totals['round_trips']} round trips)")
+    print(f"   recalculados:     {totals['recalculated']}")
+    print(f"   alterados:        {totals['changed']} (gravados: {totals['written']})")
+    print(f"   🔥 {levels['hot']}  🌡️ {levels['warm']}  ❄️ {levels['cold']}  🧊 {levels['frozen']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Recálculo em lote de temperatura e score')
+    parser.add_argument('--tenant', action='append', default=[], help='tenant_id (pode repetir)')
+    parser.add_argument('--all-tenants', action='store_true', help='processar todas as empresas')
+    parser.add_argument('--workers', type=int, default=4, help='tenants processados em paralelo')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='linhas por bloco')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_UPDATE_BATCH, help='ids por PATCH')
+    parser.add_argument('--dry-run', action='store_true', help='apenas calcular')
+    add_backend_argument(parser)
+    args = parser.parse_args(argv)
+
+    tenants = list(args.tenant)
+    if args.all_tenants:
+        tenants.extend(t for t in list_tenant_ids(connect(args.backend)) if t not in tenants)
+    if not tenants:
+        parser.error('informe --tenant ou --all-tenants')
+
+    print("🌡️ RECÁLCULO EM LOTE DE TEMPERATURA")
+    print("=" * 40)
+    print(f"   tenants: {len(tenants)} | workers: {args.workers} | dry-run: {args.dry_run}")
+
+    # Mesmo "agora" para todos os tenants: resultado reproduzível
+    now = datetime.now(timezone.utc)
+    meter = Throughput()
+    failures = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {
+            executor.submit(score_tenant, tenant_id, args.chunk_size, args.batch_size,
+                            args.dry_run, now, backend=args.backend): tenant_id
+            for tenant_id in tenants
+        }
+        for future in as_completed(futures):
+            tenant_id = futures[future]
+            try:
+                totals = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"\n❌ Tenant {tenant_id}: {e}")
+                continue
+            meter.add(totals['scanned'])
+            print_report(totals)
+
+    print(f"\n🏁 TOTAL: {meter}")
+    if failures:
+        print(f"⚠️  {failures} tenant(s) falharam")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,6 @@
+"""Ferramentas Python ficam na raiz do repositório: torná-las importáveis nos testes"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
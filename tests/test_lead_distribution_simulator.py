@@ -0,0 +1,80 @@
+"""lead_distribution_simulator: rodízio e horário comercial"""
+
+from datetime import datetime
+
+from lead_distribution_simulator import ASSIGNED, FALLBACK, MANUAL, REJECTED, DistributionModel, day_of_week
+
+MONDAY = datetime(2025, 1, 6)
+
+
+def rule(**fields):
+    row = {'pipeline_id': 'p1', 'mode': 'rodizio', 'is_active': True}
+    row.update(fields)
+    return row
+
+
+def model_of(rules, members=('m3', 'm1', 'm2'), **member_fields):
+    return DistributionModel.from_snapshot({
+        'rules': rules,
+        'members': [dict({'pipeline_id': 'p1', 'member_id': member}, **member_fields.get(member, {}))
+                    for member in members]
+    })
+
+
+def test_day_of_week_uses_database_numbering():
+    assert day_of_week(datetime(2025, 1, 5)) == 1  # domingo
+    assert day_of_week(MONDAY) == 2
+    assert day_of_week(datetime(2025, 1, 11)) == 7  # sábado
+
+
+def test_round_robin_rotates_in_member_id_order():
+    model = model_of([rule()])
+
+    assigned = [model.assign('p1', MONDAY)[1] for _ in range(5)]
+
+    assert assigned == ['m1', 'm2', 'm3', 'm1', 'm2']
+    assert model.assignments_by_member() == {('p1', 'm1'): 2, ('p1', 'm2'): 2, ('p1', 'm3'): 1}
+
+
+def test_round_robin_continues_after_last_assigned_member():
+    model = model_of([rule(last_assigned_member_id='m2')])
+
+    assert [model.assign('p1', MONDAY)[1] for _ in range(2)] == ['m3', 'm1']
+
+
+def test_inactive_members_are_skipped_unless_configured():
+    inactive = {'m2': {'is_active': False}}
+
+    assert model_of([rule()], **inactive).member_ids == ['m1', 'm3']
+    assert model_of([rule(skip_inactive_members=False)], **inactive).member_ids == ['m1', 'm2', 'm3']
+
+
+def test_manual_and_empty_pipelines():
+    model = model_of([rule(mode='manual')])
+    assert model.assign('p1', MONDAY) == (MANUAL, None)
+    assert model.assign('outro', MONDAY) == (MANUAL, None)
+
+    assert model_of([rule()], members=()).assign('p1', MONDAY) == (FALLBACK, None)
+    assert model_of([rule(fallback_to_manual=False)], members=()).assign('p1', MONDAY) == (REJECTED, None)
+
+
+def test_working_hours_window_and_days():
+    model = model_of([rule(working_hours_only=True, working_hours_start='09:00', working_hours_end='18:00:00',
+                           working_days=[2, 3, 4, 5, 6])])
+
+    assert model.assign('p1', MONDAY.replace(hour=9))[0] == ASSIGNED
+    assert model.assign('p1', MONDAY.replace(hour=18))[0] == ASSIGNED
+    assert model.assign('p1', MONDAY.replace(hour=18, second=1))[0] == FALLBACK
+    assert model.assign('p1', MONDAY.replace(hour=8, minute=59))[0] == FALLBACK
+    assert model.assign('p1', datetime(2025, 1, 5, 12))[0] == FALLBACK  # domingo
+
+
+def test_overnight_working_hours_wrap_midnight():
+    model = model_of([rule(working_hours_only=True, working_hours_start='22:00', working_hours_end='06:00',
+                           fallback_to_manual=False)])
+
+    for hour, minute in ((22, 0), (23, 59), (0, 0), (6, 0)):
+        assert model.assign('p1', MONDAY.replace(hour=hour, minute=minute))[0] == ASSIGNED
+    for hour, minute in ((6, 1), (12, 0), (21, 59)):
+        assert model.assign('p1', MONDAY.replace(hour=hour, minute=minute))[0] == REJECTED
+    assert list(model.outcomes) == [4, 0, 0, 3]
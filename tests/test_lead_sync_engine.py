@@ -0,0 +1,102 @@
+"""lead_sync_engine: diff de pipeline_leads contra leads_master"""
+
+from lead_sync_engine import MasterIndex, build_custom_data, diff_chunk, fingerprint, plan_orphan_masters
+
+TOUCHED_AT = '2025-08-25T12:00:00+00:00'
+
+
+def master(**fields):
+    row = {'id': 'm1', 'first_name': 'Ana', 'last_name': 'Souza', 'email': 'ana@acme.com', 'company': 'Acme'}
+    row.update(fields)
+    return row
+
+
+def index_of(*masters):
+    index = MasterIndex()
+    for row in masters:
+        index.add(row)
+    return index
+
+
+def test_build_custom_data_follows_trigger_rules():
+    data = build_custom_data(master(phone=None), {'telefone': 11999, 'valor': '10', 'extra': 'x'})
+
+    assert data['nome'] == data['nome_lead'] == data['lead_name'] == 'Ana Souza'
+    assert data['email'] == 'ana@acme.com'
+    assert data['telefone'] == '11999'  # custom_data->>chave: texto
+    assert data['valor'] == '10'  # preservado
+    assert 'extra' not in data
+    assert data['lead_master_id'] == 'm1'
+
+
+def test_build_custom_data_full_name_fallbacks():
+    assert build_custom_data(master(last_name=''), {})['nome'] == 'Ana'
+    assert build_custom_data(master(first_name=None, last_name='Souza'), {})['nome'] == 'Souza'
+    assert build_custom_data(master(first_name=None, last_name=None), {})['nome'] == 'Lead'
+
+
+def test_fingerprint_ignores_key_order():
+    assert fingerprint({'a': 1, 'b': [1, 2]}) == fingerprint({'b': [1, 2], 'a': 1})
+    assert fingerprint({'a': 1}) != fingerprint({'a': '1'})
+
+
+def test_match_orphan_prefers_email_then_name_and_company():
+    index = index_of(master(), master(id='m2', email='outra@acme.com', first_name='Bia'))
+
+    assert index.match_orphan({'email': 'outra@acme.com', 'nome_lead': 'Ana Souza', 'empresa': 'Acme'}) == 'm2'
+    assert index.match_orphan({'email': 'nao@existe.com', 'nome_lead': 'Ana Souza', 'empresa': 'Acme'}) == 'm1'
+    assert index.match_orphan({'nome_lead': 'Ana Souza'}) is None
+    assert index.match_orphan(None) is None
+
+
+def test_diff_chunk_skips_unchanged_rows():
+    current = dict(reversed(build_custom_data(master(), {}).items()))
+    changed, stats = diff_chunk([{'id': 'p1', 'lead_master_id': 'm1', 'custom_data': current}],
+                                index_of(master()), touched_at=TOUCHED_AT)
+
+    assert changed == []
+    assert stats['unchanged'] == 1 and stats['changed'] == 0
+
+
+def test_diff_chunk_writes_only_link_custom_data_and_updated_at():
+    rows = [{'id': 'p1', 'lead_master_id': 'm1', 'custom_data': {'email': 'antigo@acme.com'},
+             'tenant_id': 't1', 'created_by': 'u1', 'created_at': '2025-01-01', 'stage_id': 's1'}]
+    changed, stats = diff_chunk(rows, index_of(master()), touched_at=TOUCHED_AT)
+
+    assert stats['changed'] == 1
+    assert [set(row) for row in changed] == [{'id', 'lead_master_id', 'custom_data', 'updated_at'}]
+    assert changed[0]['custom_data']['email'] == 'ana@acme.com'
+    assert changed[0]['updated_at'] == TOUCHED_AT
+
+
+def test_diff_chunk_links_matching_orphans():
+    rows = [{'id': 'p1', 'lead_master_id': None, 'custom_data': {'email': 'ana@acme.com'}},
+            {'id': 'p2', 'lead_master_id': None, 'custom_data': {'email': 'sem@match.com'}}]
+    changed, stats = diff_chunk(rows, index_of(master()), touched_at=TOUCHED_AT)
+
+    assert [(row['id'], row['lead_master_id']) for row in changed] == [('p1', 'm1')]
+    assert stats['linked'] == 1 and stats['orphans'] == 1
+
+    _, stats = diff_chunk(rows, index_of(master()), repair_orphans=False)
+    assert stats['orphans'] == 2 and stats['changed'] == 0
+
+
+def test_diff_chunk_uses_masters_created_for_orphans():
+    rows = [{'id': 'p1', 'lead_master_id': None, 'tenant_id': 't1',
+             'custom_data': {'email': 'novo@acme.com', 'nome_lead': 'Caio Lima', 'empresa': 'Beta'}},
+            {'id': 'p2', 'lead_master_id': None, 'tenant_id': 't1',
+             'custom_data': {'nome_lead': 'Caio Lima', 'empresa': 'Beta'}}]
+    masters, assigned = plan_orphan_masters(rows, taken_emails=set())
+
+    assert len(masters) == 1 and assigned == {'p1': masters[0]['id'], 'p2': masters[0]['id']}
+    assert (masters[0]['first_name'], masters[0]['last_name']) == ('Caio', 'Lima')
+
+    changed, stats = diff_chunk(rows, index_of(*masters), assigned=assigned, touched_at=TOUCHED_AT)
+    assert {row['lead_master_id'] for row in changed} == {masters[0]['id']}
+    assert stats['created'] == 2 and stats['linked'] == 0
+
+
+def test_diff_chunk_counts_missing_masters():
+    changed, stats = diff_chunk([{'id': 'p1', 'lead_master_id': 'sumiu', 'custom_data': {}}], index_of(master()))
+
+    assert changed == [] and stats['missing_master'] == 1
@@ -0,0 +1,94 @@
+"""migration_runner / migration_cli: split, lotes e plano (PostgREST falso, sem rede)"""
+
+import pytest
+
+import migration_cli
+from fake_postgrest import FakePostgrest
+from migration_runner import MigrationRunner, RestRpcTransport, is_non_transactional, split_sql_statements
+from supabase_rest import SupabaseRest
+
+SCRIPT = """
+-- Migration: teste
+CREATE TABLE notas (id INTEGER PRIMARY KEY, texto TEXT); -- comentário; com ponto e vírgula
+/* bloco; comentado */
+INSERT INTO notas (id, texto) VALUES (1, 'a;b'), (2, 'it''s; ok');
+CREATE FUNCTION f() RETURNS void AS $$ BEGIN PERFORM 1; PERFORM 2; END; $$ LANGUAGE plpgsql;
+CREATE FUNCTION g() RETURNS text AS $body$ SELECT '$$;' $body$ LANGUAGE sql;
+CREATE INDEX CONCURRENTLY notas_texto ON notas (texto);
+CREATE POLICY "Leitura; geral" ON public.notas FOR SELECT USING (true);
+-- só comentário no fim;
+"""
+
+
+def test_split_respects_quotes_comments_and_dollar_quotes():
+    statements = split_sql_statements(SCRIPT)
+
+    assert len(statements) == 6
+    assert statements[0].startswith('-- Migration: teste\nCREATE TABLE notas')
+    assert statements[1].endswith("VALUES (1, 'a;b'), (2, 'it''s; ok')")
+    assert statements[2].endswith('END; $$ LANGUAGE plpgsql')
+    assert statements[3] == "CREATE FUNCTION g() RETURNS text AS $body$ SELECT '$$;' $body$ LANGUAGE sql"
+    assert split_sql_statements('SELECT $1; SELECT 2') == ['SELECT $1', 'SELECT 2']
+
+
+@pytest.mark.parametrize('statement, expected', [
+    ('CREATE INDEX CONCURRENTLY i ON t (a)', True),
+    ('-- índice\n/* online */ create unique index concurrently i on t (a)', True),
+    ('DROP INDEX CONCURRENTLY IF EXISTS i', True),
+    ('REINDEX INDEX CONCURRENTLY i', True),
+    ('VACUUM ANALYZE t', True),
+    ("ALTER TYPE estado ADD VALUE 'novo'", True),
+    ('ALTER TABLE t DETACH PARTITION t_2024 CONCURRENTLY', True),
+    ('CREATE INDEX i ON t (a)', False),
+    ("CREATE FUNCTION f() RETURNS void AS $$ BEGIN EXECUTE 'VACUUM t'; END; $$ LANGUAGE plpgsql", False),
+    ('-- CREATE INDEX CONCURRENTLY\nSELECT 1', False),
+])
+def test_is_non_transactional(statement, expected):
+    assert is_non_transactional(statement) is expected
+
+
+def test_groups_isolate_non_transactional_statements():
+    statements = ['A', 'B', 'C', 'VACUUM t', 'D', 'E', 'F', 'G']
+
+    groups = list(MigrationRunner(None, batch_size=3).groups(statements))
+
+    assert groups == [(0, ['A', 'B', 'C']), (3, ['VACUUM t']), (4, ['D', 'E', 'F']), (7, ['G'])]
+    assert list(MigrationRunner(None, batch_size=1).groups(['A', 'B'])) == [(0, ['A']), (1, ['B'])]
+
+
+def test_runner_batches_against_fake_postgrest():
+    statements = ['CREATE TABLE notas (id INTEGER PRIMARY KEY, texto TEXT)'] + [
+        f"INSERT INTO notas (id, texto) VALUES ({i}, 'n{i}')" for i in range(1, 10)]
+    server = FakePostgrest().start()
+    try:
+        client = SupabaseRest(server.url, server.service_role_key)
+        stats = MigrationRunner(RestRpcTransport(client), batch_size=4, verbose=False).run(statements)
+    finally:
+        server.stop()
+        server.backend.close()
+
+    assert (stats['executed'], stats['failed'], stats['calls'], stats['round_trips']) == (10, 0, 3, 3)
+    assert server.stats['statements'] == 10
+
+
+def test_plan_lists_statements_batches_and_policies(tmp_path, capsys):
+    path = tmp_path / 'teste.sql'
+    path.write_text(SCRIPT, encoding='utf-8')
+
+    assert migration_cli.main(['plan', str(path), '--batch-size', '2']) == 0
+
+    output = capsys.readouterr().out
+    listed = [line for line in output.splitlines() if '. CREATE ' in line or '. INSERT ' in line]
+    assert 'statements: 6 | lotes: 4 (até 2 por chamada' in output
+    assert [line.startswith('⚠️') for line in listed] == [False, False, False, False, True, False]
+    assert listed[4].endswith('5. CREATE INDEX CONCURRENTLY notas_texto ON notas (texto)')
+    assert '🔐 notas: "Leitura; geral" criada' in output
+    assert 'apply --backend postgres executa cada um sozinho' in output
+
+
+def test_apply_over_rest_refuses_non_transactional_statements(tmp_path, capsys):
+    path = tmp_path / 'teste.sql'
+    path.write_text(SCRIPT, encoding='utf-8')
+
+    assert migration_cli.main(['apply', str(path)]) == 2
+    assert 'statements 5 não rodam dentro de transação' in capsys.readouterr().err
@@ -0,0 +1,93 @@
+"""stage_count_read_model: deltas por etapa e eventos repetidos"""
+
+from stage_count_read_model import DELTAS_RPC, EVENTS_TABLE, StageCountDeltas, apply_events, event_key
+
+
+class FakeClient:
+    """Só o que apply_events usa: select em pipeline_stage_count_events e a RPC de deltas"""
+
+    def __init__(self, applied=()):
+        self.applied = set(applied)
+        self.calls = []
+
+    def select(self, table, params):
+        assert table == EVENTS_TABLE
+        keys = params['event_key'][len('in.('):-1].split(',')
+        return [{'event_key': key} for key in keys if key in self.applied]
+
+    def rpc(self, name, payload):
+        assert name == DELTAS_RPC
+        self.calls.append(payload)
+        self.applied.update(payload['p_event_keys'])
+        return len(payload['p_deltas'])
+
+
+def lead(stage_id, value='100.50', pipeline_id='p1'):
+    return {'id': 'l1', 'tenant_id': 't1', 'pipeline_id': pipeline_id, 'stage_id': stage_id,
+            'valor_total_calculado': value}
+
+
+def event(kind, record=None, old_record=None, event_id=None):
+    payload = {'type': kind, 'table': 'pipeline_leads', 'record': record, 'old_record': old_record}
+    if event_id:
+        payload['id'] = event_id
+    return payload
+
+
+def totals_by_stage(deltas):
+    return {row['stage_id']: (row['lead_count'], row['value_sum']) for row in deltas.rows()}
+
+
+def test_insert_update_delete_net_out_per_stage():
+    deltas = StageCountDeltas()
+    deltas.apply_event(event('INSERT', lead('s1')))
+    deltas.apply_event(event('UPDATE', lead('s2'), lead('s1')))
+    deltas.apply_event(event('INSERT', lead('s1', value=None)))
+    deltas.apply_event(event('UPDATE', lead('s2', value='20'), lead('s2')))
+    deltas.apply_event(event('DELETE', old_record=lead('s3', value='5')))
+
+    assert totals_by_stage(deltas) == {'s1': (1, '0.00'), 's2': (1, '20.00'), 's3': (-1, '-5')}
+    assert deltas.events == 5
+
+
+def test_zero_deltas_and_foreign_events_are_dropped():
+    deltas = StageCountDeltas()
+    deltas.apply_event(event('INSERT', lead('s1')))
+    deltas.apply_event(event('DELETE', old_record=lead('s1')))
+    deltas.apply_event(event('INSERT', lead(None)))
+    deltas.apply_event({'type': 'INSERT', 'table': 'leads_master', 'record': lead('s1')})
+    deltas.apply_event({'type': 'TRUNCATE', 'table': 'pipeline_leads'})
+
+    assert deltas.rows() == []
+    assert (deltas.events, deltas.ignored) == (3, 2)
+
+
+def test_event_key_uses_id_or_canonical_payload():
+    assert event_key(event('INSERT', lead('s1'), event_id='evt-1')) == 'evt-1'
+    payload = event('INSERT', lead('s1'))
+    assert event_key(payload) == event_key(dict(reversed(payload.items())))
+    assert event_key(payload) != event_key(event('INSERT', lead('s2')))
+
+
+def test_repeated_events_are_applied_once():
+    events = [event('INSERT', lead('s1'), event_id='a'),
+              event('INSERT', lead('s1'), event_id='a'),
+              event('INSERT', lead('s2'), event_id='b')]
+    client = FakeClient()
+
+    first = apply_events(client, events, event_chunk=2)
+    second = apply_events(client, events)
+
+    assert [sorted(call['p_event_keys']) for call in client.calls] == [['a'], ['b']]
+    assert (first['events'], first['duplicates'], first['applied']) == (2, 1, 2)
+    assert (second['events'], second['duplicates'], second['applied']) == (0, 3, 0)
+
+
+def test_dry_run_does_not_call_the_rpc():
+    client = FakeClient(applied={'a'})
+
+    totals = apply_events(client, [event('INSERT', lead('s1'), event_id='a'),
+                                   event('INSERT', lead('s2'), event_id='b')], dry_run=True)
+
+    assert client.calls == []
+    assert (totals['events'], totals['duplicates'], totals['deltas']) == (1, 1, 1)
@@ -0,0 +1,82 @@
+"""temperature_batch_scorer: conferência contra calculate_temperature_level"""
+
+from datetime import datetime, timedelta, timezone
+from decimal import ROUND_HALF_UP, Decimal
+
+import numpy as np
+
+from temperature_batch_scorer import LEVELS, TenantScoringContext, score_chunk, to_columns
+
+NOW = datetime(2025, 8, 25, 12, 0, tzinfo=timezone.utc)
+INITIAL = 'stage-lead'
+CONTEXT = TenantScoringContext(['p1'], [(10, 20, 30)], [INITIAL])
+
+
+def calculate_temperature_level(thresholds, entry):
+    """calculate_temperature_level (20250125000000) em Python: numeric -> INTEGER arredonda meio para fora"""
+
+    seconds = Decimal((NOW - entry) // timedelta(microseconds=1)) / 1000000
+    hours = int((seconds / 3600).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    for level, limit in zip(LEVELS, thresholds):
+        if hours <= limit:
+            return level
+    return LEVELS[-1]
+
+
+def lead(entry, pipeline_id='p1', stage_id=INITIAL, level=None, score=None):
+    return {'id': 'l1', 'pipeline_id': pipeline_id, 'stage_id': stage_id,
+            'initial_stage_entry_time': None if entry is None else entry.isoformat(),
+            'temperature_level': level, 'temperature': score}
+
+
+def score(rows):
+    slots, entry, initial, level, current = to_columns(rows, CONTEXT)
+    new_level, new_score, changed = score_chunk(slots, entry, initial, level, current, CONTEXT, NOW.timestamp())
+    return [LEVELS[code] if code >= 0 else None for code in new_level], new_score.tolist(), changed.tolist()
+
+
+def test_threshold_boundaries_and_rounding_match_database():
+    offsets = [timedelta(hours=hours, minutes=minutes, seconds=seconds)
+               for hours in (0, 10, 20, 30) for minutes, seconds in ((0, 0), (29, 59), (30, 0), (30, 1))]
+    offsets += [-timedelta(minutes=29), -timedelta(minutes=30), -timedelta(minutes=31), timedelta(hours=500)]
+    rows = [lead(NOW - offset) for offset in offsets]
+
+    levels, scores, _ = score(rows)
+
+    expected = [calculate_temperature_level((10, 20, 30), NOW - offset) for offset in offsets]
+    assert levels == expected
+    assert scores == [{'hot': 75, 'warm': 50, 'cold': 25, 'frozen': 50}[level] for level in expected]
+    # 10h30m arredonda para 11h: já não é hot
+    assert levels[offsets.index(timedelta(hours=10, minutes=30))] == 'warm'
+
+
+def test_unknown_pipeline_uses_default_thresholds():
+    entry = NOW - timedelta(hours=48)
+    levels, _, _ = score([lead(entry, pipeline_id='outro')])
+
+    assert levels == [calculate_temperature_level((24, 72, 168), entry)] == ['warm']
+
+
+def test_leads_without_entry_time_or_outside_initial_stage_keep_their_values():
+    rows = [lead(None, level='cold', score=25),
+            lead(None),
+            lead(NOW - timedelta(hours=1), stage_id='outra', level='frozen', score=10)]
+
+    levels, scores, changed = score(rows)
+
+    assert levels == ['cold', None, 'frozen']
+    assert scores == [25, -1, 10]
+    assert changed == [False, False, False]
+
+
+def test_only_changed_rows_are_flagged():
+    rows = [lead(NOW - timedelta(hours=1), level='hot', score=75),
+            lead(NOW - timedelta(hours=1), level='hot', score=40),
+            lead(NOW - timedelta(hours=15), level='hot', score=75)]
+
+    levels, scores, changed = score(rows)
+
+    assert levels == ['hot', 'hot', 'warm']
+    assert scores == [75, 75, 50]
+    assert changed == [False, True, True]
+    assert np.isnan(to_columns([lead(None)], CONTEXT)[1]).all()